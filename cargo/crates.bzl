@@ -811,6 +811,16 @@ def raze_fetch_remote_crates():
         build_file = Label("//cargo/remote:BUILD.ghost-0.1.2.bazel"),
     )
 
+    maybe(
+        http_archive,
+        name = "raze__glob__0_3_0",
+        url = "https://crates.io/api/v1/crates/glob/0.3.0/download",
+        type = "tar.gz",
+        sha256 = "9b919933a397b79c37e33b77bb2aa3dc8eb6e165ad809e58ff75bc7db2e34574",
+        strip_prefix = "glob-0.3.0",
+        build_file = Label("//cargo/remote:BUILD.glob-0.3.0.bazel"),
+    )
+
     maybe(
         http_archive,
         name = "raze__h2__0_2_7",
@@ -1131,6 +1141,16 @@ def raze_fetch_remote_crates():
         build_file = Label("//cargo/remote:BUILD.itoa-0.4.7.bazel"),
     )
 
+    maybe(
+        http_archive,
+        name = "raze__jobserver__0_1_21",
+        url = "https://crates.io/api/v1/crates/jobserver/0.1.21/download",
+        type = "tar.gz",
+        sha256 = "5c71313ebb9439f74b00d9d2dcec36440beaf57a6aa0623068441dd7cd81a7f2",
+        strip_prefix = "jobserver-0.1.21",
+        build_file = Label("//cargo/remote:BUILD.jobserver-0.1.21.bazel"),
+    )
+
     maybe(
         http_archive,
         name = "raze__js_sys__0_3_49",
@@ -3090,3 +3110,33 @@ def raze_fetch_remote_crates():
         strip_prefix = "zip-0.5.6",
         build_file = Label("//cargo/remote:BUILD.zip-0.5.6.bazel"),
     )
+
+    maybe(
+        http_archive,
+        name = "raze__zstd__0_5_4_zstd_1_4_7",
+        url = "https://crates.io/api/v1/crates/zstd/0.5.4+zstd.1.4.7/download",
+        type = "tar.gz",
+        sha256 = "69996ebdb1ba8b1517f61387a883857818a66c8a295f487b1ffd8fd9d2c82910",
+        strip_prefix = "zstd-0.5.4+zstd.1.4.7",
+        build_file = Label("//cargo/remote:BUILD.zstd-0.5.4+zstd.1.4.7.bazel"),
+    )
+
+    maybe(
+        http_archive,
+        name = "raze__zstd_safe__2_0_6_zstd_1_4_7",
+        url = "https://crates.io/api/v1/crates/zstd-safe/2.0.6+zstd.1.4.7/download",
+        type = "tar.gz",
+        sha256 = "98aa931fb69ecee256d44589d19754e61851ae4769bf963b385119b1cc37a49e",
+        strip_prefix = "zstd-safe-2.0.6+zstd.1.4.7",
+        build_file = Label("//cargo/remote:BUILD.zstd-safe-2.0.6+zstd.1.4.7.bazel"),
+    )
+
+    maybe(
+        http_archive,
+        name = "raze__zstd_sys__1_4_18_zstd_1_4_7",
+        url = "https://crates.io/api/v1/crates/zstd-sys/1.4.18+zstd.1.4.7/download",
+        type = "tar.gz",
+        sha256 = "a1e6e8778706838f43f771d80d37787cb2fe06dafe89dd3aebaf6721b9eaec81",
+        strip_prefix = "zstd-sys-1.4.18+zstd.1.4.7",
+        build_file = Label("//cargo/remote:BUILD.zstd-sys-1.4.18+zstd.1.4.7.bazel"),
+    )
@@ -13,6 +13,7 @@ undo-action-redone = { $action } redone
 ## Action that can be undone
 
 undo-answer-card = Answer Card
+undo-answer-cards = Answer Cards
 undo-unbury-unsuspend = Unbury/Unsuspend
 undo-add-deck = Add Deck
 undo-add-note = Add Note
@@ -3,15 +3,22 @@
 
 from __future__ import annotations
 
+import asyncio
+import os
+import struct
 import sys
+import time
 import traceback
+from concurrent.futures import Executor
+from functools import lru_cache
+from itertools import accumulate
 from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 from weakref import ref
 
 from markdown import markdown
 
 import anki.buildinfo
-from anki._backend.generated import RustBackendGenerated
+from anki._backend.generated import AsyncRustBackendGenerated, RustBackendGenerated
 from anki.dbproxy import Row as DBRow
 from anki.dbproxy import ValueForDB
 from anki.utils import from_json_bytes, to_json_bytes
@@ -35,6 +42,8 @@ from ..errors import (
 from . import backend_pb2 as pb
 from . import rsbridge
 from .fluent import GeneratedTranslations, LegacyTranslationEnum
+from .pipeline import BackendPipeline
+from .profiler import BackendProfiler, method_name
 
 # the following comment is required to suppress a warning that only shows up
 # when there are other pylint failures
@@ -70,10 +79,40 @@ class RustBackend(RustBackendGenerated):
             server=server,
         )
         self._backend = rsbridge.open_backend(init_msg.SerializeToString())
+        # query results are transferred in a binary columnar format; set to
+        # False to fall back on the older JSON encoding
+        self.binary_db_rows = True
+        # incremented by every call that may modify the collection, so callers
+        # can tell when cached data needs to be refreshed
+        self.change_count = 0
+        # set by set_profiling_enabled()
+        self.profiler: Optional[BackendProfiler] = None
+        if os.getenv("ANKI_PROFILE_BACKEND"):
+            self.set_profiling_enabled(True)
+
+    def set_profiling_enabled(self, enabled: bool) -> None:
+        "Start or stop recording the latency of each backend call."
+        if enabled:
+            if not self.profiler:
+                self.profiler = BackendProfiler()
+        else:
+            self.profiler = None
 
     def db_query(
         self, sql: str, args: Sequence[ValueForDB], first_row_only: bool
     ) -> List[DBRow]:
+        if self.binary_db_rows:
+            return decode_columnar_rows(
+                self._db_command_bytes(
+                    dict(
+                        kind="query",
+                        sql=sql,
+                        args=args,
+                        first_row_only=first_row_only,
+                        binary=True,
+                    )
+                )
+            )
         return self._db_command(
             dict(kind="query", sql=sql, args=args, first_row_only=first_row_only)
         )
@@ -81,6 +120,20 @@ class RustBackend(RustBackendGenerated):
     def db_execute_many(self, sql: str, args: List[List[ValueForDB]]) -> List[DBRow]:
         return self._db_command(dict(kind="executemany", sql=sql, args=args))
 
+    def db_iter_start(self, sql: str, args: Sequence[ValueForDB]) -> int:
+        return self._db_command(dict(kind="iterstart", sql=sql, args=args))
+
+    def db_iter_next(self, id: int, batch_size: int) -> List[DBRow]:
+        input = dict(
+            kind="iternext", id=id, batch_size=batch_size, binary=self.binary_db_rows
+        )
+        if self.binary_db_rows:
+            return decode_columnar_rows(self._db_command_bytes(input))
+        return self._db_command(input)
+
+    def db_iter_close(self, id: int) -> None:
+        return self._db_command(dict(kind="iterclose", id=id))
+
     def db_begin(self) -> None:
         return self._db_command(dict(kind="begin"))
 
@@ -91,8 +144,21 @@ class RustBackend(RustBackendGenerated):
         return self._db_command(dict(kind="rollback"))
 
     def _db_command(self, input: Dict[str, Any]) -> Any:
+        return from_json_bytes(self._db_command_bytes(input))
+
+    def _db_command_bytes(self, input: Dict[str, Any]) -> bytes:
+        if _db_command_may_modify(input):
+            self.change_count += 1
         try:
-            return from_json_bytes(self._backend.db_command(to_json_bytes(input)))
+            input_bytes = to_json_bytes(input)
+            if not (profiler := self.profiler):
+                return self._backend.db_command(input_bytes)
+            start = time.perf_counter()
+            output = self._backend.db_command(input_bytes)
+            profiler.record_db_command(
+                input, time.perf_counter() - start, len(input_bytes), len(output)
+            )
+            return output
         except Exception as e:
             err_bytes = bytes(e.args[0])
         err = pb.BackendError()
@@ -121,14 +187,165 @@ class RustBackend(RustBackendGenerated):
 
     def _run_command(self, service: int, method: int, input: Any) -> bytes:
         input_bytes = input.SerializeToString()
+        if not _is_read_only(service, method):
+            self.change_count += 1
         try:
-            return self._backend.command(service, method, input_bytes)
+            if not (profiler := self.profiler):
+                return self._backend.command(service, method, input_bytes)
+            start = time.perf_counter()
+            output = self._backend.command(service, method, input_bytes)
+            profiler.record_command(
+                service,
+                method,
+                time.perf_counter() - start,
+                len(input_bytes),
+                len(output),
+            )
+            return output
         except Exception as e:
             err_bytes = bytes(e.args[0])
         err = pb.BackendError()
         err.ParseFromString(err_bytes)
         raise backend_exception_to_pylib(err)
 
+    def pipeline(self) -> BackendPipeline:
+        "Queue up backend method calls, to be run at once with .execute()."
+        return BackendPipeline(self)
+
+    def _run_commands(self, commands: List[Tuple[int, int, bytes]]) -> List[bytes]:
+        "Run (service, method, input) commands with a single call into the backend."
+        if not all(_is_read_only(service, method) for (service, method, _) in commands):
+            self.change_count += 1
+        if profiler := self.profiler:
+            start = time.perf_counter()
+            results = self._backend.command_batch(commands)
+            profiler.record_pipeline(
+                time.perf_counter() - start,
+                [
+                    (service, method, len(input), len(output))
+                    for ((service, method, input), (_, output)) in zip(
+                        commands, results
+                    )
+                ],
+            )
+        else:
+            results = self._backend.command_batch(commands)
+        for (ok, output) in results:
+            if not ok:
+                err = pb.BackendError()
+                err.ParseFromString(output)
+                raise backend_exception_to_pylib(err)
+        return [output for (_ok, output) in results]
+
+
+# methods that don't modify the collection, and so don't change change_count;
+# any method not listed is assumed to modify it. Keeping derived data such as
+# the revlog_days totals up to date doesn't count as a modification.
+_READ_ONLY_METHODS = {
+    "AllBrowserColumns",
+    "AllDeckConfigLegacy",
+    "AllTags",
+    "BrowserRowForId",
+    "BuildSearchString",
+    "CardStats",
+    "CardsOfNote",
+    "CardsTable",
+    "ClozeNumbersInNote",
+    "CongratsInfo",
+    "CountsForDeckToday",
+    "DeckTree",
+    "DeckTreeLegacy",
+    "DefaultDeckForNotetype",
+    "DefaultsForAdding",
+    "DescribeNextStates",
+    "ExtractAVTags",
+    "ExtractLatex",
+    "FieldNamesForNotes",
+    "FilteredDeckOrderLabels",
+    "FormatTimespan",
+    "GetAllConfig",
+    "GetAllDecksLegacy",
+    "GetCard",
+    "GetConfigBool",
+    "GetConfigJson",
+    "GetConfigString",
+    "GetCurrentDeck",
+    "GetDeck",
+    "GetDeckConfig",
+    "GetDeckConfigLegacy",
+    "GetDeckConfigsForUpdate",
+    "GetDeckIdByName",
+    "GetDeckLegacy",
+    "GetDeckNames",
+    "GetGraphPreferences",
+    "GetNextCardStates",
+    "GetNote",
+    "GetNotetype",
+    "GetNotetypeIdByName",
+    "GetNotetypeLegacy",
+    "GetNotetypeNames",
+    "GetNotetypeNamesAndCounts",
+    "GetPreferences",
+    "GetQueuedCards",
+    "GetStockNotetypeLegacy",
+    "GetUndoStatus",
+    "Graphs",
+    "I18nResources",
+    "JoinSearchNodes",
+    "LatestProgress",
+    "NoteIsDuplicateOrEmpty",
+    "RenderExistingCard",
+    "RenderMarkdown",
+    "RenderUncommittedCard",
+    "ReplaceSearchNode",
+    "RevlogTable",
+    "SchedTimingToday",
+    "SearchCards",
+    "SearchNotes",
+    "StateIsLeech",
+    "StripAVTags",
+    "StudiedToday",
+    "StudiedTodayMessage",
+    "TagTree",
+    "TranslateString",
+    "UpdateRevlogDays",
+}
+
+
+@lru_cache(maxsize=None)
+def _is_read_only(service: int, method: int) -> bool:
+    return method_name(service, method).split(".")[-1] in _READ_ONLY_METHODS
+
+
+def _db_command_may_modify(input: Dict[str, Any]) -> bool:
+    kind = input["kind"]
+    if kind in ("query", "iterstart"):
+        return input["sql"].lstrip()[:6].lower() != "select"
+    return kind in ("executemany", "rollback")
+
+
+class AsyncRustBackend(AsyncRustBackendGenerated):
+    """Awaitable versions of the backend methods, for use from asyncio code.
+
+    Each call is run on the provided executor, or the event loop's default
+    executor. The backend releases the GIL while it is working, so other
+    Python code can run in the meantime. Calls that need the collection are
+    still processed one at a time, as the backend locks the collection while
+    they run.
+    """
+
+    def __init__(
+        self, backend: RustBackend, executor: Optional[Executor] = None
+    ) -> None:
+        self._backend = backend
+        self._executor = executor
+
+    async def _run_command(self, service: int, method: int, input: Any) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._backend._run_command, service, method, input
+        )
+
 
 def translate_string_in(
     module_index: int, message_index: int, **kwargs: Union[str, int, float]
@@ -144,6 +361,77 @@ def translate_string_in(
     )
 
 
+# column kinds, as produced by rows_to_columnar() in rslib/src/backend/dbproxy.rs
+_COLUMN_NULL = 0
+_COLUMN_INT = 1
+_COLUMN_DOUBLE = 2
+_COLUMN_TEXT = 3
+_COLUMN_BLOB = 4
+_COLUMN_MIXED = 5
+
+
+def decode_columnar_rows(data: bytes) -> List[DBRow]:
+    "Decode the binary columnar format returned by binary DB queries."
+    buf = memoryview(data)
+    (row_count, column_count) = struct.unpack_from("<II", buf)
+    offset = 8
+    columns: List[Sequence[Any]] = []
+    for _ in range(column_count):
+        kind = buf[offset]
+        offset += 1
+        column: Sequence[Any]
+        if kind == _COLUMN_NULL:
+            column = (None,) * row_count
+        elif kind == _COLUMN_INT or kind == _COLUMN_DOUBLE:
+            fmt = f"<{row_count}{'q' if kind == _COLUMN_INT else 'd'}"
+            column = struct.unpack_from(fmt, buf, offset)
+            offset += row_count * 8
+        elif kind == _COLUMN_TEXT or kind == _COLUMN_BLOB:
+            lengths = struct.unpack_from(f"<{row_count}I", buf, offset)
+            offset += row_count * 4
+            ends = list(accumulate(lengths, initial=offset))
+            if kind == _COLUMN_TEXT:
+                column = [
+                    str(buf[start:end], "utf8") for start, end in zip(ends, ends[1:])
+                ]
+            else:
+                column = [bytes(buf[start:end]) for start, end in zip(ends, ends[1:])]
+            offset = ends[-1]
+        elif kind == _COLUMN_MIXED:
+            (column, offset) = _decode_mixed_column(buf, offset, row_count)
+        else:
+            raise Exception(f"unknown column kind: {kind}")
+        columns.append(column)
+
+    if not column_count:
+        return []
+    return list(map(list, zip(*columns)))
+
+
+def _decode_mixed_column(
+    buf: memoryview, offset: int, row_count: int
+) -> Tuple[List[Any], int]:
+    column: List[Any] = []
+    for _ in range(row_count):
+        kind = buf[offset]
+        offset += 1
+        if kind == _COLUMN_NULL:
+            column.append(None)
+        elif kind == _COLUMN_INT:
+            column.append(struct.unpack_from("<q", buf, offset)[0])
+            offset += 8
+        elif kind == _COLUMN_DOUBLE:
+            column.append(struct.unpack_from("<d", buf, offset)[0])
+            offset += 8
+        else:
+            (length,) = struct.unpack_from("<I", buf, offset)
+            offset += 4
+            value = buf[offset : offset + length]
+            offset += length
+            column.append(str(value, "utf8") if kind == _COLUMN_TEXT else bytes(value))
+    return (column, offset)
+
+
 class Translations(GeneratedTranslations):
     def __init__(self, backend: Optional[ref[RustBackend]]):
         self.backend = backend
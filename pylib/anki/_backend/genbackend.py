@@ -98,7 +98,7 @@ def get_input_assign(msg):
     return ", ".join(f"{f.name}={f.name}" for f in fields)
 
 
-def render_method(service_idx, method_idx, method):
+def render_method(service_idx, method_idx, method, is_async=False):
     input_name = method.input_type.name
     if (
         (input_name.endswith("In") or len(method.input_type.fields) < 2)
@@ -130,16 +130,21 @@ def render_method(service_idx, method_idx, method):
     if method.name in SKIP_DECODE:
         return_type = "bytes"
 
+    if is_async:
+        (def_, await_) = ("async def", "await ")
+    else:
+        (def_, await_) = ("def", "")
+
     buf = f"""\
-    def {name}({input_args}) -> {return_type}:
+    {def_} {name}({input_args}) -> {return_type}:
         {input_assign_outer}"""
 
     if method.name in SKIP_DECODE:
-        buf += f"""return self._run_command({service_idx}, {method_idx}, input)
+        buf += f"""return {await_}self._run_command({service_idx}, {method_idx}, input)
 """
     else:
         buf += f"""output = pb.{method.output_type.name}()
-        output.ParseFromString(self._run_command({service_idx}, {method_idx}, input))
+        output.ParseFromString({await_}self._run_command({service_idx}, {method_idx}, input))
         return output{single_field}
 """
 
@@ -147,6 +152,7 @@ def render_method(service_idx, method_idx, method):
 
 
 out = []
+async_out = []
 
 
 def render_service(
@@ -154,6 +160,9 @@ def render_service(
 ) -> None:
     for method_index, method in enumerate(service.methods):
         out.append(render_method(service_index, method_index, method))
+        async_out.append(
+            render_method(service_index, method_index, method, is_async=True)
+        )
 
 
 for service in pb.ServiceIndex.DESCRIPTOR.values:
@@ -167,6 +176,7 @@ for service in pb.ServiceIndex.DESCRIPTOR.values:
 
 
 out = "\n".join(out)
+async_out = "\n".join(async_out)
 
 
 open(sys.argv[1], "wb").write(
@@ -196,5 +206,13 @@ class RustBackendGenerated:
     
 '''
         + out
+        + """
+
+class AsyncRustBackendGenerated:
+    async def _run_command(self, service: int, method: int, input: Any) -> bytes:
+        raise Exception("not implemented")
+    
+"""
+        + async_out
     ).encode("utf8")
 )
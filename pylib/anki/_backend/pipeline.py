@@ -0,0 +1,72 @@
+# Copyright: Ankitects Pty Ltd and contributors
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Tuple
+
+from anki._backend.generated import RustBackendGenerated
+
+if TYPE_CHECKING:
+    from anki._backend import RustBackend
+
+
+class BackendPipeline:
+    """Queues up calls to backend methods, so they can be run with a single
+    call into the backend.
+
+    pipeline = col._backend.pipeline()
+    pipeline.get_card(card_id1)
+    pipeline.get_card(card_id2)
+    (card1, card2) = pipeline.execute()
+
+    The queued methods must not depend on each other's output. All methods
+    are run; if any of them failed, the first error is raised.
+    """
+
+    def __init__(self, backend: RustBackend) -> None:
+        self._backend = backend
+        self._calls: List[Tuple[Callable, Tuple, Dict[str, Any]]] = []
+
+    def __getattr__(self, name: str) -> Callable[..., None]:
+        method = getattr(RustBackendGenerated, name)
+
+        def queue(*args: Any, **kwargs: Any) -> None:
+            self._calls.append((method, args, kwargs))
+
+        return queue
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def execute(self) -> List[Any]:
+        "Run the queued methods, returning their outputs in order."
+        calls, self._calls = self._calls, []
+        if not calls:
+            return []
+
+        # run the generated methods once to capture their inputs, then again
+        # to decode the outputs
+        recorder = _RecordingBackend()
+        for (method, args, kwargs) in calls:
+            method(recorder, *args, **kwargs)
+        outputs = self._backend._run_commands(recorder.commands)
+        replayer = _ReplayingBackend(iter(outputs))
+        return [method(replayer, *args, **kwargs) for (method, args, kwargs) in calls]
+
+
+class _RecordingBackend(RustBackendGenerated):
+    def __init__(self) -> None:
+        self.commands: List[Tuple[int, int, bytes]] = []
+
+    def _run_command(self, service: int, method: int, input: Any) -> bytes:
+        self.commands.append((service, method, input.SerializeToString()))
+        return b""
+
+
+class _ReplayingBackend(RustBackendGenerated):
+    def __init__(self, outputs: Iterator[bytes]) -> None:
+        self.outputs = outputs
+
+    def _run_command(self, service: int, method: int, input: Any) -> bytes:
+        return next(self.outputs)
@@ -0,0 +1,197 @@
+# Copyright: Ankitects Pty Ltd and contributors
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from . import backend_pb2 as pb
+
+# upper bounds of the latency histogram buckets, in seconds; 10µs to 100s
+_BUCKETS = [mult * 10.0 ** exp for exp in range(-5, 2) for mult in (1, 2, 5)] + [100.0]
+
+_PERCENTILES = (50, 90, 99)
+
+
+class CallStats:
+    "Aggregated timings of a single backend method or SQL statement."
+
+    __slots__ = ("count", "total_secs", "max_secs", "bytes_in", "bytes_out", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_secs = 0.0
+        self.max_secs = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.buckets = [0] * (len(_BUCKETS) + 1)
+
+    def record(self, secs: float, bytes_in: int, bytes_out: int) -> None:
+        self.count += 1
+        self.total_secs += secs
+        if secs > self.max_secs:
+            self.max_secs = secs
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        self.buckets[bisect_left(_BUCKETS, secs)] += 1
+
+    def percentile(self, percent: int) -> float:
+        "Upper bound of the bucket containing the given percentile, in seconds."
+        target = self.count * percent / 100
+        seen = 0
+        for idx, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target and count:
+                return (
+                    min(_BUCKETS[idx], self.max_secs)
+                    if idx < len(_BUCKETS)
+                    else self.max_secs
+                )
+        return 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(
+            count=self.count,
+            total_ms=self.total_secs * 1000,
+            mean_ms=self.total_secs * 1000 / self.count if self.count else 0,
+            max_ms=self.max_secs * 1000,
+            bytes_in=self.bytes_in,
+            bytes_out=self.bytes_out,
+        )
+        for percent in _PERCENTILES:
+            out[f"p{percent}_ms"] = self.percentile(percent) * 1000
+        return out
+
+
+class BackendProfiler:
+    """Records the number of calls, latency and payload sizes of backend
+    method calls, and of DB statements run through the DBProxy.
+
+    Latencies are kept in a fixed set of histogram buckets, so recording a
+    call is cheap and memory use does not grow over time.
+    """
+
+    def __init__(self) -> None:
+        self.methods: Dict[Tuple[int, int], CallStats] = {}
+        self.sql: Dict[str, CallStats] = {}
+        self.pipelines = CallStats()
+        # calls may be made from background threads
+        self._lock = threading.Lock()
+
+    def record_command(
+        self, service: int, method: int, secs: float, bytes_in: int, bytes_out: int
+    ) -> None:
+        key = (service, method)
+        with self._lock:
+            if not (stats := self.methods.get(key)):
+                stats = self.methods[key] = CallStats()
+            stats.record(secs, bytes_in, bytes_out)
+
+    def record_pipeline(
+        self, secs: float, commands: List[Tuple[int, int, int, int]]
+    ) -> None:
+        """Record a batch of (service, method, bytes_in, bytes_out) commands run
+        together. Each method is also recorded on its own, with an equal
+        share of the batch's time."""
+        share = secs / len(commands) if commands else 0.0
+        with self._lock:
+            self.pipelines.record(
+                secs,
+                sum(bytes_in for (_, _, bytes_in, _) in commands),
+                sum(bytes_out for (_, _, _, bytes_out) in commands),
+            )
+            for (service, method, bytes_in, bytes_out) in commands:
+                key = (service, method)
+                if not (stats := self.methods.get(key)):
+                    stats = self.methods[key] = CallStats()
+                stats.record(share, bytes_in, bytes_out)
+
+    def record_db_command(
+        self, input: Dict[str, Any], secs: float, bytes_in: int, bytes_out: int
+    ) -> None:
+        if sql := input.get("sql"):
+            key = sql_fingerprint(sql)
+        else:
+            key = input["kind"]
+        with self._lock:
+            if not (stats := self.sql.get(key)):
+                stats = self.sql[key] = CallStats()
+            stats.record(secs, bytes_in, bytes_out)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.methods.clear()
+            self.sql.clear()
+            self.pipelines = CallStats()
+
+    def to_dict(self) -> Dict[str, Any]:
+        "Stats keyed by method name and SQL fingerprint, slowest first."
+        with self._lock:
+            return dict(
+                methods=_sorted_by_total(
+                    (method_name(service, method), stats)
+                    for (service, method), stats in self.methods.items()
+                ),
+                sql=_sorted_by_total(self.sql.items()),
+                pipelines=self.pipelines.to_dict(),
+            )
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+
+def _sorted_by_total(items: Any) -> Dict[str, Dict[str, Any]]:
+    entries: List[Tuple[str, CallStats]] = sorted(
+        items, key=lambda item: item[1].total_secs, reverse=True
+    )
+    return {name: stats.to_dict() for name, stats in entries}
+
+
+@lru_cache(maxsize=None)
+def _services_by_index() -> Dict[int, Any]:
+    # SERVICE_INDEX_DECK_CONFIG -> DeckConfigService
+    by_upper_name = {
+        name.upper(): service
+        for name, service in pb.DESCRIPTOR.services_by_name.items()
+    }
+    services = {}
+    for index in pb.ServiceIndex.DESCRIPTOR.values:
+        name = index.name.replace("SERVICE_INDEX_", "").replace("_", "") + "SERVICE"
+        if name in by_upper_name:
+            services[index.number] = by_upper_name[name]
+    return services
+
+
+@lru_cache(maxsize=None)
+def method_name(service: int, method: int) -> str:
+    "Eg 'SchedulingService.GetQueuedCards'."
+    try:
+        service_obj = _services_by_index()[service]
+        return f"{service_obj.name}.{service_obj.methods[method].name}"
+    except (KeyError, IndexError):
+        return f"{service}.{method}"
+
+
+_fingerprint_literals = re.compile(
+    r"""
+    '(?:[^']|'')*'              # strings
+    | \b\d+(?:\.\d+)?\b         # numbers
+    """,
+    re.VERBOSE,
+)
+_fingerprint_lists = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_fingerprint_spaces = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def sql_fingerprint(sql: str) -> str:
+    """Normalize sql so that statements that only differ in their literal
+    values are grouped together, eg 'select * from cards where id in (?)'."""
+    sql = _fingerprint_literals.sub("?", sql)
+    sql = _fingerprint_lists.sub("(?)", sql)
+    return _fingerprint_spaces.sub(" ", sql).strip()
@@ -1,7 +1,12 @@
+from typing import List, Tuple
+
 def buildhash() -> str: ...
 def open_backend(data: bytes) -> Backend: ...
 
 class Backend:
     @classmethod
     def command(self, service: int, method: int, data: bytes) -> bytes: ...
+    def command_batch(
+        self, commands: List[Tuple[int, int, bytes]]
+    ) -> List[Tuple[bool, bytes]]: ...
     def db_command(self, data: bytes) -> bytes: ...
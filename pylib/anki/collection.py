@@ -30,11 +30,12 @@ import sys
 import time
 import traceback
 import weakref
+from concurrent.futures import Executor
 from dataclasses import dataclass, field
 
 import anki.latex
-from anki import hooks
-from anki._backend import RustBackend, Translations
+from anki import hooks, tables
+from anki._backend import AsyncRustBackend, RustBackend, Translations
 from anki.cards import Card, CardId
 from anki.config import Config, ConfigManager
 from anki.consts import *
@@ -42,7 +43,7 @@ from anki.dbproxy import DBProxy
 from anki.decks import Deck, DeckConfig, DeckConfigId, DeckId, DeckManager
 from anki.errors import AbortSchemaModification, DBError, InvalidInput
 from anki.lang import FormatTimeSpan
-from anki.media import MediaManager, media_paths_from_col_path
+from anki.media import CheckMediaOut, MediaManager, media_paths_from_col_path
 from anki.models import ModelManager, Notetype, NotetypeDict, NotetypeId
 from anki.notes import Note, NoteId
 from anki.scheduler.v1 import Scheduler as V1Scheduler
@@ -131,6 +132,25 @@ class Collection:
     ) -> str:
         return self._backend.format_timespan(seconds=seconds, context=context)
 
+    # Profiling
+    ##########################################################################
+
+    def set_backend_profiling_enabled(self, enabled: bool) -> None:
+        """Start or stop recording backend call statistics. Can also be enabled
+        at startup by setting ANKI_PROFILE_BACKEND=1."""
+        self._backend.set_profiling_enabled(enabled)
+
+    def backend_stats(self, reset: bool = False) -> Optional[Dict[str, Any]]:
+        """Call count, latency and payload sizes of each backend method and
+        SQL statement since profiling was enabled, or None if disabled. The
+        result can be passed to json.dumps()."""
+        if not (profiler := self._backend.profiler):
+            return None
+        stats = profiler.to_dict()
+        if reset:
+            profiler.reset()
+        return stats
+
     # Progress
     ##########################################################################
 
@@ -316,6 +336,18 @@ class Collection:
     def get_card(self, id: CardId) -> Card:
         return Card(self, id)
 
+    def get_cards(self, ids: Sequence[CardId]) -> List[Card]:
+        "Like get_card(), but fetches all cards with a single backend call."
+        pipeline = self._backend.pipeline()
+        for id in ids:
+            pipeline.get_card(id)
+        cards = []
+        for backend_card in pipeline.execute():
+            card = Card(self)
+            card._load_from_backend_card(backend_card)
+            cards.append(card)
+        return cards
+
     def update_card(self, card: Card) -> None:
         """Save card changes to database, and add an undo entry.
         Unlike card.flush(), this will invalidate any current checkpoint."""
@@ -829,9 +861,24 @@ table.review-log {{ {revlog_style} }}
     def studied_today(self) -> str:
         return self._backend.studied_today()
 
+    def rebuild_revlog_days(self) -> None:
+        """Rebuild the daily review totals that the stats are read from. They
+        are kept up to date automatically, so this is only needed if they
+        have been damaged."""
+        self._backend.update_revlog_days(True)
+
     def graph_data(self, search: str, days: int) -> bytes:
         return self._backend.graphs(search=search, days=days)
 
+    def revlog_table(self, search: str = "") -> Any:
+        """The review log of cards matching search, as a NumPy structured array.
+        See anki.tables for the columns, and for reading in batches."""
+        return tables.revlog_table(self, search)
+
+    def cards_table(self, search: str = "") -> Any:
+        "Cards matching search, as a NumPy structured array. See anki.tables."
+        return tables.cards_table(self, search)
+
     def get_graph_preferences(self) -> bytes:
         return self._backend.get_graph_preferences()
 
@@ -1138,6 +1185,69 @@ table.review-log {{ {revlog_style} }}
         "Not intended for public consumption at this time."
         return self._backend.render_markdown(markdown=text, sanitize=sanitize)
 
+    def as_async(self, executor: Optional[Executor] = None) -> AsyncCollection:
+        "Awaitable versions of slow operations. See AsyncCollection."
+        return AsyncCollection(self, executor)
+
+
+class AsyncCollection:
+    """Awaitable versions of collection methods that may take a long time,
+    for use from asyncio code.
+
+    The calls are run on the provided executor, or the event loop's default
+    executor, and don't hold the GIL while the backend is working. Other
+    methods should be called on the wrapped collection as usual.
+    """
+
+    def __init__(self, col: Collection, executor: Optional[Executor] = None) -> None:
+        self.col = col
+        self._backend = AsyncRustBackend(col._backend, executor)
+
+    async def find_cards(
+        self,
+        query: str,
+        order: Union[bool, str, BrowserColumns.Column] = False,
+        reverse: bool = False,
+    ) -> Sequence[CardId]:
+        "See Collection.find_cards()."
+        mode = self.col._build_sort_mode(order, reverse, False)
+        return cast(
+            Sequence[CardId], await self._backend.search_cards(search=query, order=mode)
+        )
+
+    async def find_notes(
+        self,
+        query: str,
+        order: Union[bool, str, BrowserColumns.Column] = False,
+        reverse: bool = False,
+    ) -> Sequence[NoteId]:
+        "See Collection.find_notes()."
+        mode = self.col._build_sort_mode(order, reverse, True)
+        return cast(
+            Sequence[NoteId], await self._backend.search_notes(search=query, order=mode)
+        )
+
+    async def check_media(self) -> CheckMediaOut:
+        "See MediaManager.check()."
+        output = await self._backend.check_media()
+        self.col.save()
+        return output
+
+    async def graph_data(self, search: str, days: int) -> bytes:
+        return await self._backend.graphs(search=search, days=days)
+
+    async def sync_collection(self, auth: SyncAuth) -> SyncOutput:
+        return await self._backend.sync_collection(auth)
+
+    async def sync_media(self, auth: SyncAuth) -> None:
+        await self._backend.sync_media(auth)
+
+    async def full_upload(self, auth: SyncAuth) -> None:
+        await self._backend.full_upload(auth)
+
+    async def full_download(self, auth: SyncAuth) -> None:
+        await self._backend.full_download(auth)
+
 
 # legacy name
 _Collection = Collection
@@ -3,9 +3,10 @@
 
 from __future__ import annotations
 
+import itertools
 import re
 from re import Match
-from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 import anki
 
@@ -50,14 +51,16 @@ class DBProxy:
         first_row_only: bool = False,
         **kwargs: ValueForDB,
     ) -> List[Row]:
-        # mark modified?
+        self._mark_modified(sql)
+        sql, args2 = emulate_named_args(sql, args, kwargs)
+        # fetch rows
+        return self._backend.db_query(sql, args2, first_row_only)
+
+    def _mark_modified(self, sql: str) -> None:
         s = sql.strip().lower()
         for stmt in "insert", "update", "delete":
             if s.startswith(stmt):
                 self.modified_in_python = True
-        sql, args2 = emulate_named_args(sql, args, kwargs)
-        # fetch rows
-        return self._backend.db_query(sql, args2, first_row_only)
 
     # Query shortcuts
     ###################
@@ -84,6 +87,29 @@ class DBProxy:
         else:
             return None
 
+    def iter(
+        self,
+        sql: str,
+        *args: ValueForDB,
+        batch_size: int = 1000,
+        **kwargs: ValueForDB,
+    ) -> Iterator[Row]:
+        """Like .all(), but rows are passed to Python in batches of batch_size
+        as they are consumed, instead of building a list of every row.
+
+        The rows are a snapshot taken when iteration starts, so the database
+        can be safely modified while iterating. The backend holds the rows
+        of a select in a temporary table, so memory use stays flat however
+        many rows there are."""
+        self._mark_modified(sql)
+        sql, args2 = emulate_named_args(sql, args, kwargs)
+        id = self._backend.db_iter_start(sql, args2)
+        try:
+            while rows := self._backend.db_iter_next(id, batch_size):
+                yield from rows
+        finally:
+            self._backend.db_iter_close(id)
+
     # execute used to return a pysqlite cursor, but now is synonymous
     # with .all()
     execute = all
@@ -91,13 +117,25 @@ class DBProxy:
     # Updates
     ################
 
-    def executemany(self, sql: str, args: Iterable[Sequence[ValueForDB]]) -> None:
+    def executemany(
+        self,
+        sql: str,
+        args: Iterable[Sequence[ValueForDB]],
+        batch_size: int = 1000,
+    ) -> None:
+        """Execute sql once for each item in args.
+        If args is not a list, it is consumed in batches of batch_size, so a
+        generator (eg from .iter()) does not need to be held in memory at once."""
         self.modified_in_python = True
         if isinstance(args, list):
-            list_args = args
-        else:
-            list_args = list(args)
-        self._backend.db_execute_many(sql, list_args)
+            self._backend.db_execute_many(sql, args)
+            return
+        it = iter(args)
+        while True:
+            list_args = list(itertools.islice(it, batch_size))
+            self._backend.db_execute_many(sql, list_args)
+            if len(list_args) < batch_size:
+                break
 
 
 # convert kwargs to list format
@@ -5,15 +5,20 @@ import json
 import os
 import re
 import shutil
+import threading
 import unicodedata
 import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from io import BufferedWriter
-from typing import Any, Dict, List, Optional, Tuple, Union
-from zipfile import ZipFile
+from typing import IO, Any, Deque, Dict, Iterator, List, Optional, Tuple, Union
+from zipfile import ZipFile, ZipInfo
 
 from anki import hooks
 from anki.cards import CardId
 from anki.collection import Collection
+from anki.dbproxy import Row
 from anki.decks import DeckId
 from anki.utils import ids2str, namedtmp, splitFields, stripHTML
 
@@ -208,37 +213,37 @@ class AnkiExporter(Exporter):
         cids = self.cardIds()
         # copy cards, noting used nids
         nids = {}
-        data = []
-        for row in self.src.db.execute(
-            "select * from cards where id in " + ids2str(cids)
-        ):
-            nids[row[1]] = True
-            data.append(row)
-            # clear flags
-            row = list(row)
-            row[-2] = 0
+
+        def cards() -> Iterator[Row]:
+            for row in self.src.db.iter(
+                "select * from cards where id in " + ids2str(cids)
+            ):
+                nids[row[1]] = True
+                yield row
+
         self.dst.db.executemany(
-            "insert into cards values (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", data
+            "insert into cards values (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", cards()
         )
         # notes
         strnids = ids2str(list(nids.keys()))
-        notedata = []
-        for row in self.src.db.all("select * from notes where id in " + strnids):
-            # remove system tags if not exporting scheduling info
-            if not self.includeSched:
-                row = list(row)
-                row[5] = self.removeSystemTags(row[5])
-            notedata.append(row)
+
+        def notes() -> Iterator[Row]:
+            for row in self.src.db.iter("select * from notes where id in " + strnids):
+                # remove system tags if not exporting scheduling info
+                if not self.includeSched:
+                    row[5] = self.removeSystemTags(row[5])
+                yield row
+
         self.dst.db.executemany(
-            "insert into notes values (?,?,?,?,?,?,?,?,?,?,?)", notedata
+            "insert into notes values (?,?,?,?,?,?,?,?,?,?,?)", notes()
         )
         # models used by the notes
         mids = self.dst.db.list("select distinct mid from notes where id in " + strnids)
         # card history and revlog
         if self.includeSched:
-            data = self.src.db.all("select * from revlog where cid in " + ids2str(cids))
             self.dst.db.executemany(
-                "insert into revlog values (?,?,?,?,?,?,?,?,?)", data
+                "insert into revlog values (?,?,?,?,?,?,?,?,?)",
+                self.src.db.iter("select * from revlog where cid in " + ids2str(cids)),
             )
         else:
             # need to reset card state
@@ -273,9 +278,7 @@ class AnkiExporter(Exporter):
         media = {}
         self.mediaDir = self.src.media.dir()
         if self.includeMedia:
-            for row in notedata:
-                flds = row[6]
-                mid = row[2]
+            for mid, flds in self.dst.db.iter("select mid, flds from notes"):
                 for file in self.src.media.filesInStr(mid, flds):
                     # skip files in subdirs
                     if file != os.path.basename(file):
@@ -322,6 +325,82 @@ class AnkiExporter(Exporter):
 # Packaged Anki decks
 ######################################################################
 
+# files are read and deflated in chunks of this size, with the chunks of a
+# file compressed in parallel
+DEFLATE_CHUNK_SIZE = 1024 * 1024
+
+# media with other extensions is usually compressed already, so is stored
+COMPRESSIBLE_EXTS = {
+    ".css",
+    ".csv",
+    ".htm",
+    ".html",
+    ".js",
+    ".json",
+    ".md",
+    ".otf",
+    ".svg",
+    ".ttf",
+    ".tsv",
+    ".txt",
+    ".xml",
+}
+
+_deflateExecutor: Optional[ThreadPoolExecutor] = None
+_deflateExecutorLock = threading.Lock()
+
+
+def _deflateChunk(data: bytes) -> bytes:
+    comp = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    # a sync flush ends on a byte boundary without ending the stream, so
+    # the chunks can be concatenated
+    return comp.compress(data) + comp.flush(zlib.Z_SYNC_FLUSH)
+
+
+class _ParallelDeflater:
+    """Used in place of the zlib compressor of a zip member being written.
+    Each chunk passed to compress() is deflated on a thread pool, and the
+    results are returned in order as they finish, so the member is still
+    written sequentially. The chunks are compressed independently, which
+    costs a little in size."""
+
+    def __init__(self) -> None:
+        global _deflateExecutor
+        workers = os.cpu_count() or 1
+        with _deflateExecutorLock:
+            if not _deflateExecutor:
+                _deflateExecutor = ThreadPoolExecutor(max_workers=workers)
+        self._executor = _deflateExecutor
+        # bounds the memory used by chunks waiting to be written
+        self._maxPending = 2 * workers
+        self._pending: Deque[Future] = deque()
+
+    def compress(self, data: bytes) -> bytes:
+        self._pending.append(self._executor.submit(_deflateChunk, data))
+        out = []
+        while self._pending and (
+            self._pending[0].done() or len(self._pending) > self._maxPending
+        ):
+            out.append(self._pending.popleft().result())
+        return b"".join(out)
+
+    def flush(self) -> bytes:
+        out = [future.result() for future in self._pending]
+        self._pending.clear()
+        # an empty final block ends the stream
+        out.append(zlib.compressobj(wbits=-15).flush())
+        return b"".join(out)
+
+
+def _useParallelDeflater(dst: IO[bytes]) -> None:
+    """Deflate the zip member being written on several threads. This relies on
+    the private _compressor of zipfile's member writer, whose compress() and
+    flush() are called by write() and close(), as in CPython 3.8 to 3.11. If
+    it's missing, the member is deflated normally."""
+    if hasattr(dst, "_compressor"):
+        # pylint: disable=protected-access
+        dst._compressor = _ParallelDeflater()  # type: ignore
+
 
 class AnkiPackageExporter(AnkiExporter):
 
@@ -347,12 +426,12 @@ class AnkiPackageExporter(AnkiExporter):
         colfile = path.replace(".apkg", ".anki2")
         AnkiExporter.exportInto(self, colfile)
         if not self._v2sched:
-            z.write(colfile, "collection.anki2")
+            self._writeFile(z, colfile, "collection.anki2", compress=True)
         else:
             # prevent older clients from accessing
             # pylint: disable=unreachable
             self._addDummyCollection(z)
-            z.write(colfile, "collection.anki21")
+            self._writeFile(z, colfile, "collection.anki21", compress=True)
 
         # and media
         self.prepareMedia()
@@ -372,18 +451,29 @@ class AnkiPackageExporter(AnkiExporter):
             cStr = str(c)
             file = hooks.media_file_filter(file)
             mpath = os.path.join(fdir, file)
-            if os.path.isdir(mpath):
-                continue
-            if os.path.exists(mpath):
-                if re.search(r"\.svg$", file, re.IGNORECASE):
-                    z.write(mpath, cStr, zipfile.ZIP_DEFLATED)
-                else:
-                    z.write(mpath, cStr, zipfile.ZIP_STORED)
+            compress = os.path.splitext(file)[1].lower() in COMPRESSIBLE_EXTS
+            if self._writeFile(z, mpath, cStr, compress):
                 media[cStr] = unicodedata.normalize("NFC", file)
                 hooks.media_files_did_export(c)
 
         return media
 
+    def _writeFile(self, z: ZipFile, path: str, arcname: str, compress: bool) -> bool:
+        """Stream the file at path into the zip, deflating it if compress is
+        true. Returns false if it is missing or a folder."""
+        try:
+            zinfo = ZipInfo.from_file(path, arcname)
+        except OSError:
+            return False
+        if zinfo.is_dir():
+            return False
+        zinfo.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        with open(path, "rb") as src, z.open(zinfo, "w") as dst:
+            if compress:
+                _useParallelDeflater(dst)
+            shutil.copyfileobj(src, dst, DEFLATE_CHUNK_SIZE)
+        return True
+
     def prepareMedia(self) -> None:
         # chance to move each file in self.mediaFiles into place before media
         # is zipped up
@@ -400,7 +490,7 @@ class AnkiPackageExporter(AnkiExporter):
         c.save()
         c.close(downgrade=True)
 
-        zip.write(path, "collection.anki2")
+        self._writeFile(zip, path, "collection.anki2", compress=True)
         os.unlink(path)
 
 
@@ -429,10 +519,10 @@ class AnkiCollectionPackageExporter(AnkiPackageExporter):
         mdir = self.col.media.dir()
         self.col.close(downgrade=True)
         if not v2:
-            z.write(self.col.path, "collection.anki2")
+            self._writeFile(z, self.col.path, "collection.anki2", compress=True)
         else:
             self._addDummyCollection(z)
-            z.write(self.col.path, "collection.anki21")
+            self._writeFile(z, self.col.path, "collection.anki21", compress=True)
         # copy all media
         if not self.includeMedia:
             return {}
@@ -1,9 +1,23 @@
 # Copyright: Ankitects Pty Ltd and contributors
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 
+import hashlib
+import itertools
 import os
+import shutil
 import unicodedata
-from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 
 from anki.cards import CardId
 from anki.collection import Collection
@@ -12,12 +26,37 @@ from anki.decks import DeckId, DeckManager
 from anki.importing.base import Importer
 from anki.models import NotetypeId
 from anki.notes import NoteId
-from anki.utils import intTime, joinFields, splitFields, stripHTMLMedia
+from anki.utils import ids2str, intTime, joinFields, splitFields, stripHTMLMedia
 
 GUID = 1
 MID = 2
 MOD = 3
 
+# notes are imported this many at a time; kept below SQLite's default limit
+# on query parameters
+NOTE_BATCH_SIZE = 500
+
+# media files are hashed and copied this many bytes at a time
+MEDIA_CHUNK_SIZE = 1024 * 1024
+
+T = TypeVar("T")
+
+
+def _chunks(items: Iterable[T], n: int) -> Iterator[List[T]]:
+    it = iter(items)
+    while chunk := list(itertools.islice(it, n)):
+        yield chunk
+
+
+def _hashFile(file: BinaryIO) -> Optional[str]:
+    "SHA1 of the file's content, or None if it's empty."
+    sha = hashlib.sha1()
+    empty = True
+    while chunk := file.read(MEDIA_CHUNK_SIZE):
+        sha.update(chunk)
+        empty = False
+    return None if empty else sha.hexdigest()
+
 
 class Anki2Importer(Importer):
 
@@ -32,6 +71,10 @@ class Anki2Importer(Importer):
 
         # set later, defined here for typechecking
         self._decks: Dict[DeckId, DeckId] = {}
+        self._notes: Dict[str, Tuple[NoteId, int, NotetypeId]] = {}
+        # dst name -> src name of media files waiting to be copied
+        self._mediaToCopy: Dict[str, str] = {}
+        self._srcHashes: Dict[str, Optional[str]] = {}
         self.source_needs_upgrade = False
 
     def run(self, media: None = None) -> None:
@@ -60,6 +103,8 @@ class Anki2Importer(Importer):
 
     def _import(self) -> None:
         self._decks = {}
+        self._srcHashes = {}
+        self._mediaToCopy = {}
         if self.deckPrefix:
             id = self.dst.decks.id(self.deckPrefix)
             self.dst.decks.select(id)
@@ -68,123 +113,154 @@ class Anki2Importer(Importer):
         self._importNotes()
         self._importCards()
         self._importStaticMedia()
+        self._copyMedia()
         self._postImport()
         self.dst.optimize()
 
     # Notes
     ######################################################################
 
-    def _logNoteRow(self, action: str, noteRow: List[str]) -> None:
-        self.log.append(
-            "[%s] %s" % (action, stripHTMLMedia(noteRow[6].replace("\x1f", ", ")))
-        )
+    def _noteRowText(self, noteRow: List[str]) -> str:
+        return stripHTMLMedia(noteRow[6].replace("\x1f", ", "))
 
     def _importNotes(self) -> None:
-        # build guid -> (id,mod,mid) hash & map of existing note ids
-        self._notes: Dict[str, Tuple[NoteId, int, NotetypeId]] = {}
-        existing = {}
-        for id, guid, mod, mid in self.dst.db.execute(
-            "select id, guid, mod, mid from notes"
-        ):
-            self._notes[guid] = (id, mod, mid)
-            existing[id] = True
+        # index the guid, id, mod and mid of existing notes in a temporary
+        # table, so they can be looked up without loading them all into
+        # Python; _importCards() uses it too
+        self.dst.db.execute("drop table if exists temp.import_notes")
+        self.dst.db.execute(
+            "create temp table import_notes (guid text primary key, "
+            "id integer, mod integer, mid integer) without rowid"
+        )
+        self.dst.db.execute(
+            "insert or replace into temp.import_notes "
+            "select guid, id, mod, mid from notes order by id"
+        )
         # we ignore updates to changed schemas. we need to note the ignored
         # guids, so we avoid importing invalid cards
         self._ignoredGuids: Dict[str, bool] = {}
-        # iterate over source collection
-        add = []
-        update = []
-        dirty = []
+        # notes are read and written in batches; only the log of each note
+        # is kept until the end
+        logged: Dict[str, List[str]] = dict(
+            ignored=[], updated=[], added=[], identical=[]
+        )
         usn = self.dst.usn()
-        dupesIdentical = []
-        dupesIgnored = []
         total = 0
-        for note in self.src.db.execute("select * from notes"):
-            total += 1
-            # turn the db result into a mutable list
-            note = list(note)
-            shouldAdd = self._uniquifyNote(note)
-            if shouldAdd:
-                # ensure id is unique
-                while note[0] in existing:
-                    note[0] += 999
-                existing[note[0]] = True
-                # bump usn
-                note[4] = usn
-                # update media references in case of dupes
-                note[6] = self._mungeMedia(note[MID], note[6])
-                add.append(note)
-                dirty.append(note[0])
-                # note we have the added the guid
-                self._notes[note[GUID]] = (note[0], note[3], note[MID])
-            else:
-                # a duplicate or changed schema - safe to update?
-                if self.allowUpdate:
-                    oldNid, oldMod, oldMid = self._notes[note[GUID]]
-                    # will update if incoming note more recent
-                    if oldMod < note[MOD]:
-                        # safe if note types identical
-                        if oldMid == note[MID]:
-                            # incoming note should use existing id
-                            note[0] = oldNid
-                            note[4] = usn
-                            note[6] = self._mungeMedia(note[MID], note[6])
-                            update.append(note)
-                            dirty.append(note[0])
+        for batch in _chunks(self.src.db.iter("select * from notes"), NOTE_BATCH_SIZE):
+            total += len(batch)
+            # turn the db results into mutable lists
+            notes = [list(note) for note in batch]
+            self._notes = self._dstNotes([note[GUID] for note in notes])
+            taken = set(
+                self.dst.db.list(
+                    "select id from notes where id in %s"
+                    % ids2str(note[0] for note in notes)
+                )
+            )
+            add = []
+            update = []
+            for note in notes:
+                shouldAdd = self._uniquifyNote(note)
+                if shouldAdd:
+                    # ensure id is unique
+                    while note[0] in taken:
+                        note[0] += 999
+                        if self.dst.db.scalar(
+                            "select 1 from notes where id = ?", note[0]
+                        ):
+                            taken.add(note[0])
+                    taken.add(note[0])
+                    # bump usn
+                    note[4] = usn
+                    # update media references in case of dupes
+                    note[6] = self._mungeMedia(note[MID], note[6])
+                    add.append(note)
+                    logged["added"].append(self._noteRowText(note))
+                    # note we have the added the guid
+                    self._notes[note[GUID]] = (note[0], note[3], note[MID])
+                else:
+                    # a duplicate or changed schema - safe to update?
+                    if self.allowUpdate:
+                        oldNid, oldMod, oldMid = self._notes[note[GUID]]
+                        # will update if incoming note more recent
+                        if oldMod < note[MOD]:
+                            # safe if note types identical
+                            if oldMid == note[MID]:
+                                # incoming note should use existing id
+                                note[0] = oldNid
+                                note[4] = usn
+                                note[6] = self._mungeMedia(note[MID], note[6])
+                                update.append(note)
+                                logged["updated"].append(self._noteRowText(note))
+                            else:
+                                logged["ignored"].append(self._noteRowText(note))
+                                self._ignoredGuids[note[GUID]] = True
                         else:
-                            dupesIgnored.append(note)
-                            self._ignoredGuids[note[GUID]] = True
-                    else:
-                        dupesIdentical.append(note)
+                            logged["identical"].append(self._noteRowText(note))
+            # add to col
+            self.dst.db.executemany(
+                "insert or replace into notes values (?,?,?,?,?,?,?,?,?,?,?)", add
+            )
+            self.dst.db.executemany(
+                "insert or replace into notes values (?,?,?,?,?,?,?,?,?,?,?)",
+                update,
+            )
+            self.dst.db.executemany(
+                "insert or replace into temp.import_notes values (?,?,?,?)",
+                [(n[GUID], n[0], n[MOD], n[MID]) for n in add],
+            )
+            self.dst.updateFieldCache([n[0] for n in add + update])
 
         self.log.append(self.dst.tr.importing_notes_found_in_file(val=total))
 
-        if dupesIgnored:
+        if logged["ignored"]:
             self.log.append(
                 self.dst.tr.importing_notes_that_could_not_be_imported(
-                    val=len(dupesIgnored)
+                    val=len(logged["ignored"])
                 )
             )
-        if update:
+        if logged["updated"]:
             self.log.append(
-                self.dst.tr.importing_notes_updated_as_file_had_newer(val=len(update))
+                self.dst.tr.importing_notes_updated_as_file_had_newer(
+                    val=len(logged["updated"])
+                )
             )
-        if add:
-            self.log.append(self.dst.tr.importing_notes_added_from_file(val=len(add)))
-        if dupesIdentical:
+        if logged["added"]:
+            self.log.append(
+                self.dst.tr.importing_notes_added_from_file(val=len(logged["added"]))
+            )
+        if logged["identical"]:
             self.log.append(
                 self.dst.tr.importing_notes_skipped_as_theyre_already_in(
-                    val=len(dupesIdentical),
+                    val=len(logged["identical"]),
                 )
             )
 
         self.log.append("")
 
-        if dupesIgnored:
-            for row in dupesIgnored:
-                self._logNoteRow(self.dst.tr.importing_skipped(), row)
-        if update:
-            for row in update:
-                self._logNoteRow(self.dst.tr.importing_updated(), row)
-        if add:
-            for row in add:
-                self._logNoteRow(self.dst.tr.adding_added(), row)
-        if dupesIdentical:
-            for row in dupesIdentical:
-                self._logNoteRow(self.dst.tr.importing_identical(), row)
+        for (key, action) in (
+            ("ignored", self.dst.tr.importing_skipped()),
+            ("updated", self.dst.tr.importing_updated()),
+            ("added", self.dst.tr.adding_added()),
+            ("identical", self.dst.tr.importing_identical()),
+        ):
+            self.log.extend(f"[{action}] {text}" for text in logged[key])
 
         # export info for calling code
-        self.dupes = len(dupesIdentical)
-        self.added = len(add)
-        self.updated = len(update)
-        # add to col
-        self.dst.db.executemany(
-            "insert or replace into notes values (?,?,?,?,?,?,?,?,?,?,?)", add
-        )
-        self.dst.db.executemany(
-            "insert or replace into notes values (?,?,?,?,?,?,?,?,?,?,?)", update
-        )
-        self.dst.updateFieldCache(dirty)
+        self.dupes = len(logged["identical"])
+        self.added = len(logged["added"])
+        self.updated = len(logged["updated"])
+
+    def _dstNotes(self, guids: List[str]) -> Dict[str, Tuple[NoteId, int, NotetypeId]]:
+        "Return guid -> (id, mod, mid) of the notes in dst with the given guids."
+        return {
+            guid: (id, mod, mid)
+            for guid, id, mod, mid in self.dst.db.execute(
+                "select guid, id, mod, mid from temp.import_notes where guid in (%s)"
+                % ",".join("?" * len(guids)),
+                *guids,
+            )
+        }
 
     # determine if note is a duplicate, and adjust mid and/or guid as required
     # returns true if note should be added
@@ -301,95 +377,130 @@ class Anki2Importer(Importer):
     def _importCards(self) -> None:
         if self.source_needs_upgrade:
             self.src.upgrade_to_v2_scheduler()
-        # build map of (guid, ord) -> cid and used id cache
-        self._cards: Dict[Tuple[str, int], CardId] = {}
-        existing = {}
-        for guid, ord, cid in self.dst.db.execute(
-            "select f.guid, c.ord, c.id from cards c, notes f " "where c.nid = f.id"
-        ):
-            existing[cid] = True
-            self._cards[(guid, ord)] = cid
-        # loop through src
-        cards = []
-        revlog = []
+        # index the (guid, ord) of existing cards in a temporary table, like
+        # the notes, and write the cards and their revlog in batches
+        self.dst.db.execute("drop table if exists temp.import_cards")
+        self.dst.db.execute(
+            "create temp table import_cards (guid text, ord integer, "
+            "primary key (guid, ord)) without rowid"
+        )
+        self.dst.db.execute(
+            "insert or ignore into temp.import_cards "
+            "select f.guid, c.ord from cards c, notes f where c.nid = f.id"
+        )
         cnt = 0
         usn = self.dst.usn()
         aheadBy = self.src.sched.today - self.dst.sched.today
-        for card in self.src.db.execute(
-            "select f.guid, f.mid, c.* from cards c, notes f " "where c.nid = f.id"
+        for batch in _chunks(
+            self.src.db.iter(
+                "select f.guid, f.mid, c.* from cards c, notes f " "where c.nid = f.id"
+            ),
+            NOTE_BATCH_SIZE,
         ):
-            guid = card[0]
-            if guid in self._ignoredGuids:
-                continue
-            # does the card's note exist in dst col?
-            if guid not in self._notes:
-                continue
-            # does the card already exist in the dst col?
-            ord = card[5]
-            if (guid, ord) in self._cards:
-                # fixme: in future, could update if newer mod time
-                continue
-            # doesn't exist. strip off note info, and save src id for later
-            card = list(card[2:])
-            scid = card[0]
-            # ensure the card id is unique
-            while card[0] in existing:
-                card[0] += 999
-            existing[card[0]] = True
-            # update cid, nid, etc
-            card[1] = self._notes[guid][0]
-            card[2] = self._did(card[2])
-            card[4] = intTime()
-            card[5] = usn
-            # review cards have a due date relative to collection
-            if (
-                card[7] in (QUEUE_TYPE_REV, QUEUE_TYPE_DAY_LEARN_RELEARN)
-                or card[6] == CARD_TYPE_REV
-            ):
-                card[8] -= aheadBy
-            # odue needs updating too
-            if card[14]:
-                card[14] -= aheadBy
-            # if odid true, convert card from filtered to normal
-            if card[15]:
-                # odid
-                card[15] = 0
-                # odue
-                card[8] = card[14]
-                card[14] = 0
-                # queue
-                if card[6] == CARD_TYPE_LRN:  # type
-                    card[7] = QUEUE_TYPE_NEW
-                else:
-                    card[7] = card[6]
-                # type
-                if card[6] == CARD_TYPE_LRN:
-                    card[6] = CARD_TYPE_NEW
-            cards.append(card)
+            guids = list({card[0] for card in batch})
+            self._notes = self._dstNotes(guids)
+            existing = {
+                (guid, ord)
+                for guid, ord in self.dst.db.execute(
+                    "select guid, ord from temp.import_cards where guid in (%s)"
+                    % ",".join("?" * len(guids)),
+                    *guids,
+                )
+            }
+            taken = set(
+                self.dst.db.list(
+                    "select id from cards where id in %s"
+                    % ids2str(card[2] for card in batch)
+                )
+            )
+            cards = []
+            # src card id -> dst card id
+            cids: Dict[CardId, CardId] = {}
+            for card in batch:
+                guid = card[0]
+                if guid in self._ignoredGuids:
+                    continue
+                # does the card's note exist in dst col?
+                if guid not in self._notes:
+                    continue
+                # does the card already exist in the dst col?
+                ord = card[5]
+                if (guid, ord) in existing:
+                    # fixme: in future, could update if newer mod time
+                    continue
+                # doesn't exist. strip off note info, and save src id for later
+                card = list(card[2:])
+                scid = card[0]
+                # ensure the card id is unique
+                while card[0] in taken:
+                    card[0] += 999
+                    if self.dst.db.scalar("select 1 from cards where id = ?", card[0]):
+                        taken.add(card[0])
+                taken.add(card[0])
+                # update cid, nid, etc
+                card[1] = self._notes[guid][0]
+                card[2] = self._did(card[2])
+                card[4] = intTime()
+                card[5] = usn
+                # review cards have a due date relative to collection
+                if (
+                    card[7] in (QUEUE_TYPE_REV, QUEUE_TYPE_DAY_LEARN_RELEARN)
+                    or card[6] == CARD_TYPE_REV
+                ):
+                    card[8] -= aheadBy
+                # odue needs updating too
+                if card[14]:
+                    card[14] -= aheadBy
+                # if odid true, convert card from filtered to normal
+                if card[15]:
+                    # odid
+                    card[15] = 0
+                    # odue
+                    card[8] = card[14]
+                    card[14] = 0
+                    # queue
+                    if card[6] == CARD_TYPE_LRN:  # type
+                        card[7] = QUEUE_TYPE_NEW
+                    else:
+                        card[7] = card[6]
+                    # type
+                    if card[6] == CARD_TYPE_LRN:
+                        card[6] = CARD_TYPE_NEW
+                cards.append(card)
+                cids[scid] = card[0]
+                cnt += 1
             # we need to import revlog, rewriting card ids and bumping usn
-            for rev in self.src.db.execute("select * from revlog where cid = ?", scid):
+            revlog = []
+            for rev in self.src.db.execute(
+                "select * from revlog where cid in %s" % ids2str(cids)
+            ):
                 rev = list(rev)
-                rev[1] = card[0]
-                rev[2] = self.dst.usn()
+                rev[1] = cids[rev[1]]
+                rev[2] = usn
                 revlog.append(rev)
-            cnt += 1
-        # apply
-        self.dst.db.executemany(
-            """
+            # apply
+            self.dst.db.executemany(
+                """
 insert or ignore into cards values (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
-            cards,
-        )
-        self.dst.db.executemany(
-            """
+                cards,
+            )
+            self.dst.db.executemany(
+                """
 insert or ignore into revlog values (?,?,?,?,?,?,?,?,?)""",
-            revlog,
-        )
+                revlog,
+            )
+        self.dst.db.execute("drop table temp.import_notes")
+        self.dst.db.execute("drop table temp.import_cards")
 
     # Media
     ######################################################################
+    # Files are compared by hash as notes are imported, and the ones that
+    # need copying are queued, then copied together by _copyMedia(). A file
+    # is only compared with the dst file of the same name; identical files
+    # stored under other names are not detected.
 
     # note: this func only applies to imports of .anki2. for .apkg files, the
-    # apkg importer does the copying
+    # apkg importer overrides it
     def _importStaticMedia(self) -> None:
         # Import any '_foo' prefixed media files regardless of whether
         # they're used on notes or not
@@ -397,32 +508,50 @@ insert or ignore into revlog values (?,?,?,?,?,?,?,?,?)""",
         if not os.path.exists(dir):
             return
         for fname in os.listdir(dir):
-            if fname.startswith("_") and not self.dst.media.have(fname):
-                self._writeDstMedia(fname, self._srcMediaData(fname))
-
-    def _mediaData(self, fname: str, dir: Optional[str] = None) -> bytes:
-        if not dir:
-            dir = self.src.media.dir()
-        path = os.path.join(dir, fname)
+            if fname.startswith("_") and not self._dstHaveMedia(fname):
+                self._mediaToCopy[fname] = fname
+
+    def _openSrcMedia(self, fname: str) -> BinaryIO:
+        "Open FNAME in src collection for reading."
+        return open(os.path.join(self.src.media.dir(), fname), "rb")
+
+    def _srcMediaHash(self, fname: str) -> Optional[str]:
+        "Hash of FNAME in src collection, or None if it's missing or empty."
+        if fname not in self._srcHashes:
+            try:
+                with self._openSrcMedia(fname) as file:
+                    self._srcHashes[fname] = _hashFile(file)
+            except (OSError, KeyError):
+                self._srcHashes[fname] = None
+        return self._srcHashes[fname]
+
+    def _dstMediaHash(self, fname: str) -> Optional[str]:
+        """Hash of FNAME in dst collection, or None if it's missing or empty.
+        Files queued for copying are taken to be there already."""
+        if fname in self._mediaToCopy:
+            return self._srcMediaHash(self._mediaToCopy[fname])
         try:
-            with open(path, "rb") as f:
-                return f.read()
+            with open(os.path.join(self.dst.media.dir(), fname), "rb") as file:
+                return _hashFile(file)
         except OSError:
-            return b""
+            return None
 
-    def _srcMediaData(self, fname: str) -> bytes:
-        "Data for FNAME in src collection."
-        return self._mediaData(fname, self.src.media.dir())
+    def _dstHaveMedia(self, fname: str) -> bool:
+        return fname in self._mediaToCopy or self.dst.media.have(fname)
 
-    def _dstMediaData(self, fname: str) -> bytes:
-        "Data for FNAME in dst collection."
-        return self._mediaData(fname, self.dst.media.dir())
+    def _copyMedia(self) -> None:
+        "Copy the queued files into the dst media folder, several at once."
+        with ThreadPoolExecutor() as executor:
+            # list() to raise any errors
+            list(executor.map(self._copyMediaFile, self._mediaToCopy.items()))
+        self._mediaToCopy.clear()
 
-    def _writeDstMedia(self, fname: str, data: bytes) -> None:
-        path = os.path.join(self.dst.media.dir(), unicodedata.normalize("NFC", fname))
+    def _copyMediaFile(self, item: Tuple[str, str]) -> None:
+        (dstName, srcName) = item
+        path = os.path.join(self.dst.media.dir(), unicodedata.normalize("NFC", dstName))
         try:
-            with open(path, "wb") as f:
-                f.write(data)
+            with self._openSrcMedia(srcName) as src, open(path, "wb") as dst:
+                shutil.copyfileobj(src, dst, MEDIA_CHUNK_SIZE)
         except OSError:
             # the user likely used subdirectories
             pass
@@ -432,24 +561,24 @@ insert or ignore into revlog values (?,?,?,?,?,?,?,?,?)""",
 
         def repl(match):
             fname = match.group("fname")
-            srcData = self._srcMediaData(fname)
-            dstData = self._dstMediaData(fname)
-            if not srcData:
+            srcHash = self._srcMediaHash(fname)
+            if not srcHash:
                 # file was not in source, ignore
                 return match.group(0)
             # if model-local file exists from a previous import, use that
             name, ext = os.path.splitext(fname)
             lname = f"{name}_{mid}{ext}"
-            if self.dst.media.have(lname):
+            if self._dstHaveMedia(lname):
                 return match.group(0).replace(fname, lname)
+            dstHash = self._dstMediaHash(fname)
             # if missing or the same, pass unmodified
-            elif not dstData or srcData == dstData:
+            if not dstHash or srcHash == dstHash:
                 # need to copy?
-                if not dstData:
-                    self._writeDstMedia(fname, srcData)
+                if not dstHash:
+                    self._mediaToCopy[fname] = fname
                 return match.group(0)
             # exists but does not match, so we need to dedupe
-            self._writeDstMedia(lname, srcData)
+            self._mediaToCopy[lname] = fname
             return match.group(0).replace(fname, lname)
 
         for i in range(len(fields)):
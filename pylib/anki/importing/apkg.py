@@ -3,11 +3,13 @@
 
 import json
 import os
+import shutil
+import threading
 import unicodedata
 import zipfile
-from typing import Any, Dict, Optional
+from typing import BinaryIO, Dict, List, Optional
 
-from anki.importing.anki2 import Anki2Importer
+from anki.importing.anki2 import MEDIA_CHUNK_SIZE, Anki2Importer
 from anki.utils import tmpfile
 
 
@@ -18,6 +20,14 @@ class AnkiPackageImporter(Anki2Importer):
     def run(self) -> None:  # type: ignore
         # extract the deck from the zip file
         self.zip = z = zipfile.ZipFile(self.file)
+        # media is copied on several threads, each reading the package
+        # through its own ZipFile, as they can't be shared safely
+        self._zipPath = self.file
+        self._threadZips = threading.local()
+        self._threadZips.zip = z
+        # the ones opened by other threads, closed after copying
+        self._extraZips: List[zipfile.ZipFile] = []
+        self._extraZipsLock = threading.Lock()
         # v2 scheduler?
         try:
             z.getinfo("collection.anki21")
@@ -25,10 +35,9 @@ class AnkiPackageImporter(Anki2Importer):
         except KeyError:
             suffix = ".anki2"
 
-        col = z.read(f"collection{suffix}")
         colpath = tmpfile(suffix=".anki2")
-        with open(colpath, "wb") as f:
-            f.write(col)
+        with z.open(f"collection{suffix}") as src, open(colpath, "wb") as f:
+            shutil.copyfileobj(src, f, MEDIA_CHUNK_SIZE)
         self.file = colpath
         # we need the media dict in advance, and we'll need a map of fname ->
         # number to use during the import
@@ -42,18 +51,27 @@ class AnkiPackageImporter(Anki2Importer):
             self.nameToNum[unicodedata.normalize("NFC", v)] = k
         # run anki2 importer
         Anki2Importer.run(self)
-        # import static media
-        for file, c in list(self.nameToNum.items()):
+
+    def _importStaticMedia(self) -> None:
+        for file in self.nameToNum:
             if not file.startswith("_") and not file.startswith("latex-"):
                 continue
-            path = os.path.join(self.col.media.dir(), file)
-            if not os.path.exists(path):
-                with open(path, "wb") as f:
-                    f.write(z.read(c))
-
-    def _srcMediaData(self, fname: str) -> Any:
-        if fname in self.nameToNum:
-            return self.zip.read(
-                self.nameToNum[fname]
-            )  # pytype: disable=attribute-error
-        return None
+            if not self._dstHaveMedia(file):
+                self._mediaToCopy[file] = file
+
+    def _openSrcMedia(self, fname: str) -> BinaryIO:
+        zip = getattr(self._threadZips, "zip", None)
+        if not zip:
+            zip = self._threadZips.zip = zipfile.ZipFile(self._zipPath)
+            with self._extraZipsLock:
+                self._extraZips.append(zip)
+        return zip.open(self.nameToNum[fname])  # type: ignore
+
+    def _copyMedia(self) -> None:
+        try:
+            super()._copyMedia()
+        finally:
+            with self._extraZipsLock:
+                for zip in self._extraZips:
+                    zip.close()
+                self._extraZips.clear()
@@ -231,7 +231,7 @@ class MediaManager:
         """
         last_progress = time.time()
         checked = 0
-        for (nid, mid, flds) in self.col.db.execute(
+        for (nid, mid, flds) in self.col.db.iter(
             "select id, mid, flds from notes where flds like '%[%'"
         ):
 
@@ -15,8 +15,10 @@ from typing import List, Optional, Sequence
 
 from anki.cards import CardId
 from anki.consts import CARD_TYPE_NEW, NEW_CARDS_RANDOM, QUEUE_TYPE_NEW, QUEUE_TYPE_REV
-from anki.decks import DeckConfigDict, DeckId, DeckTreeNode
+from anki.decks import DeckConfig, DeckConfigDict, DeckId, DeckTreeNode
 from anki.notes import NoteId
+from anki.scheduler import simulator
+from anki.scheduler.simulator import RecallModel, SweepResult, WorkloadForecast
 from anki.utils import ids2str, intTime
 
 CongratsInfo = _pb.CongratsInfoOut
@@ -246,3 +248,42 @@ select id from cards where did in %s and queue = {QUEUE_TYPE_REV} and due <= ? l
         shift: bool = False,
     ) -> None:
         self.reposition_new_cards(cids, start, step, shuffle, shift)
+
+    # Workload forecast
+    ##########################################################################
+
+    def simulate_workload(
+        self,
+        search: str = "deck:current",
+        days: int = 365,
+        *,
+        config: Optional[DeckConfigDict] = None,
+        recall: Optional[RecallModel] = None,
+        seed: Optional[int] = None,
+    ) -> WorkloadForecast:
+        """Forecast the answers on each of the next `days` days, if the cards
+        matching `search` were studied every day. Pass `config` to preview
+        the effect of changing deck options. Requires numpy."""
+        return simulator.simulate_workload(
+            self.col, search, days, config=config, recall=recall, seed=seed
+        )
+
+    def sweep_deck_configs(
+        self,
+        deck_id: DeckId,
+        configs: Optional[Sequence[DeckConfig]] = None,
+        days: int = 365,
+        *,
+        recall: Optional[RecallModel] = None,
+        max_workers: Optional[int] = None,
+    ) -> List[SweepResult]:
+        """Compare the forecast workload and retention of the deck under each
+        config, in parallel. See simulator.sweep_deck_configs()."""
+        return simulator.sweep_deck_configs(
+            self.col,
+            deck_id,
+            configs,
+            days,
+            recall=recall,
+            max_workers=max_workers,
+        )
@@ -0,0 +1,452 @@
+# Copyright: Ankitects Pty Ltd and contributors
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""
+Forecast the number of answers on each future day, by simulating study of
+every card at once with NumPy arrays.
+
+Intervals follow the v2 scheduler: _nextRevIvl() and _fuzzedIvl() for
+reviews, _lapseIvl() for lapses, and the graduating interval for new
+cards. Limits are taken from each card's home deck, ignoring the limits
+of parent decks. Learning and relearning steps are assumed to be passed
+on the day they start.
+
+sweep_deck_configs() runs the simulation for several deck configs at once,
+in separate processes, to compare their workload and retention.
+
+Requires numpy.
+"""
+
+from __future__ import annotations
+
+import copy
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import anki
+from anki.collection import SearchNode
+from anki.consts import *
+from anki.decks import DeckConfig, DeckConfigDict, DeckId
+from anki.utils import ids2str
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+# due day of cards that have not been introduced yet
+NOT_DUE = 2 ** 40
+
+KIND_NEW = 0
+KIND_LEARN = 1
+KIND_REVIEW = 2
+
+
+def is_available() -> bool:
+    return np is not None
+
+
+@dataclass
+class RecallModel:
+    """The chance of remembering a review card, and how the remembered cards
+    are split between the Hard, Good and Easy buttons.
+
+    Recall decays exponentially with the days since the last review, and
+    is `retention` when a card is reviewed on its due date. Subclass and
+    override recall_probability() to use a different model."""
+
+    retention: float = 0.9
+    hard: float = 0.15
+    easy: float = 0.05
+
+    def recall_probability(self, elapsed: np.ndarray, ivl: np.ndarray) -> np.ndarray:
+        return self.retention ** (elapsed / np.maximum(ivl, 1))
+
+    @classmethod
+    def from_history(
+        cls, col: anki.collection.Collection, min_reviews: int = 100
+    ) -> RecallModel:
+        "Estimate the model from past reviews, if there are enough of them."
+        (total, passed, hard, easy) = col.db.first(
+            f"""
+select count(), sum(ease > 1), sum(ease = 2), sum(ease = 4)
+from revlog where type = {REVLOG_REV}"""
+        )
+        if not total or total < min_reviews or not passed:
+            return cls()
+        return cls(retention=passed / total, hard=hard / passed, easy=easy / passed)
+
+
+@dataclass
+class WorkloadForecast:
+    """Simulated answers on each day, starting with today. Each array has
+    one entry per day."""
+
+    new: np.ndarray
+    learning: np.ndarray
+    review: np.ndarray
+    # the review answers that were failed
+    lapses: np.ndarray
+
+    def total(self) -> np.ndarray:
+        return self.new + self.learning + self.review
+
+
+class _Params:
+    "Deck options as arrays, indexed by each card's position in `confs`."
+
+    def __init__(self, confs: List[DeckConfigDict]) -> None:
+        def param(get: Any, dtype: Any = np.float64) -> np.ndarray:
+            return np.array([get(conf) for conf in confs], dtype=dtype)
+
+        self.new_per_day = param(lambda c: c["new"]["perDay"], np.int64)
+        self.new_steps = param(lambda c: len(c["new"]["delays"]), np.int64)
+        self.graduating_ivl = param(lambda c: c["new"]["ints"][0], np.int64)
+        self.initial_factor = param(lambda c: c["new"]["initialFactor"], np.int64)
+        self.rev_per_day = param(lambda c: c["rev"]["perDay"], np.int64)
+        self.ease4 = param(lambda c: c["rev"]["ease4"])
+        self.hard_factor = param(lambda c: c["rev"].get("hardFactor", 1.2))
+        self.ivl_fct = param(lambda c: c["rev"].get("ivlFct", 1))
+        self.max_ivl = param(lambda c: c["rev"]["maxIvl"], np.int64)
+        self.relearn_steps = param(lambda c: len(c["lapse"]["delays"]), np.int64)
+        self.lapse_mult = param(lambda c: c["lapse"]["mult"])
+        self.lapse_min_ivl = param(lambda c: c["lapse"]["minInt"], np.int64)
+
+
+class _Cards:
+    "The state of each simulated card, and its deck and options."
+
+    def __init__(
+        self,
+        col: anki.collection.Collection,
+        search: str,
+        config: Optional[DeckConfigDict],
+    ) -> None:
+        rows = col.db.all(
+            f"""
+select (case when odid then odid else did end), type, queue,
+(case when odid then odue else due end), ivl, factor, left
+from cards where id in {ids2str(col.find_cards(search))}
+and queue != {QUEUE_TYPE_SUSPENDED}"""
+        )
+        data = np.array(rows, dtype=np.int64).reshape(-1, 7)
+        (dids, ctype, queue, due, self.ivl, self.factor, left) = data.T
+
+        # the options of each card's home deck, unless overridden
+        (unique_dids, self.deck) = np.unique(dids, return_inverse=True)
+        confs: List[DeckConfigDict] = []
+        conf_index: Dict[int, int] = {}
+        deck_conf = []
+        for did in unique_dids:
+            conf = config or col.decks.confForDid(DeckId(int(did)))
+            if conf["id"] not in conf_index:
+                conf_index[conf["id"]] = len(confs)
+                confs.append(conf)
+            deck_conf.append(conf_index[conf["id"]])
+        self.params = _Params(confs)
+        self.conf = np.array(deck_conf, dtype=np.int64)[self.deck]
+        self.deck_count = len(unique_dids)
+
+        today = col.sched.today
+        self.kind = np.full(len(data), KIND_REVIEW, dtype=np.int64)
+        self.kind[ctype == CARD_TYPE_NEW] = KIND_NEW
+        learning = (ctype == CARD_TYPE_LRN) | (ctype == CARD_TYPE_RELEARNING)
+        self.kind[learning] = KIND_LEARN
+        # due is a timestamp for intraday learning cards, and a position for
+        # new cards
+        self.due = np.where(queue == QUEUE_TYPE_LRN, 0, due - today)
+        self.due[self.kind == KIND_NEW] = NOT_DUE
+        self.steps_left = left % 1000
+        # new cards are introduced in due order, deck by deck
+        new = np.flatnonzero(self.kind == KIND_NEW)
+        self.new_order = new[np.lexsort((due[new], self.deck[new]))]
+        self.new_starts = np.searchsorted(
+            self.deck[self.new_order], np.arange(self.deck_count)
+        )
+        self.new_ends = np.append(self.new_starts[1:], len(self.new_order))
+
+
+def simulate_workload(
+    col: anki.collection.Collection,
+    search: str,
+    days: int,
+    config: Optional[DeckConfigDict] = None,
+    recall: Optional[RecallModel] = None,
+    seed: Optional[int] = None,
+) -> WorkloadForecast:
+    """Simulate studying the cards matching search for the given number of
+    days. If config is provided, it is used in place of each card's deck
+    options, to preview the effect of changing them."""
+    if not is_available():
+        raise Exception("The workload simulator requires numpy.")
+    cards = _Cards(col, search, config)
+    return _simulate(cards, days, recall or RecallModel(), np.random.default_rng(seed))
+
+
+@dataclass
+class SweepResult:
+    "The forecast for one of the deck configs in a sweep."
+
+    config: DeckConfig
+    forecast: WorkloadForecast
+
+    @property
+    def answers_per_day(self) -> float:
+        return float(self.forecast.total().mean())
+
+    @property
+    def peak(self) -> int:
+        return int(self.forecast.total().max())
+
+    @property
+    def retention(self) -> float:
+        "The proportion of review answers that were passed."
+        reviews = self.forecast.review.sum()
+        if not reviews:
+            return 0.0
+        return 1 - float(self.forecast.lapses.sum() / reviews)
+
+
+def sweep_deck_configs(
+    col: anki.collection.Collection,
+    deck_id: DeckId,
+    configs: Optional[Sequence[DeckConfig]] = None,
+    days: int = 365,
+    recall: Optional[RecallModel] = None,
+    seed: Optional[int] = 0,
+    max_workers: Optional[int] = None,
+) -> List[SweepResult]:
+    """Simulate the deck and its children under each of `configs`, which
+    default to the presets returned by get_deck_configs_for_update(). The
+    configs can be edited copies of those presets, to compare changes before
+    passing them to update_deck_configs().
+
+    The cards and review history are read once, and the simulations are
+    spread across processes, so the collection is not touched while they
+    run. The recall model is estimated from the review history by default."""
+    if not is_available():
+        raise Exception("The workload simulator requires numpy.")
+    update = col.decks.get_deck_configs_for_update(deck_id)
+    if configs is None:
+        configs = [c.config for c in update.all_config]
+    if not configs:
+        return []
+    legacy = [_config_dict(config) for config in configs]
+    search = col.build_search_string(SearchNode(deck=update.current_deck.name))
+    cards = _Cards(col, search, legacy[0])
+    recall = recall or RecallModel.from_history(col)
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_sweep_worker,
+        initargs=(cards, recall, days, seed),
+    ) as executor:
+        forecasts = list(executor.map(_sweep_one, legacy))
+    return [
+        SweepResult(config=config, forecast=forecast)
+        for (config, forecast) in zip(configs, forecasts)
+    ]
+
+
+def sweep_table(results: Sequence[SweepResult]) -> str:
+    "The results of a sweep as plain text, one config per line."
+    lines = [f"{'':<30}{'answers/day':>12}{'peak':>8}{'retention':>11}"]
+    for result in results:
+        lines.append(
+            f"{result.config.name[:29]:<30}{result.answers_per_day:>12.1f}"
+            f"{result.peak:>8}{result.retention:>11.1%}"
+        )
+    return "\n".join(lines)
+
+
+def _config_dict(config: DeckConfig) -> DeckConfigDict:
+    "The parts of a legacy config dict that the simulator reads."
+    inner = config.config
+    return dict(
+        id=config.id,
+        new=dict(
+            perDay=inner.new_per_day,
+            delays=list(inner.learn_steps),
+            ints=[inner.graduating_interval_good, inner.graduating_interval_easy],
+            # the ease is a float32, so 2.3 is stored as 2.2999999...
+            initialFactor=round(inner.initial_ease * 1000),
+        ),
+        rev=dict(
+            perDay=inner.reviews_per_day,
+            ease4=inner.easy_multiplier,
+            hardFactor=inner.hard_multiplier,
+            ivlFct=inner.interval_multiplier,
+            maxIvl=inner.maximum_review_interval,
+        ),
+        lapse=dict(
+            delays=list(inner.relearn_steps),
+            mult=inner.lapse_multiplier,
+            minInt=inner.minimum_lapse_interval,
+        ),
+    )
+
+
+# set in each worker process of a sweep
+_sweep_state: Optional[Tuple[_Cards, RecallModel, int, Optional[int]]] = None
+
+
+def _init_sweep_worker(
+    cards: _Cards, recall: RecallModel, days: int, seed: Optional[int]
+) -> None:
+    global _sweep_state
+    _sweep_state = (cards, recall, days, seed)
+
+
+def _sweep_one(config: DeckConfigDict) -> WorkloadForecast:
+    assert _sweep_state
+    (cards, recall, days, seed) = _sweep_state
+    # the simulation updates the cards in place
+    cards = copy.deepcopy(cards)
+    cards.params = _Params([config])
+    return _simulate(cards, days, recall, np.random.default_rng(seed))
+
+
+def _simulate(
+    cards: _Cards, days: int, recall: RecallModel, rng: np.random.Generator
+) -> WorkloadForecast:
+    params = cards.params
+    out = WorkloadForecast(
+        new=np.zeros(days, dtype=np.int64),
+        learning=np.zeros(days, dtype=np.int64),
+        review=np.zeros(days, dtype=np.int64),
+        lapses=np.zeros(days, dtype=np.int64),
+    )
+    deck_new_limit = np.zeros(cards.deck_count, dtype=np.int64)
+    deck_rev_limit = np.zeros(cards.deck_count, dtype=np.int64)
+    deck_new_limit[cards.deck] = params.new_per_day[cards.conf]
+    deck_rev_limit[cards.deck] = params.rev_per_day[cards.conf]
+    new_pos = cards.new_starts.copy()
+
+    for day in range(days):
+        # introduce new cards
+        take = np.minimum(deck_new_limit, cards.new_ends - new_pos)
+        if take.sum():
+            idx = cards.new_order[_ranges(new_pos, take)]
+            new_pos += take
+            conf = cards.conf[idx]
+            out.new[day] += len(idx)
+            out.learning[day] += np.maximum(params.new_steps[conf] - 1, 0).sum()
+            _graduate(cards, idx, day, _fuzzed(params.graduating_ivl[conf], rng))
+            cards.factor[idx] = params.initial_factor[conf]
+
+        due = np.flatnonzero(cards.due <= day)
+        if not len(due):
+            continue
+
+        # learning cards finish their steps, and graduate
+        idx = due[cards.kind[due] == KIND_LEARN]
+        if len(idx):
+            out.learning[day] += cards.steps_left[idx].sum()
+            conf = cards.conf[idx]
+            ivl = np.where(
+                cards.ivl[idx] > 0,
+                cards.ivl[idx],
+                _fuzzed(params.graduating_ivl[conf], rng),
+            )
+            _graduate(cards, idx, day, ivl)
+            # new cards don't have a factor until they graduate
+            cards.factor[idx] = np.where(
+                cards.factor[idx] > 0, cards.factor[idx], params.initial_factor[conf]
+            )
+
+        # reviews, most overdue first, up to each deck's limit; the rest
+        # are carried over to the next day
+        idx = due[cards.kind[due] == KIND_REVIEW]
+        idx = idx[np.lexsort((cards.due[idx], cards.deck[idx]))]
+        deck = cards.deck[idx]
+        rank = np.arange(len(idx)) - np.searchsorted(deck, deck)
+        idx = idx[rank < deck_rev_limit[deck]]
+        if not len(idx):
+            continue
+        out.review[day] += len(idx)
+        elapsed = cards.ivl[idx] + (day - cards.due[idx])
+        remembered = rng.random(len(idx)) < recall.recall_probability(
+            elapsed, cards.ivl[idx]
+        )
+        _lapse(cards, idx[~remembered], day, out)
+        _pass(cards, idx[remembered], day, recall, rng)
+
+    return out
+
+
+def _ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    "Concatenation of range(start, start + count) for each start and count."
+    ends = np.cumsum(counts)
+    return np.repeat(starts - ends + counts, counts) + np.arange(ends[-1])
+
+
+def _graduate(cards: _Cards, idx: np.ndarray, day: int, ivl: np.ndarray) -> None:
+    cards.kind[idx] = KIND_REVIEW
+    cards.ivl[idx] = ivl
+    cards.due[idx] = day + ivl
+
+
+def _lapse(cards: _Cards, idx: np.ndarray, day: int, out: WorkloadForecast) -> None:
+    params = cards.params
+    conf = cards.conf[idx]
+    out.lapses[day] += len(idx)
+    out.learning[day] += params.relearn_steps[conf].sum()
+    ivl = np.maximum(
+        params.lapse_min_ivl[conf],
+        (cards.ivl[idx] * params.lapse_mult[conf]).astype(np.int64),
+    )
+    cards.ivl[idx] = np.maximum(ivl, 1)
+    cards.factor[idx] = np.maximum(1300, cards.factor[idx] - 200)
+    cards.due[idx] = day + cards.ivl[idx]
+
+
+def _pass(
+    cards: _Cards,
+    idx: np.ndarray,
+    day: int,
+    recall: RecallModel,
+    rng: np.random.Generator,
+) -> None:
+    params = cards.params
+    conf = cards.conf[idx]
+    ivl = cards.ivl[idx]
+    delay = np.maximum(0, day - cards.due[idx])
+    fct = cards.factor[idx] / 1000
+    button = rng.random(len(idx))
+    ease = np.where(
+        button < recall.hard,
+        BUTTON_TWO,
+        np.where(button >= 1 - recall.easy, BUTTON_FOUR, BUTTON_THREE),
+    )
+
+    def constrained(ivl: np.ndarray, prev: np.ndarray) -> np.ndarray:
+        ivl = _fuzzed((ivl * params.ivl_fct[conf]).astype(np.int64), rng)
+        ivl = np.maximum(np.maximum(ivl, prev + 1), 1)
+        return np.minimum(ivl, params.max_ivl[conf])
+
+    hard_min = np.where(params.hard_factor[conf] > 1, ivl, 0)
+    ivl2 = constrained(ivl * params.hard_factor[conf], hard_min)
+    ivl3 = constrained((ivl + delay // 2) * fct, ivl2)
+    ivl4 = constrained((ivl + delay) * fct * params.ease4[conf], ivl3)
+    new_ivl = np.choose(ease - BUTTON_TWO, [ivl2, ivl3, ivl4])
+
+    cards.ivl[idx] = new_ivl
+    cards.factor[idx] = np.maximum(1300, cards.factor[idx] + (ease - 3) * 150)
+    cards.due[idx] = day + new_ivl
+
+
+def _fuzzed(ivl: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    "A random interval from the range _fuzzIvlRange() gives for each interval."
+    fuzz = np.where(
+        ivl < 7,
+        (ivl * 0.25).astype(np.int64),
+        np.where(
+            ivl < 30,
+            np.maximum(2, (ivl * 0.15).astype(np.int64)),
+            np.maximum(4, (ivl * 0.05).astype(np.int64)),
+        ),
+    )
+    fuzz = np.maximum(fuzz, 1)
+    low = np.where(ivl < 2, 1, np.where(ivl == 2, 2, ivl - fuzz))
+    high = np.where(ivl < 2, 1, np.where(ivl == 2, 3, ivl + fuzz))
+    return rng.integers(low, high, endpoint=True)
@@ -6,7 +6,7 @@ from __future__ import annotations
 import random
 import time
 from heapq import *
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
 
 import anki  # pylint: disable=unused-import
 import anki._backend.backend_pb2 as _pb
@@ -154,6 +154,9 @@ class Scheduler(SchedulerBaseWithLegacy):
     def _resetNew(self) -> None:
         self._newDids = self.col.decks.active()[:]
         self._newQueue: List[CardId] = []
+        # gathered for all active decks on the first fill
+        self._newCandidates: Optional[Dict[DeckId, List[CardId]]] = None
+        self._newTruncated: Set[DeckId] = set()
         self._updateNewCardRatio()
 
     def _fillNew(self, recursing: bool = False) -> bool:
@@ -161,17 +164,27 @@ class Scheduler(SchedulerBaseWithLegacy):
             return True
         if not self.newCount:
             return False
+        if self._newCandidates is None:
+            (self._newCandidates, self._newTruncated) = self._gatherCardsByDeck(
+                self._newDids, f"queue = {QUEUE_TYPE_NEW}", "due, ord"
+            )
         while self._newDids:
             did = self._newDids[0]
-            lim = min(self.queueLimit, self._deckNewLimit(did))
-            if lim:
-                # fill the queue with the current did
-                self._newQueue = self.col.db.list(
-                    f"""
+            # decks without new cards are skipped without checking limits
+            candidates = self._newCandidates.get(did)
+            if candidates is not None:
+                lim = min(self.queueLimit, self._deckNewLimit(did))
+                if lim and candidates:
+                    self._newQueue = candidates[:lim]
+                    del candidates[:lim]
+                elif lim and did in self._newTruncated:
+                    # the deck had more cards than were gathered
+                    self._newQueue = self.col.db.list(
+                        f"""
                 select id from cards where did = ? and queue = {QUEUE_TYPE_NEW} order by due,ord limit ?""",
-                    did,
-                    lim,
-                )
+                        did,
+                        lim,
+                    )
                 if self._newQueue:
                     self._newQueue.reverse()
                     return True
@@ -188,6 +201,27 @@ class Scheduler(SchedulerBaseWithLegacy):
         self._resetNew()
         return self._fillNew(recursing=True)
 
+    def _gatherCardsByDeck(
+        self, dids: Sequence[DeckId], where: str, order: str, *args: Any
+    ) -> Tuple[Dict[DeckId, List[CardId]], Set[DeckId]]:
+        """The first queueLimit matching cards of each deck, fetched in a single
+        query. Also returns the decks that may have more cards."""
+        cards: Dict[DeckId, List[CardId]] = {}
+        for (did, cid) in self.col.db.execute(
+            f"""
+select did, id from (
+select did, id, row_number() over (partition by did order by {order}) as pos
+from cards where did in {ids2str(dids)} and {where})
+where pos <= ? order by did, pos""",
+            *args,
+            self.queueLimit,
+        ):
+            cards.setdefault(did, []).append(cid)
+        truncated = {
+            did for (did, cids) in cards.items() if len(cids) >= self.queueLimit
+        }
+        return (cards, truncated)
+
     def _getNewCard(self) -> Optional[Card]:
         if self._fillNew():
             self.newCount -= 1
@@ -313,6 +347,8 @@ select count() from cards where did in %s and queue = {QUEUE_TYPE_PREVIEW}
         self._lrnQueue: List[Tuple[int, CardId]] = []
         self._lrnDayQueue: List[CardId] = []
         self._lrnDids = self.col.decks.active()[:]
+        self._lrnDayCandidates: Optional[Dict[DeckId, List[CardId]]] = None
+        self._lrnDayTruncated: Set[DeckId] = set()
 
     # sub-day learning
     def _fillLrn(self) -> Union[bool, List[Any]]:
@@ -354,17 +390,28 @@ limit %d"""
             return False
         if self._lrnDayQueue:
             return True
+        if self._lrnDayCandidates is None:
+            gathered = self._gatherCardsByDeck(
+                self._lrnDids,
+                f"queue = {QUEUE_TYPE_DAY_LEARN_RELEARN} and due <= ?",
+                "id",
+                self.today,
+            )
+            (self._lrnDayCandidates, self._lrnDayTruncated) = gathered
         while self._lrnDids:
             did = self._lrnDids[0]
-            # fill the queue with the current did
-            self._lrnDayQueue = self.col.db.list(
-                f"""
+            if did in self._lrnDayCandidates:
+                self._lrnDayQueue = self._lrnDayCandidates.pop(did)
+            elif did in self._lrnDayTruncated:
+                # the deck had more cards than were gathered
+                self._lrnDayQueue = self.col.db.list(
+                    f"""
 select id from cards where
 did = ? and queue = {QUEUE_TYPE_DAY_LEARN_RELEARN} and due <= ? limit ?""",
-                did,
-                self.today,
-                self.queueLimit,
-            )
+                    did,
+                    self.today,
+                    self.queueLimit,
+                )
             if self._lrnDayQueue:
                 # order
                 r = random.Random()
@@ -1088,9 +1135,9 @@ limit ?"""
         rconf = self._revConf(card)
         buryRev = rconf.get("bury", True)
         # loop through and remove from queues
-        for cid, queue in self.col.db.execute(
+        for cid, queue, did in self.col.db.execute(
             f"""
-select id, queue from cards where nid=? and id!=?
+select id, queue, did from cards where nid=? and id!=?
 and (queue={QUEUE_TYPE_NEW} or (queue={QUEUE_TYPE_REV} and due<=?))""",
             card.nid,
             card.id,
@@ -1104,6 +1151,9 @@ and (queue={QUEUE_TYPE_NEW} or (queue={QUEUE_TYPE_REV} and due<=?))""",
                 queue_obj = self._newQueue
                 if buryNew:
                     toBury.append(cid)
+                    # not yet in the queue if it's in another deck
+                    if self._newCandidates and cid in self._newCandidates.get(did, []):
+                        self._newCandidates[did].remove(cid)
 
             # even if burying disabled, we still discard to give same-day spacing
             try:
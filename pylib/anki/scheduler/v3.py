@@ -11,11 +11,13 @@ as '2' internally.
 
 from __future__ import annotations
 
-from typing import Tuple, Union
+import time
+from typing import Sequence, Tuple, Union
 
 import anki._backend.backend_pb2 as _pb
 from anki import hooks
-from anki.cards import Card
+from anki.cards import Card, CardId
+from anki.collection import OpChangesWithCount
 from anki.consts import *
 from anki.scheduler.base import CongratsInfo
 from anki.scheduler.legacy import SchedulerBaseWithLegacy
@@ -24,6 +26,10 @@ from anki.utils import intTime
 
 QueuedCards = _pb.GetQueuedCardsOut.QueuedCards
 
+# learning cards become due as time passes, so a queue snapshot is only
+# reused for this long, even if the collection has not changed
+QUEUE_SNAPSHOT_SECS = 5
+
 
 class Scheduler(SchedulerBaseWithLegacy):
     version = 3
@@ -31,12 +37,17 @@ class Scheduler(SchedulerBaseWithLegacy):
     # don't rely on this, it will likely be removed in the future
     reps = 0
 
+    # (backend change count, expiry time, result of get_queued_cards())
+    _queue_snapshot: Optional[
+        Tuple[int, float, Union[QueuedCards, CongratsInfo]]
+    ] = None
+
     # Fetching the next card
     ##########################################################################
 
     def reset(self) -> None:
         # backend automatically resets queues as operations are performed
-        pass
+        self._queue_snapshot = None
 
     def get_queued_cards(
         self,
@@ -56,9 +67,22 @@ class Scheduler(SchedulerBaseWithLegacy):
             assert_exhaustive(kind)
             assert False
 
+    def _queued_cards_snapshot(self) -> Union[QueuedCards, CongratsInfo]:
+        """The result of get_queued_cards(), reused until the collection is
+        modified, so repeated count and card lookups are free."""
+        changes = self.col._backend.change_count
+        now = time.time()
+        if snapshot := self._queue_snapshot:
+            (snapshot_changes, expires, info) = snapshot
+            if snapshot_changes == changes and now < expires:
+                return info
+        info = self.get_queued_cards()
+        self._queue_snapshot = (changes, now + QUEUE_SNAPSHOT_SECS, info)
+        return info
+
     def getCard(self) -> Optional[Card]:
         """Fetch the next card from the queue. None if finished."""
-        response = self.get_queued_cards()
+        response = self._queued_cards_snapshot()
         if isinstance(response, QueuedCards):
             backend_card = response.cards[0].card
             card = Card(self.col)
@@ -70,11 +94,11 @@ class Scheduler(SchedulerBaseWithLegacy):
 
     def _is_finished(self) -> bool:
         "Don't use this, it is a stop-gap until this code is refactored."
-        info = self.get_queued_cards()
+        info = self._queued_cards_snapshot()
         return isinstance(info, CongratsInfo)
 
     def counts(self, card: Optional[Card] = None) -> Tuple[int, int, int]:
-        info = self.get_queued_cards()
+        info = self._queued_cards_snapshot()
         if isinstance(info, CongratsInfo):
             counts = [0, 0, 0]
         else:
@@ -124,7 +148,8 @@ class Scheduler(SchedulerBaseWithLegacy):
         else:
             assert False, "invalid ease"
 
-        self.col._backend.answer_card(
+        pipeline = self.col._backend.pipeline()
+        pipeline.answer_card(
             card_id=card.id,
             current_state=states.current,
             new_state=new_state,
@@ -132,12 +157,33 @@ class Scheduler(SchedulerBaseWithLegacy):
             answered_at_millis=intTime(1000),
             milliseconds_taken=card.timeTaken(),
         )
-
         # fixme: tests assume card will be mutated, so we need to reload it
-        card.load()
+        pipeline.get_card(card.id)
+        (_, backend_card) = pipeline.execute()
+        card._load_from_backend_card(backend_card)
 
         return new_state
 
+    def answer_cards(
+        self, answers: Sequence[Tuple[CardId, int, int, int]]
+    ) -> OpChangesWithCount:
+        """Apply (card_id, ease, answered_at_millis, milliseconds_taken) answers
+        as a single undoable operation, eg when importing reviews. The cards do
+        not need to be due, and are answered in the order given. Each answer is
+        scheduled as of the time it was given, so a card's answers must be in
+        chronological order. Leech hooks are not called."""
+        if not answers:
+            return OpChangesWithCount()
+        (card_ids, eases, answered_at_millis, milliseconds_taken) = zip(*answers)
+        assert all(1 <= ease <= 4 for ease in eases)
+        return self.col._backend.answer_cards(
+            card_ids=card_ids,
+            # AGAIN=0 ... EASY=3
+            ratings=[ease - 1 for ease in eases],
+            answered_at_millis=answered_at_millis,
+            milliseconds_taken=milliseconds_taken,
+        )
+
     def _handle_leech(self, card: Card, new_state: _pb.SchedulingState) -> bool:
         "True if was leech."
         if self.col._backend.state_is_leech(new_state):
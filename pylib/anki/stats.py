@@ -6,11 +6,14 @@ from __future__ import annotations
 import datetime
 import json
 import time
+from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import anki
 from anki.consts import *
 from anki.lang import FormatTimeSpan
+from anki.scheduler import simulator
+from anki.scheduler.simulator import np
 from anki.utils import ids2str
 
 # Card stats
@@ -69,6 +72,104 @@ colUnseen = "#000"
 colSusp = "#ff0"
 
 
+@dataclass
+class _RevlogDay:
+    # days before today; answers after the cutoff count as today
+    days_ago: int
+    type: int
+    # lastIvl >= 21
+    mature: bool
+    count: int
+    # the answers on each button
+    ease1: int
+    ease2: int
+    ease3: int
+    ease4: int
+    # milliseconds
+    time: int
+
+    def eases(self) -> List[Tuple[int, int]]:
+        "Each ease and its count, with 0 for manual rescheduling."
+        eases = (self.ease1, self.ease2, self.ease3, self.ease4)
+        return [(0, self.count - sum(eases))] + list(enumerate(eases, 1))
+
+
+@dataclass
+class _CardBucket:
+    queue: int
+    ivl: int
+    count: int
+    min_factor: int
+    # the sum of the factors
+    factors: int
+    max_factor: int
+
+
+class _Aggregates:
+    """The revlog and cards of the report, summed into small buckets. The
+    revlog is read from the daily totals the backend keeps up to date,
+    apart from the hourly breakdown."""
+
+    def __init__(self, stats: CollectionStats, days: Optional[int]) -> None:
+        col = stats.col
+        today = col._backend.update_revlog_days(False)
+        lims = []
+        if days is not None:
+            lims.append("day > %d" % (today - days))
+        if not stats.wholeCollection:
+            lims.append("did in %s" % ids2str(col.decks.active()))
+        if lims:
+            lim = "where " + " and ".join(lims)
+        else:
+            lim = ""
+        self.revlog = [
+            _RevlogDay(*row)
+            for row in col.db.all(
+                """
+select max(? - day, 0), type, mature, sum(count), sum(ease1), sum(ease2),
+sum(ease3), sum(ease4), sum(time)
+from revlog_days %s
+group by day, type, mature having sum(count) > 0"""
+                % lim,
+                today,
+            )
+        ]
+        # the answers and correct answers in each hour, counting back from
+        # the day cutoff
+        lims = [f"type in ({REVLOG_LRN},{REVLOG_REV},{REVLOG_RELRN})"]
+        if days is not None:
+            lims.append("id > %d" % ((col.sched.dayCutoff - (days * 86400)) * 1000))
+        lim = stats._revlogLimit()
+        if lim:
+            lims.append(lim)
+        self.hours = col.db.all(
+            """
+select max(cast((? - id/1000.0) / 3600 as int), 0) %% 24 as hour, count(),
+sum(case when ease = 1 then 0 else 1 end)
+from revlog where %s
+group by hour"""
+            % " and ".join(lims),
+            col.sched.dayCutoff,
+        )
+        self.cards = [
+            _CardBucket(*row)
+            for row in col.db.all(
+                """
+select queue, ivl, count(), min(factor), sum(factor), max(factor)
+from cards where did in %s
+group by queue, ivl"""
+                % stats._limit()
+            )
+        ]
+
+
+# the aggregates of the last report, and the collection and options they
+# were computed for
+_cached_aggregates: Optional[Tuple[Tuple, _Aggregates]] = None
+# likewise for the workload forecast
+_cached_workload: Optional[Tuple[Tuple, simulator.WorkloadForecast]] = None
+
+
 class CollectionStats:
     def __init__(self, col: anki.collection.Collection) -> None:
         self.col = col.weakref()
@@ -87,6 +188,7 @@ class CollectionStats:
         txt = self.css % bg
         txt += self._section(self.todayStats())
         txt += self._section(self.dueGraph())
+        txt += self._section(self.workloadGraph())
         txt += self.repsGraphs()
         txt += self._section(self.introductionGraph())
         txt += self._section(self.ivlGraph())
@@ -117,28 +219,14 @@ body { direction: ltr !important; }
     def todayStats(self) -> str:
         b = self._title("Today")
         # studied today
-        lim = self._revlogLimit()
-        if lim:
-            lim = " and " + lim
-        cards, thetime, failed, lrn, rev, relrn, filt = self.col.db.first(
-            f"""
-select count(), sum(time)/1000,
-sum(case when ease = 1 then 1 else 0 end), /* failed */
-sum(case when type = {REVLOG_LRN} then 1 else 0 end), /* learning */
-sum(case when type = {REVLOG_REV} then 1 else 0 end), /* review */
-sum(case when type = {REVLOG_RELRN} then 1 else 0 end), /* relearn */
-sum(case when type = {REVLOG_CRAM} then 1 else 0 end) /* filter */
-from revlog where id > ? """
-            + lim,
-            (self.col.sched.dayCutoff - 86400) * 1000,
-        )
-        cards = cards or 0
-        thetime = thetime or 0
-        failed = failed or 0
-        lrn = lrn or 0
-        rev = rev or 0
-        relrn = relrn or 0
-        filt = filt or 0
+        today = [x for x in self._aggregates().revlog if not x.days_ago]
+        cards = sum(x.count for x in today)
+        thetime = sum(x.time for x in today) // 1000
+        failed = sum(x.ease1 for x in today)
+        lrn, rev, relrn, filt = [
+            sum(x.count for x in today if x.type == type)
+            for type in (REVLOG_LRN, REVLOG_REV, REVLOG_RELRN, REVLOG_CRAM)
+        ]
         # studied
         def bold(s: str) -> str:
             return "<b>" + str(s) + "</b>"
@@ -159,13 +247,8 @@ from revlog where id > ? """
                 a=bold(lrn), b=bold(rev), c=bold(relrn), d=bold(filt)
             )
             # mature today
-            mcnt, msum = self.col.db.first(
-                """
-    select count(), sum(case when ease = 1 then 0 else 1 end) from revlog
-    where lastIvl >= 21 and id > ?"""
-                + lim,
-                (self.col.sched.dayCutoff - 86400) * 1000,
-            )
+            mcnt = sum(x.count for x in today if x.mature)
+            msum = sum(x.count - x.ease1 for x in today if x.mature)
             b += "<br>"
             if mcnt:
                 b += "Correct answers on mature cards: %(a)d/%(b)d (%(c).1f%%)" % dict(
@@ -282,6 +365,49 @@ group by day order by day"""
             chunk,
         )
 
+    def workloadGraph(self) -> str:
+        if not simulator.is_available():
+            return ""
+        start, end, chunk = self.get_start_end_chunk()
+        days = end * chunk if end is not None else 365
+        forecast = self._workload(days)
+        if not forecast.total().any():
+            return ""
+        starts = np.arange(0, days, chunk)
+
+        def bucket(counts: Any) -> List[Tuple[int, int]]:
+            return [
+                (i, int(n)) for (i, n) in enumerate(np.add.reduceat(counts, starts))
+            ]
+
+        data = [
+            dict(data=bucket(forecast.review), color=colMature, label="Review"),
+            dict(data=bucket(forecast.learning), color=colLearn, label="Learning"),
+            dict(data=bucket(forecast.new), color=colUnseen, label="New"),
+        ]
+        txt = self._title(
+            "Workload",
+            "The number of answers if you study every day, simulated from your "
+            "deck options and past recall.",
+        )
+        txt += self._graph(
+            id="workload",
+            data=data,
+            xunit=chunk,
+            conf=dict(
+                xaxis=dict(tickDecimals=0, min=-0.5, max=len(starts) - 0.5),
+                yaxes=[dict(min=0)],
+            ),
+        )
+        i: List[str] = []
+        self._line(
+            i, "Average", self._avgDay(int(forecast.total().sum()), days, "answers")
+        )
+        self._line(i, "Busiest day", "%d answers" % forecast.total().max())
+        self._line(i, "Lapses", self._avgDay(int(forecast.lapses.sum()), days, "cards"))
+        txt += self._lineTbl(i)
+        return txt
+
     # Added, reps and time spent
     ######################################################################
 
@@ -496,72 +622,36 @@ group by day order by day"""
         )
 
     def _done(self, num: Optional[int] = 7, chunk: int = 1) -> Any:
-        lims = []
-        if num is not None:
-            lims.append(
-                "id > %d" % ((self.col.sched.dayCutoff - (num * chunk * 86400)) * 1000)
-            )
-        lim = self._revlogLimit()
-        if lim:
-            lims.append(lim)
-        if lims:
-            lim = "where " + " and ".join(lims)
-        else:
-            lim = ""
         if self.type == PERIOD_MONTH:
             tf = 60.0  # minutes
         else:
             tf = 3600.0  # hours
-        return self.col.db.all(
-            f"""
-select
-(cast((id/1000.0 - ?) / 86400.0 as int))/? as day,
-sum(case when type = {REVLOG_LRN} then 1 else 0 end), -- lrn count
-sum(case when type = {REVLOG_REV} and lastIvl < 21 then 1 else 0 end), -- yng count
-sum(case when type = {REVLOG_REV} and lastIvl >= 21 then 1 else 0 end), -- mtr count
-sum(case when type = {REVLOG_RELRN} then 1 else 0 end), -- lapse count
-sum(case when type = {REVLOG_CRAM} then 1 else 0 end), -- cram count
-sum(case when type = {REVLOG_LRN} then time/1000.0 else 0 end)/?, -- lrn time
--- yng + mtr time
-sum(case when type = {REVLOG_REV} and lastIvl < 21 then time/1000.0 else 0 end)/?,
-sum(case when type = {REVLOG_REV} and lastIvl >= 21 then time/1000.0 else 0 end)/?,
-sum(case when type = {REVLOG_RELRN} then time/1000.0 else 0 end)/?, -- lapse time
-sum(case when type = {REVLOG_CRAM} then time/1000.0 else 0 end)/? -- cram time
-from revlog %s
-group by day order by day"""
-            % lim,
-            self.col.sched.dayCutoff,
-            chunk,
-            tf,
-            tf,
-            tf,
-            tf,
-            tf,
-        )
+        columns = {
+            REVLOG_LRN: (1, 6),
+            REVLOG_RELRN: (4, 9),
+            REVLOG_CRAM: (5, 10),
+        }
+        days: Dict[int, List[float]] = {}
+        for bucket in self._aggregates().revlog:
+            if num is not None and bucket.days_ago >= num * chunk:
+                continue
+            day = -(bucket.days_ago // chunk)
+            row = days.setdefault(day, [day] + [0] * 10)
+            if bucket.type == REVLOG_REV:
+                (cnt, tim) = (3, 8) if bucket.mature else (2, 7)
+            elif bucket.type in columns:
+                (cnt, tim) = columns[bucket.type]
+            else:
+                continue
+            row[cnt] += bucket.count
+            row[tim] += bucket.time / 1000.0 / tf
+        return [tuple(days[day]) for day in sorted(days)]
 
     def _daysStudied(self) -> Any:
-        lims = []
-        num = self._periodDays()
-        if num:
-            lims.append("id > %d" % ((self.col.sched.dayCutoff - (num * 86400)) * 1000))
-        rlim = self._revlogLimit()
-        if rlim:
-            lims.append(rlim)
-        if lims:
-            lim = "where " + " and ".join(lims)
-        else:
-            lim = ""
-        ret = self.col.db.first(
-            """
-select count(), abs(min(day)) from (select
-(cast((id/1000 - ?) / 86400.0 as int)+1) as day
-from revlog %s
-group by day order by day)"""
-            % lim,
-            self.col.sched.dayCutoff,
-        )
-        assert ret
-        return ret
+        days = {bucket.days_ago for bucket in self._aggregates().revlog}
+        if not days:
+            return (0, None)
+        return (len(days), abs(1 - max(days)))
 
     # Intervals
     ######################################################################
@@ -609,29 +699,21 @@ group by day order by day)"""
 
     def _ivls(self) -> Tuple[List[Any], int]:
         start, end, chunk = self.get_start_end_chunk()
-        lim = "and grp <= %d" % end if end else ""
-        data = [
-            self.col.db.all(
-                f"""
-select ivl / ? as grp, count() from cards
-where did in %s and queue = {QUEUE_TYPE_REV} %s
-group by grp
-order by grp"""
-                % (self._limit(), lim),
-                chunk,
-            )
-        ]
-        return (
-            data
-            + list(
-                self.col.db.first(
-                    f"""
-select count(), avg(ivl), max(ivl) from cards where did in %s and queue = {QUEUE_TYPE_REV}"""
-                    % self._limit()
-                )
-            ),
-            chunk,
-        )
+        groups: Dict[int, int] = {}
+        total = ivls = longest = 0
+        for bucket in self._aggregates().cards:
+            if bucket.queue != QUEUE_TYPE_REV:
+                continue
+            grp = bucket.ivl // chunk
+            if not end or grp <= end:
+                groups[grp] = groups.get(grp, 0) + bucket.count
+            total += bucket.count
+            ivls += bucket.ivl * bucket.count
+            longest = max(longest, bucket.ivl)
+        data = [[(grp, groups[grp]) for grp in sorted(groups)]]
+        if not total:
+            return (data + [0, None, None], chunk)
+        return (data + [total, ivls / total, longest], chunk)
 
     # Eases
     ######################################################################
@@ -710,34 +792,20 @@ select count(), avg(ivl), max(ivl) from cards where did in %s and queue = {QUEUE
         )
 
     def _eases(self) -> Any:
-        lims = []
-        lim = self._revlogLimit()
-        if lim:
-            lims.append(lim)
-        days = self._periodDays()
-        if days is not None:
-            lims.append(
-                "id > %d" % ((self.col.sched.dayCutoff - (days * 86400)) * 1000)
-            )
-        if lims:
-            lim = "where " + " and ".join(lims)
-        else:
-            lim = ""
-        if self.col.schedVer() == 1:
-            ease4repl = "3"
-        else:
-            ease4repl = "ease"
-        return self.col.db.all(
-            f"""
-select (case
-when type in ({REVLOG_LRN},{REVLOG_RELRN}) then 0
-when lastIvl < 21 then 1
-else 2 end) as thetype,
-(case when type in ({REVLOG_LRN},{REVLOG_RELRN}) and ease = 4 then %s else ease end), count() from revlog %s
-group by thetype, ease
-order by thetype, ease"""
-            % (ease4repl, lim)
-        )
+        eases: Dict[Tuple[int, int], int] = {}
+        for bucket in self._aggregates().revlog:
+            if bucket.type in (REVLOG_LRN, REVLOG_RELRN):
+                type = 0
+            elif not bucket.mature:
+                type = 1
+            else:
+                type = 2
+            for (ease, count) in bucket.eases():
+                if ease == 4 and type == 0 and self.col.schedVer() == 1:
+                    ease = 3
+                if count:
+                    eases[(type, ease)] = eases.get((type, ease), 0) + count
+        return [(type, ease, eases[(type, ease)]) for (type, ease) in sorted(eases)]
 
     # Hourly retention
     ######################################################################
@@ -810,29 +878,22 @@ order by thetype, ease"""
         return txt
 
     def _hourRet(self) -> Any:
-        lim = self._revlogLimit()
-        if lim:
-            lim = " and " + lim
         if self.col.schedVer() == 1:
             sd = datetime.datetime.fromtimestamp(self.col.crt)
             rolloverHour = sd.hour
         else:
             rolloverHour = self.col.conf.get("rollover", 4)
-        pd = self._periodDays()
-        if pd:
-            lim += " and id > %d" % ((self.col.sched.dayCutoff - (86400 * pd)) * 1000)
-        return self.col.db.all(
-            f"""
-select
-23 - ((cast((? - id/1000) / 3600.0 as int)) %% 24) as hour,
-sum(case when ease = 1 then 0 else 1 end) /
-cast(count() as float) * 100,
-count()
-from revlog where type in ({REVLOG_LRN},{REVLOG_REV},{REVLOG_RELRN}) %s
-group by hour having count() > 30 order by hour"""
-            % lim,
-            self.col.sched.dayCutoff - (rolloverHour * 3600),
-        )
+        hours: Dict[int, List[int]] = {}
+        for (hoursBefore, count, passed) in self._aggregates().hours:
+            hour = 23 - (hoursBefore - rolloverHour) % 24
+            counts = hours.setdefault(hour, [0, 0])
+            counts[0] += count
+            counts[1] += passed
+        return [
+            (hour, passed / float(count) * 100, count)
+            for (hour, (count, passed)) in sorted(hours.items())
+            if count > 30
+        ]
 
     # Cards
     ######################################################################
@@ -897,26 +958,73 @@ when you answer "good" on a review."""
         return "<table width=400>" + "".join(i) + "</table>"
 
     def _factors(self) -> Any:
-        return self.col.db.first(
-            f"""
-select
-min(factor) / 10.0,
-avg(factor) / 10.0,
-max(factor) / 10.0
-from cards where did in %s and queue = {QUEUE_TYPE_REV}"""
-            % self._limit()
+        review = [b for b in self._aggregates().cards if b.queue == QUEUE_TYPE_REV]
+        if not review:
+            return (None, None, None)
+        return (
+            min(b.min_factor for b in review) / 10.0,
+            sum(b.factors for b in review) / sum(b.count for b in review) / 10.0,
+            max(b.max_factor for b in review) / 10.0,
         )
 
     def _cards(self) -> Any:
-        return self.col.db.first(
-            f"""
-select
-sum(case when queue={QUEUE_TYPE_REV} and ivl >= 21 then 1 else 0 end), -- mtr
-sum(case when queue in ({QUEUE_TYPE_LRN},{QUEUE_TYPE_DAY_LEARN_RELEARN}) or (queue={QUEUE_TYPE_REV} and ivl < 21) then 1 else 0 end), -- yng/lrn
-sum(case when queue={QUEUE_TYPE_NEW} then 1 else 0 end), -- new
-sum(case when queue<{QUEUE_TYPE_NEW} then 1 else 0 end) -- susp
-from cards where did in %s"""
-            % self._limit()
+        mtr = yng = new = susp = 0
+        buckets = self._aggregates().cards
+        if not buckets:
+            return (None, None, None, None)
+        for b in buckets:
+            if b.queue == QUEUE_TYPE_REV and b.ivl >= 21:
+                mtr += b.count
+            elif b.queue in (
+                QUEUE_TYPE_LRN,
+                QUEUE_TYPE_DAY_LEARN_RELEARN,
+                QUEUE_TYPE_REV,
+            ):
+                yng += b.count
+            elif b.queue == QUEUE_TYPE_NEW:
+                new += b.count
+            elif b.queue < QUEUE_TYPE_NEW:
+                susp += b.count
+        return (mtr, yng, new, susp)
+
+    # Shared aggregates
+    ######################################################################
+
+    def _aggregates(self) -> _Aggregates:
+        """Buckets that the revlog and card sections are computed from, shared
+        by all the sections and reused until the collection is modified."""
+        global _cached_aggregates
+        key = self._cacheKey()
+        if not _cached_aggregates or _cached_aggregates[0] != key:
+            _cached_aggregates = (key, _Aggregates(self, self._periodDays()))
+        return _cached_aggregates[1]
+
+    def _workload(self, days: int) -> simulator.WorkloadForecast:
+        "The simulated workload, reused like the aggregates."
+        global _cached_workload
+        key = (self._cacheKey(), days)
+        if not _cached_workload or _cached_workload[0] != key:
+            forecast = self.col.sched.simulate_workload(
+                "" if self.wholeCollection else "deck:current",
+                days,
+                recall=simulator.RecallModel.from_history(self.col),
+                seed=0,
+            )
+            _cached_workload = (key, forecast)
+        return _cached_workload[1]
+
+    def _cacheKey(self) -> Tuple:
+        # col.mod is not bumped by every change, so use the backend's count
+        # of calls that may have modified the collection instead
+        return (
+            self.col.path,
+            id(self.col._backend),
+            self.col._backend.change_count,
+            self.col.sched.dayCutoff,
+            self.col.schedVer(),
+            self.type,
+            self._revlogLimit(),
+            self._limit(),
         )
 
     # Footer
@@ -6,15 +6,15 @@
 
 from __future__ import annotations
 
-import gzip
+import json
 import os
 import socket
 import sys
 import time
+import zlib
 from http import HTTPStatus
-from io import BytesIO
 from tempfile import NamedTemporaryFile
-from typing import Iterable, Optional
+from typing import IO, Iterable, Optional
 
 try:
     import flask
@@ -23,35 +23,133 @@ except ImportError as e:
     print(e, "- to use the server, 'pip install anki[syncserver]'")
     sys.exit(1)
 
+try:
+    import zstandard
+except ImportError:
+    # only gzip will be used
+    zstandard = None  # type: ignore
+
 
 from flask import Response
+from werkzeug.wsgi import wrap_file
 
 from anki import Collection
 from anki._backend.backend_pb2 import SyncServerMethodIn
+from anki.syncserver.metrics import SyncMetrics
+from anki.syncserver.pool import (
+    CollectionBusy,
+    CollectionPool,
+    PooledCollection,
+    user_folder_name,
+)
+from anki.syncserver.snapshots import find_snapshot, store_snapshot
+from anki.syncserver.users import Users
 
 Method = SyncServerMethodIn.Method  # pylint: disable=no-member
+# methods of a normal sync that are handled inside the backend's sync state;
+# if they fail, the backend aborts the sync
+SESSION_METHODS = (
+    Method.APPLY_GRAVES,
+    Method.APPLY_CHANGES,
+    Method.CHUNK,
+    Method.APPLY_CHUNK,
+    Method.SANITY_CHECK,
+    Method.FINISH,
+)
 
 app = flask.Flask(__name__)
-col: Collection
+pool: CollectionPool
+# set in multi-user mode
+users: Optional[Users] = None
 trace = os.getenv("TRACE")
+metrics = SyncMetrics()
+
+
+# uploads are decompressed in chunks of this size, so memory use is bounded
+CHUNK_SIZE = 64 * 1024
+# the maximum size of an upload after decompression
+max_upload_bytes = int(os.getenv("MAX_UPLOAD_MB", "1024")) * 1024 * 1024
+# reject larger requests before they are read; gzip can grow incompressible
+# data slightly, so allow some slack
+app.config["MAX_CONTENT_LENGTH"] = max_upload_bytes + 1024 * 1024
+# compression level for replies to clients that accept zstd; 0 disables zstd
+zstd_level = int(os.getenv("ZSTD_LEVEL", "3"))
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def decompress_chunks(file: IO[bytes]) -> Iterable[bytes]:
+    """Decompress gzip or zstd data incrementally, without holding more than
+    a few chunks in memory. Raises UploadTooLarge as soon as the output exceeds
+    max_upload_bytes."""
+    start = file.tell()
+    is_zstd = file.read(len(ZSTD_MAGIC)) == ZSTD_MAGIC
+    file.seek(start)
+    total = 0
+    for out in zstd_chunks(file) if is_zstd else gzip_chunks(file):
+        total += len(out)
+        if total > max_upload_bytes:
+            raise UploadTooLarge()
+        yield out
+    flask.g.bytes_in = (file.tell() - start, total)
+
+
+def gzip_chunks(file: IO[bytes]) -> Iterable[bytes]:
+    decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    while chunk := file.read(CHUNK_SIZE):
+        while chunk:
+            yield decomp.decompress(chunk, CHUNK_SIZE)
+            chunk = decomp.unconsumed_tail
+    if not decomp.eof:
+        raise Exception("truncated upload")
+
+
+def zstd_chunks(file: IO[bytes]) -> Iterable[bytes]:
+    if not zstandard:
+        raise Exception("zstd upload received, but zstandard is not installed")
+    with zstandard.ZstdDecompressor().stream_reader(
+        file, read_size=CHUNK_SIZE, closefd=False
+    ) as reader:
+        while chunk := reader.read(CHUNK_SIZE):
+            yield chunk
+
+
+def client_accepts_zstd() -> bool:
+    accepted = flask.request.headers.get("Accept-Encoding", "")
+    return bool(zstandard and zstd_level > 0 and "zstd" in accepted)
+
+
+def binary_response(data: bytes) -> Response:
+    "A reply to the client, compressed with zstd if the client supports it."
+    size = len(data)
+    zstd = client_accepts_zstd()
+    if zstd:
+        data = zstandard.ZstdCompressor(level=zstd_level).compress(data)
+    resp = flask.make_response(data)
+    resp.headers["Content-Type"] = "application/binary"
+    if zstd:
+        resp.headers["Content-Encoding"] = "zstd"
+    flask.g.bytes_out = (len(data), size)
+    return resp
 
 
 def get_request_data() -> bytes:
-    buf = BytesIO()
-    flask.request.files["data"].save(buf)
-    buf.seek(0)
-    zip = gzip.GzipFile(mode="rb", fileobj=buf)
-    return zip.read()
+    return b"".join(decompress_chunks(flask.request.files["data"].stream))
 
 
 def get_request_data_into_file() -> bytes:
     "Returns the utf8 path to the resulting file."
-    # this could be optimized to stream the data into a file
-    # in the future
-    data = get_request_data()
     tempobj = NamedTemporaryFile(dir=folder(), delete=False)
-    tempobj.write(data)
-    tempobj.close()
+    try:
+        with tempobj:
+            for chunk in decompress_chunks(flask.request.files["data"].stream):
+                tempobj.write(chunk)
+    except Exception:
+        os.unlink(tempobj.name)
+        raise
     return tempobj.name.encode("utf8")
 
 
@@ -60,6 +158,66 @@ def handle_sync_request(method_str: str) -> Response:
     if method is None:
         raise Exception(f"unknown method: {method_str}")
 
+    name = Method.Name(method).lower()
+    start = time.time()
+    try:
+        resp = handle_sync_method(method)
+    except Exception:
+        metrics.record_request(
+            name, HTTPStatus.INTERNAL_SERVER_ERROR, time.time() - start
+        )
+        raise
+    metrics.record_request(name, resp.status_code, time.time() - start)
+    if bytes_in := flask.g.get("bytes_in"):
+        metrics.record_bytes_in(name, *bytes_in)
+    if bytes_out := flask.g.get("bytes_out"):
+        metrics.record_bytes_out(name, *bytes_out)
+    return resp
+
+
+def handle_sync_method(method: SyncServerMethodIn.Method.V) -> Response:
+    if users and method == Method.HOST_KEY:
+        return handle_host_key(users, get_request_data())
+
+    user = authenticated_user()
+    if user is None:
+        return flask.make_response("Forbidden", HTTPStatus.FORBIDDEN)
+
+    try:
+        with pool.use(user) as entry:
+            return handle_collection_request(entry, method)
+    except CollectionBusy:
+        # another request for this user is taking too long
+        return flask.make_response(
+            "Service Unavailable", HTTPStatus.SERVICE_UNAVAILABLE
+        )
+    except UploadTooLarge:
+        return flask.make_response(
+            "Request Entity Too Large", HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+        )
+
+
+def handle_host_key(users: Users, data: bytes) -> Response:
+    creds = json.loads(data)
+    hkey = users.host_key(creds.get("u", ""), creds.get("p", ""))
+    if hkey is None:
+        return flask.make_response("Forbidden", HTTPStatus.FORBIDDEN)
+    return binary_response(json.dumps({"key": hkey}).encode("utf8"))
+
+
+def authenticated_user() -> Optional[str]:
+    "The user the request's host key belongs to. Always '' in single-user mode."
+    if not users:
+        return ""
+    return users.user_for_host_key(flask.request.form.get("k", ""))
+
+
+def handle_collection_request(
+    entry: PooledCollection, method: SyncServerMethodIn.Method.V
+) -> Response:
+    col = entry.col
+    assert col
+    start = time.time()
     if method == Method.FULL_UPLOAD:
         data = get_request_data_into_file()
     else:
@@ -67,47 +225,104 @@ def handle_sync_request(method_str: str) -> Response:
         if trace:
             print("-->", data)
 
+    if method == Method.FULL_DOWNLOAD:
+        if snapshot := find_snapshot(col, download_zstd_level()):
+            return full_download_response(snapshot, start)
+
     full = method in (Method.FULL_UPLOAD, Method.FULL_DOWNLOAD)
     if full:
         col.close_for_full_sync()
     try:
         outdata = col._backend.sync_server_method(method=method, data=data)
     except Exception as e:
+        if method in SESSION_METHODS:
+            entry.in_session = False
         if method == Method.META:
-            # if parallel syncing requests come in, block them
+            # another client's sync is in progress
             print("exception in meta", e)
             return flask.make_response("Conflict", 409)
         else:
             raise
     finally:
         if full:
-            after_full_sync()
+            after_full_sync(col)
+
+    if method == Method.START:
+        entry.in_session = True
+    elif method in (Method.FINISH, Method.ABORT):
+        entry.in_session = False
+    elif method == Method.SANITY_CHECK and not sanity_check_passed(outdata):
+        # the backend aborts the sync when the collections differ
+        entry.in_session = False
 
-    resp = None
     if method == Method.FULL_UPLOAD:
+        metrics.record_full_sync("full_upload", time.time() - start)
         # upload call expects a raw string literal returned
-        outdata = b"OK"
+        return binary_response(b"OK")
     elif method == Method.FULL_DOWNLOAD:
-        path = outdata.decode("utf8")
-
-        def stream_reply() -> Iterable[bytes]:
-            with open(path, "rb") as f:
-                while chunk := f.read(16 * 1024):
-                    yield chunk
-                os.unlink(path)
-
-        resp = Response(stream_reply())
+        snapshot = store_snapshot(col, outdata.decode("utf8"), download_zstd_level())
+        return full_download_response(snapshot, start)
     else:
         if trace:
             print("<--", outdata)
-
-    if not resp:
-        resp = flask.make_response(outdata)
+        return binary_response(outdata)
+
+
+def sanity_check_passed(outdata: bytes) -> bool:
+    return json.loads(outdata).get("status") == "ok"
+
+
+def download_zstd_level() -> Optional[int]:
+    return zstd_level if client_accepts_zstd() else None
+
+
+def full_download_response(path: str, start: float) -> Response:
+    """Send a collection snapshot, which is compressed if its name ends in
+    .zst. Clients can resume an interrupted download with a Range header,
+    and an If-Range header with the ETag of the earlier response."""
+    size = os.path.getsize(path)
+    etag = os.path.basename(path)
+    byte_range = None
+    if_range = flask.request.headers.get("If-Range")
+    if flask.request.range and (not if_range or if_range.strip('"') == etag):
+        byte_range = flask.request.range.range_for_length(size)
+        if not byte_range:
+            resp = flask.make_response(
+                "Range Not Satisfiable", HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+            )
+            resp.headers["Content-Range"] = f"bytes */{size}"
+            return resp
+    (begin, end) = byte_range or (0, size)
+
+    file = open(path, "rb")
+    file.seek(begin)
+    # the WSGI file wrapper lets waitress send the file from its own buffers,
+    # instead of passing each chunk through Python code
+    resp = Response(
+        wrap_file(flask.request.environ, file, CHUNK_SIZE),
+        status=HTTPStatus.PARTIAL_CONTENT if byte_range else HTTPStatus.OK,
+        direct_passthrough=True,
+    )
     resp.headers["Content-Type"] = "application/binary"
+    resp.headers["Content-Length"] = str(end - begin)
+    resp.headers["Accept-Ranges"] = "bytes"
+    resp.headers["ETag"] = f'"{etag}"'
+    if byte_range:
+        resp.headers["Content-Range"] = f"bytes {begin}-{end - 1}/{size}"
+    original_size = size
+    if path.endswith(".zst"):
+        resp.headers["Content-Encoding"] = "zstd"
+        # lets the client show progress
+        original_size = os.path.getsize(path[: -len(".zst")])
+        resp.headers["Anki-Original-Size"] = str(original_size)
+    flask.g.bytes_out = (end - begin, original_size * (end - begin) // size)
+    resp.call_on_close(
+        lambda: metrics.record_full_sync("full_download", time.time() - start)
+    )
     return resp
 
 
-def after_full_sync() -> None:
+def after_full_sync(col: Collection) -> None:
     # the server methods do not reopen the collection after a full sync,
     # so we need to
     col.reopen(after_full_sync=False)
@@ -157,6 +372,17 @@ def handle_request(pathin: str) -> Response:
         return flask.make_response("not found", HTTPStatus.NOT_FOUND)
 
 
+@app.route("/metrics", methods=["GET"])
+def handle_metrics() -> Response:
+    resp = flask.make_response(
+        metrics.render(
+            active_sessions=pool.session_count(), open_collections=pool.open_count()
+        )
+    )
+    resp.headers["Content-Type"] = "text/plain; version=0.0.4"
+    return resp
+
+
 def folder() -> str:
     folder = os.getenv("FOLDER", os.path.expanduser("~/.syncserver"))
     if not os.path.exists(folder):
@@ -165,23 +391,45 @@ def folder() -> str:
     return folder
 
 
-def col_path() -> str:
-    return os.path.join(folder(), "collection.server.anki2")
+def col_path(user: str = "") -> str:
+    "Path to the user's collection. In single-user mode, user is ''."
+    if not user:
+        return os.path.join(folder(), "collection.server.anki2")
+    # usernames are validated when the users file is loaded
+    user_dir = os.path.join(folder(), user_folder_name(user) or "_invalid")
+    if not os.path.exists(user_dir):
+        os.mkdir(user_dir)
+    return os.path.join(user_dir, "collection.server.anki2")
 
 
 def serve() -> None:
-    global col
+    global pool, users
+
+    if users_file := os.getenv("USERS_FILE"):
+        users = Users(users_file, os.path.join(folder(), "hkeys.json"))
+        print(f"Multi-user mode: {len(users)} users loaded from {users_file}")
+    pool = CollectionPool(
+        col_path,
+        max_open=int(os.getenv("MAX_OPEN_COLLECTIONS", "100")),
+        idle_secs=float(os.getenv("COLLECTION_IDLE_SECS", "600")),
+        wait_secs=float(os.getenv("COLLECTION_WAIT_SECS", "60")),
+    )
+    if not users:
+        # open the collection up front, so any problems are reported at startup
+        with pool.use(""):
+            pass
 
-    col = Collection(col_path(), server=True)
-    # don't hold an outer transaction open
-    col.db.rollback()
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8080"))
+    # the backend releases the GIL, so requests for different users can
+    # make use of multiple cores
+    threads = int(os.getenv("THREADS", str(os.cpu_count() or 4)))
 
     server = create_server(
         app,
         host=host,
         port=port,
+        threads=threads,
         clear_untrusted_proxy_headers=True,
     )
 
@@ -193,4 +441,7 @@ def serve() -> None:
     print(
         "For more info, see https://github.com/ankitects/anki/blob/master/docs/syncserver.md"
     )
-    server.run()
+    try:
+        server.run()
+    finally:
+        pool.close_all()
@@ -0,0 +1,133 @@
+# Copyright: Ankitects Pty Ltd and contributors
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""
+Request metrics for the sync server, exposed in the Prometheus text format.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+from collections import defaultdict
+from typing import DefaultDict, Dict, List, Sequence, Tuple
+
+# upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+FULL_SYNC_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = buckets
+        # the last count is for values above the largest bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        sep = "," if labels else ""
+        lines = []
+        cumulative = 0
+        for (bound, count) in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class SyncMetrics:
+    """Counters and histograms updated by request handlers. Methods are
+    identified by their lowercase name, eg 'apply_chunk'."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._requests: DefaultDict[Tuple[str, int], int] = defaultdict(int)
+        self._latency: Dict[str, Histogram] = {}
+        # (method, direction, encoding) -> bytes
+        self._bytes: DefaultDict[Tuple[str, str, str], int] = defaultdict(int)
+        self._full_syncs: Dict[str, Histogram] = {}
+
+    def record_request(self, method: str, status: int, seconds: float) -> None:
+        with self._lock:
+            self._requests[(method, status)] += 1
+            if method not in self._latency:
+                self._latency[method] = Histogram(LATENCY_BUCKETS)
+            self._latency[method].observe(seconds)
+
+    def record_bytes_in(self, method: str, compressed: int, uncompressed: int) -> None:
+        with self._lock:
+            self._bytes[(method, "in", "compressed")] += compressed
+            self._bytes[(method, "in", "uncompressed")] += uncompressed
+
+    def record_bytes_out(self, method: str, compressed: int, uncompressed: int) -> None:
+        with self._lock:
+            self._bytes[(method, "out", "compressed")] += compressed
+            self._bytes[(method, "out", "uncompressed")] += uncompressed
+
+    def record_full_sync(self, method: str, seconds: float) -> None:
+        "Duration of a full upload or download, including the transfer."
+        with self._lock:
+            if method not in self._full_syncs:
+                self._full_syncs[method] = Histogram(FULL_SYNC_BUCKETS)
+            self._full_syncs[method].observe(seconds)
+
+    def render(self, active_sessions: int, open_collections: int) -> str:
+        "Metrics in the Prometheus text exposition format."
+        out = [
+            "# HELP anki_sync_requests_total Sync requests handled.",
+            "# TYPE anki_sync_requests_total counter",
+        ]
+        with self._lock:
+            for ((method, status), count) in sorted(self._requests.items()):
+                out.append(
+                    f'anki_sync_requests_total{{method="{method}",status="{status}"}} {count}'
+                )
+
+            out.append(
+                "# HELP anki_sync_request_seconds Time taken to handle requests."
+            )
+            out.append("# TYPE anki_sync_request_seconds histogram")
+            for (method, hist) in sorted(self._latency.items()):
+                out.extend(
+                    hist.render("anki_sync_request_seconds", f'method="{method}"')
+                )
+
+            out.append(
+                "# HELP anki_sync_bytes_total Request and response body sizes, "
+                "before and after compression."
+            )
+            out.append("# TYPE anki_sync_bytes_total counter")
+            for ((method, direction, encoding), count) in sorted(self._bytes.items()):
+                out.append(
+                    f'anki_sync_bytes_total{{method="{method}",direction="{direction}",encoding="{encoding}"}} {count}'
+                )
+
+            out.append(
+                "# HELP anki_sync_full_sync_seconds Duration of full uploads "
+                "and downloads."
+            )
+            out.append("# TYPE anki_sync_full_sync_seconds histogram")
+            for (method, hist) in sorted(self._full_syncs.items()):
+                out.extend(
+                    hist.render("anki_sync_full_sync_seconds", f'method="{method}"')
+                )
+
+        out.extend(
+            [
+                "# HELP anki_sync_active_sessions Normal syncs in progress.",
+                "# TYPE anki_sync_active_sessions gauge",
+                f"anki_sync_active_sessions {active_sessions}",
+                "# HELP anki_sync_open_collections Collections held open by the server.",
+                "# TYPE anki_sync_open_collections gauge",
+                f"anki_sync_open_collections {open_collections}",
+            ]
+        )
+        return "\n".join(out) + "\n"
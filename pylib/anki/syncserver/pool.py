@@ -0,0 +1,185 @@
+# Copyright: Ankitects Pty Ltd and contributors
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Generator, Optional
+
+from anki import Collection
+from anki._backend.backend_pb2 import SyncServerMethodIn
+
+Method = SyncServerMethodIn.Method  # pylint: disable=no-member
+
+
+class CollectionBusy(Exception):
+    "Raised when a collection is not released before the wait timeout."
+
+
+@dataclass
+class PooledCollection:
+    last_used: float
+    # opened by the first request that uses it
+    col: Optional[Collection] = None
+    # held while a request is using the collection
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    # number of requests currently using the collection
+    active: int = 0
+    # true between the start and finish of a normal sync, when the collection
+    # is held by the backend's sync state, and must not be closed
+    in_session: bool = False
+    # true while the collection is being closed by evict(), which holds the
+    # entry's lock until it's done
+    closing: bool = False
+
+
+class CollectionPool:
+    """Keeps the collections of recently active users open, so they don't
+    need to be reopened on every request.
+
+    Collections that have not been used for idle_secs are closed, as are the
+    least recently used ones when more than max_open are open. Collections
+    that are in use or in the middle of a sync are not closed, so max_open may
+    be exceeded temporarily. A sync that has been abandoned for longer than
+    session_secs is aborted, so the collection can be closed.
+
+    Requests for different users can run in parallel, as each collection has
+    its own backend. Requests for the same user wait for the collection for
+    up to wait_secs, then fail with CollectionBusy.
+    """
+
+    def __init__(
+        self,
+        path_for_user: Callable[[str], str],
+        max_open: int = 100,
+        idle_secs: float = 600,
+        session_secs: float = 1800,
+        wait_secs: float = 60,
+    ) -> None:
+        self.path_for_user = path_for_user
+        self.max_open = max_open
+        self.idle_secs = idle_secs
+        self.session_secs = session_secs
+        self.wait_secs = wait_secs
+        self._entries: OrderedDict[str, PooledCollection] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def use(self, user: str) -> Generator[PooledCollection, None, None]:
+        """Wait for exclusive use of the user's collection, opening it if
+        necessary."""
+        with self._lock:
+            entry = self._entries.get(user)
+            if entry:
+                self._entries.move_to_end(user)
+            else:
+                entry = PooledCollection(last_used=time.time())
+                self._entries[user] = entry
+            # prevents eviction while waiting
+            entry.active += 1
+        try:
+            if not entry.lock.acquire(timeout=self.wait_secs):
+                raise CollectionBusy()
+            try:
+                if entry.col is None:
+                    entry.col = open_server_collection(self.path_for_user(user))
+                yield entry
+            finally:
+                entry.lock.release()
+        finally:
+            with self._lock:
+                entry.active -= 1
+                entry.last_used = time.time()
+            self.evict()
+
+    def open_count(self) -> int:
+        with self._lock:
+            return sum(1 for e in self._entries.values() if e.col is not None)
+
+    def session_count(self) -> int:
+        "Number of normal syncs in progress."
+        with self._lock:
+            return sum(1 for e in self._entries.values() if e.in_session)
+
+    def evict(self) -> None:
+        "Close idle collections, and any above the max_open limit."
+        now = time.time()
+        to_close = []
+        # entries are only picked under the pool lock; they're closed after it
+        # has been released, so that requests for other users aren't held up
+        with self._lock:
+            open_count = sum(1 for e in self._entries.values() if not e.closing)
+            for entry in list(self._entries.values()):
+                idle = now - entry.last_used
+                if not self._can_close(entry, idle):
+                    continue
+                if open_count > self.max_open or idle > self.idle_secs:
+                    # a request for the user will wait on the lock until the
+                    # collection has been closed
+                    if entry.lock.acquire(blocking=False):
+                        entry.closing = True
+                        to_close.append(entry)
+                        open_count -= 1
+        for entry in to_close:
+            close_server_collection(entry)
+            with self._lock:
+                entry.closing = False
+                # if a request is waiting for it, the collection is reopened
+                # in place
+                if not entry.active:
+                    for (user, other) in list(self._entries.items()):
+                        if other is entry:
+                            del self._entries[user]
+            entry.lock.release()
+
+    def close_all(self) -> None:
+        with self._lock:
+            for entry in self._entries.values():
+                close_server_collection(entry)
+            self._entries.clear()
+
+    def _can_close(self, entry: PooledCollection, idle: float) -> bool:
+        if entry.active or entry.closing:
+            return False
+        if entry.in_session:
+            return idle > self.session_secs
+        return True
+
+
+def open_server_collection(path: str) -> Collection:
+    col = Collection(path, server=True)
+    # don't hold an outer transaction open
+    col.db.rollback()
+    return col
+
+
+def close_server_collection(entry: PooledCollection) -> None:
+    if entry.col is None:
+        return
+    if entry.in_session:
+        # return the collection from the abandoned sync to the backend
+        entry.in_session = False
+        try:
+            entry.col._backend.sync_server_method(method=Method.ABORT, data=b"{}")
+        except Exception as e:  # pylint: disable=broad-except
+            print("error aborting sync", entry.col.path, e)
+    try:
+        entry.col.close(downgrade=False)
+    except Exception as e:  # pylint: disable=broad-except
+        print("error closing collection", entry.col.path, e)
+    entry.col = None
+
+
+def user_folder_name(user: str) -> Optional[str]:
+    "The folder a user's collection is stored in, or None if name is unsafe."
+    if (
+        not user
+        or user.startswith(".")
+        or not all(c.isalnum() or c in "-_.@" for c in user)
+    ):
+        return None
+    return user
@@ -0,0 +1,79 @@
+# Copyright: Ankitects Pty Ltd and contributors
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""
+Exported copies of collections from previous full downloads.
+
+Preparing a full download closes the collection and copies it, so the
+result is kept next to the collection, and reused until the collection
+changes. Only the latest snapshot of each collection is kept. A zstd
+compressed copy is made when a client that accepts zstd asks for it.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+from typing import Optional
+
+from anki import Collection
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # type: ignore
+
+PREFIX = "download-"
+
+
+def _key(col: Collection) -> str:
+    # the usn is bumped by every download and sync, and the schema by
+    # full uploads
+    (mod, scm, usn) = col.db.first("select mod, scm, usn from col")
+    return f"{mod}-{scm}-{usn}"
+
+
+def _path(col: Collection, key: str) -> str:
+    return os.path.join(os.path.dirname(col.path), f"{PREFIX}{key}.anki2")
+
+
+def find_snapshot(col: Collection, zstd_level: Optional[int]) -> Optional[str]:
+    """Path to an up-to-date snapshot of the collection, if one exists. If
+    zstd_level is provided, the path is to a compressed copy."""
+    path = _path(col, _key(col))
+    if not os.path.exists(path):
+        return None
+    if zstd_level:
+        return _compressed(path, zstd_level)
+    return path
+
+
+def store_snapshot(
+    col: Collection, exported_path: str, zstd_level: Optional[int]
+) -> str:
+    """Move a freshly exported collection into the cache, replacing any older
+    snapshots, and return the path to serve. Call after reopening."""
+    folder = os.path.dirname(col.path)
+    for name in os.listdir(folder):
+        if name.startswith(PREFIX):
+            try:
+                os.unlink(os.path.join(folder, name))
+            except OSError:
+                # still being sent on Windows; will be removed next time
+                pass
+    path = _path(col, _key(col))
+    shutil.move(exported_path, path)
+    if zstd_level:
+        return _compressed(path, zstd_level)
+    return path
+
+
+def _compressed(path: str, zstd_level: int) -> str:
+    compressed = path + ".zst"
+    if not os.path.exists(compressed):
+        temp = compressed + ".tmp"
+        cctx = zstandard.ZstdCompressor(level=zstd_level, write_content_size=True)
+        with open(path, "rb") as src, open(temp, "wb") as dst:
+            cctx.copy_stream(src, dst, size=os.path.getsize(path))
+        os.replace(temp, compressed)
+    return compressed
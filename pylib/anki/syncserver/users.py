@@ -0,0 +1,77 @@
+# Copyright: Ankitects Pty Ltd and contributors
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+from __future__ import annotations
+
+import hmac
+import json
+import os
+import secrets
+import threading
+from typing import Dict, Optional
+
+from anki.syncserver.pool import user_folder_name
+
+
+class Users:
+    """The accounts of a multi-user server, read from a file containing one
+    username:password entry per line. Blank lines and lines starting with #
+    are ignored.
+
+    On their first login, each user is given a random host key, which clients
+    send with each request afterwards. Host keys are stored in a JSON file at
+    keys_path, so clients stay logged in when the server restarts.
+    """
+
+    def __init__(self, path: str, keys_path: str) -> None:
+        self._passwords: Dict[str, str] = {}
+        with open(path, encoding="utf8") as file:
+            for line in file:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                (user, sep, password) = line.partition(":")
+                if not sep or not user_folder_name(user):
+                    raise Exception(f"invalid entry in {path}: {user}")
+                self._passwords[user] = password
+
+        self._keys_path = keys_path
+        self._lock = threading.Lock()
+        self._keys: Dict[str, str] = {}
+        if os.path.exists(keys_path):
+            with open(keys_path, encoding="utf8") as file:
+                self._keys = json.load(file)
+        # keys of users that have since been removed are ignored
+        self._users_by_hkey = {
+            hkey: user for (user, hkey) in self._keys.items() if user in self._passwords
+        }
+
+    def __len__(self) -> int:
+        return len(self._passwords)
+
+    def host_key(self, user: str, password: str) -> Optional[str]:
+        "The user's host key, or None if the credentials are not valid."
+        expected = self._passwords.get(user)
+        if expected is None or not hmac.compare_digest(
+            expected.encode("utf8"), password.encode("utf8")
+        ):
+            return None
+        with self._lock:
+            if hkey := self._keys.get(user):
+                return hkey
+            hkey = secrets.token_hex(16)
+            self._keys[user] = hkey
+            self._users_by_hkey[hkey] = user
+            self._save_keys()
+            return hkey
+
+    def user_for_host_key(self, hkey: str) -> Optional[str]:
+        with self._lock:
+            return self._users_by_hkey.get(hkey)
+
+    def _save_keys(self) -> None:
+        tmp_path = f"{self._keys_path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, "w", encoding="utf8") as file:
+            json.dump(self._keys, file)
+        os.replace(tmp_path, self._keys_path)
@@ -0,0 +1,146 @@
+# Copyright: Ankitects Pty Ltd and contributors
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+"""
+The revlog and cards tables as NumPy structured arrays, for analysis.
+
+The backend sends rows packed as fixed-width little-endian integers, which
+are used as the arrays' memory directly, so a table takes as much memory
+as its columns and no more. The arrays are read-only; copy() one to modify
+it. Card fields are not included.
+
+Requires numpy.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Iterator, List, Sequence, Tuple
+
+import anki
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+# must match rslib/src/stats/tables.rs
+REVLOG_COLUMNS: List[Tuple[str, str]] = [
+    ("id", "<i8"),
+    ("cid", "<i8"),
+    ("usn", "<i4"),
+    ("ease", "u1"),
+    ("ivl", "<i4"),
+    ("lastIvl", "<i4"),
+    ("factor", "<i4"),
+    ("time", "<i4"),
+    ("type", "u1"),
+]
+
+CARD_COLUMNS: List[Tuple[str, str]] = [
+    ("id", "<i8"),
+    ("nid", "<i8"),
+    ("did", "<i8"),
+    ("ord", "<i4"),
+    ("mod", "<i8"),
+    ("usn", "<i4"),
+    ("type", "i1"),
+    ("queue", "i1"),
+    ("due", "<i4"),
+    ("ivl", "<i4"),
+    ("factor", "<i4"),
+    ("reps", "<i4"),
+    ("lapses", "<i4"),
+    ("left", "<i4"),
+    ("odue", "<i4"),
+    ("odid", "<i8"),
+    ("flags", "u1"),
+]
+
+
+def is_available() -> bool:
+    return np is not None
+
+
+def revlog_table(col: anki.collection.Collection, search: str = "") -> Any:
+    """Review log entries of the cards matching search, ordered by id. An
+    empty search includes the entries of deleted cards."""
+    return _read(col._backend.revlog_table, REVLOG_COLUMNS, search)[0]
+
+
+def cards_table(col: anki.collection.Collection, search: str = "") -> Any:
+    "Cards matching search, ordered by id."
+    return _read(col._backend.cards_table, CARD_COLUMNS, search)[0]
+
+
+def revlog_batches(
+    col: anki.collection.Collection, search: str = "", batch_size: int = 100_000
+) -> Iterator[Any]:
+    """Like revlog_table(), in arrays of up to batch_size entries, so that
+    the whole table does not need to fit in memory. The search is only run
+    once, and its cards passed to each batch."""
+    card_ids = _searched_ids(col, search)
+    if card_ids is not None and not card_ids:
+        # no ids would read the whole table
+        return
+    after_id = 0
+    while True:
+        (array, after_id) = _read(
+            col._backend.revlog_table,
+            REVLOG_COLUMNS,
+            search,
+            batch_size,
+            after_id,
+            card_ids,
+        )
+        if len(array):
+            yield array
+        if len(array) < batch_size:
+            return
+
+
+def cards_batches(
+    col: anki.collection.Collection, search: str = "", batch_size: int = 100_000
+) -> Iterator[Any]:
+    "Like cards_table(), in arrays of up to batch_size cards."
+    card_ids = _searched_ids(col, search)
+    if card_ids is not None:
+        # the cards are known, so each batch only needs its own
+        for i in range(0, len(card_ids), batch_size):
+            yield _read(
+                col._backend.cards_table,
+                CARD_COLUMNS,
+                search,
+                card_ids=card_ids[i : i + batch_size],
+            )[0]
+        return
+    after_id = 0
+    while True:
+        (array, after_id) = _read(
+            col._backend.cards_table, CARD_COLUMNS, search, batch_size, after_id
+        )
+        if len(array):
+            yield array
+        if len(array) < batch_size:
+            return
+
+
+def _searched_ids(col: anki.collection.Collection, search: str) -> Any:
+    "Ids of the cards matching search in id order, or None for an empty search."
+    if not search.strip():
+        return None
+    return sorted(col.find_cards(search))
+
+
+def _read(
+    method: Callable,
+    columns: List[Tuple[str, str]],
+    search: str,
+    limit: int = 0,
+    after_id: int = 0,
+    card_ids: Sequence[int] = (),
+) -> Tuple[Any, int]:
+    "The array of rows, and the id of the last one."
+    if not is_available():
+        raise Exception("Reading tables requires numpy.")
+    out = method(search=search, after_id=after_id, limit=limit, card_ids=card_ids)
+    return (np.frombuffer(out.rows, dtype=np.dtype(columns)), out.last_id)
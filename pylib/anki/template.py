@@ -113,8 +113,14 @@ class TemplateRenderContext:
     using the _private fields directly."""
 
     @staticmethod
-    def from_existing_card(card: Card, browser: bool) -> TemplateRenderContext:
-        return TemplateRenderContext(card.col, card, card.note(), browser)
+    def from_existing_card(
+        card: Card, browser: bool, partial: Optional[PartiallyRenderedCard] = None
+    ) -> TemplateRenderContext:
+        """If partial is provided, it is used instead of asking the backend to
+        render the card, eg when it was fetched in advance."""
+        return TemplateRenderContext(
+            card.col, card, card.note(), browser, partial=partial
+        )
 
     @classmethod
     def from_card_layout(
@@ -143,6 +149,7 @@ class TemplateRenderContext:
         notetype: NotetypeDict = None,
         template: Optional[Dict] = None,
         fill_empty: bool = False,
+        partial: Optional[PartiallyRenderedCard] = None,
     ) -> None:
         self._col = col.weakref()
         self._card = card
@@ -150,6 +157,7 @@ class TemplateRenderContext:
         self._browser = browser
         self._template = template
         self._fill_empty = fill_empty
+        self._partial = partial
         self._fields: Optional[Dict] = None
         if not notetype:
             self._note_type = note.model()
@@ -236,7 +244,9 @@ class TemplateRenderContext:
         return output
 
     def _partially_render(self) -> PartiallyRenderedCard:
-        if self._template:
+        if self._partial:
+            return self._partial
+        elif self._template:
             # card layout screen
             out = self._col._backend.render_uncommitted_card(
                 note=self._note._to_backend_note(),
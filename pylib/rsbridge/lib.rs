@@ -4,7 +4,7 @@
 use anki::backend::{init_backend, Backend as RustBackend};
 use pyo3::exceptions::PyException;
 use pyo3::prelude::*;
-use pyo3::types::PyBytes;
+use pyo3::types::{PyBytes, PyList};
 use pyo3::{create_exception, wrap_pyfunction};
 
 #[pyclass(module = "rsbridge")]
@@ -45,6 +45,31 @@ impl Backend {
             .map_err(BackendError::new_err)
     }
 
+    /// Run multiple commands with a single call, returning a list of
+    /// (success, output) tuples in the same order as the input. Unlike
+    /// command(), errors are returned rather than raised, and a failing
+    /// command does not prevent the following ones from running.
+    fn command_batch(&self, py: Python, commands: Vec<(u32, u32, &PyBytes)>) -> PyObject {
+        let inputs: Vec<(u32, u32, &[u8])> = commands
+            .iter()
+            .map(|(service, method, input)| (*service, *method, input.as_bytes()))
+            .collect();
+        let outputs: Vec<_> = py.allow_threads(|| {
+            inputs
+                .iter()
+                .map(|(service, method, input)| self.backend.run_method(*service, *method, input))
+                .collect()
+        });
+        let results: Vec<PyObject> = outputs
+            .into_iter()
+            .map(|output| match output {
+                Ok(bytes) => (true, PyBytes::new(py, &bytes)).into_py(py),
+                Err(bytes) => (false, PyBytes::new(py, &bytes)).into_py(py),
+            })
+            .collect();
+        PyList::new(py, results).into()
+    }
+
     /// This takes and returns JSON, due to Python's slow protobuf
     /// encoding/decoding.
     fn db_command(&self, py: Python, input: &PyBytes) -> PyResult<PyObject> {
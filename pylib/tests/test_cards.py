@@ -3,7 +3,8 @@
 
 # coding: utf-8
 
-from tests.shared import getEmptyCol
+from anki.errors import NotFoundError
+from tests.shared import assertException, getEmptyCol
 
 
 def test_delete():
@@ -95,3 +96,22 @@ def test_gendeck():
     note["Text"] += "{{c4::four}}"
     note.flush()
     assert note.cards()[3].did == newId
+
+
+def test_get_cards():
+    col = getEmptyCol()
+    cids = []
+    for i in range(3):
+        note = col.newNote()
+        note["Front"] = str(i)
+        col.addNote(note)
+        cids.append(note.cards()[0].id)
+    cards = col.get_cards(cids)
+    assert [c.id for c in cards] == cids
+    assert [c.note()["Front"] for c in cards] == ["0", "1", "2"]
+    assert col.get_cards([]) == []
+    # failures are raised after the other calls have run
+    pipeline = col._backend.pipeline()
+    pipeline.get_card(cids[0])
+    pipeline.get_card(123)
+    assertException(NotFoundError, pipeline.execute)
@@ -3,6 +3,8 @@
 
 # coding: utf-8
 
+import asyncio
+import json
 import os
 import tempfile
 
@@ -172,3 +174,80 @@ def test_db_named_args(capsys):
 
     # swallow the warning
     _ = capsys.readouterr()
+
+
+def test_db_binary_rows():
+    col = getEmptyCol()
+    sql = "select 1, 1.5, 'tést', null, x'00ff' union all select 2, 3, null, 'a', 4"
+    binary = col.db.all(sql)
+    assert binary == [[1, 1.5, "tést", None, b"\x00\xff"], [2, 3, None, "a", 4]]
+    assert col.db.first(sql) == binary[0]
+    assert col.db.all("select id from cards") == []
+
+    # the JSON fallback should return the same rows, aside from blobs
+    col._backend.binary_db_rows = False
+    assert col.db.list(sql) == [1, 2]
+    assert col.db.all(sql)[1] == binary[1]
+    col._backend.binary_db_rows = True
+
+
+def test_db_iter():
+    col = getEmptyCol()
+    for i in range(5):
+        note = col.newNote()
+        note["Front"] = str(i)
+        col.addNote(note)
+    sql = "select id, flds from notes order by id"
+    rows = list(col.db.iter(sql, batch_size=2))
+    assert rows == col.db.all(sql)
+    # rows are a snapshot, so modifying the table while iterating is safe
+    for nid, _ in col.db.iter(sql, batch_size=2):
+        col.db.execute("delete from notes where id = ?", nid)
+    assert not col.db.list("select id from notes")
+    # abandoned iterators are cleaned up
+    it = col.db.iter(sql)
+    next(it, None)
+    it.close()
+
+
+def test_async_collection():
+    col = getEmptyCol()
+    note = col.newNote()
+    note["Front"] = "one"
+    col.addNote(note)
+    acol = col.as_async()
+
+    async def search():
+        return await asyncio.gather(acol.find_cards("one"), acol.find_notes("two"))
+
+    (cids, nids) = asyncio.run(search())
+    assert list(cids) == [note.cards()[0].id]
+    assert list(nids) == []
+
+
+def test_backend_stats():
+    col = getEmptyCol()
+    assert col.backend_stats() is None
+    col.set_backend_profiling_enabled(True)
+    col.db.all("select id from cards where id in (1, 2)")
+    col.db.all("select id from cards where id in (3)")
+    col.get_cards([])
+    col.find_cards("")
+    stats = col.backend_stats(reset=True)
+    assert stats["sql"]["select id from cards where id in (?)"]["count"] == 2
+    assert stats["methods"]["SearchService.SearchCards"]["count"] == 1
+    assert json.loads(json.dumps(stats)) == stats
+    assert not col.backend_stats()["sql"]
+    # pipelined calls are recorded per method, as well as in total
+    for i in range(2):
+        note = col.newNote()
+        note["Front"] = str(i)
+        col.addNote(note)
+    cids = col.find_cards("")
+    col.backend_stats(reset=True)
+    col.get_cards(cids)
+    stats = col.backend_stats(reset=True)
+    assert stats["methods"]["CardsService.GetCard"]["count"] == 2
+    assert stats["pipelines"]["count"] == 1
+    col.set_backend_profiling_enabled(False)
+    assert col.backend_stats() is None
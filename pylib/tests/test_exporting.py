@@ -3,8 +3,10 @@
 
 # coding: utf-8
 
+import json
 import os
 import tempfile
+import zipfile
 
 from anki import Collection as aopen
 from anki.exporting import *
@@ -90,8 +92,10 @@ def test_export_ankipkg():
     # add a test file to the media folder
     with open(os.path.join(col.media.dir(), "今日.mp3"), "w") as note:
         note.write("test")
+    with open(os.path.join(col.media.dir(), "notes.txt"), "w") as note:
+        note.write("test " * 100)
     n = col.newNote()
-    n["Front"] = "[sound:今日.mp3]"
+    n["Front"] = "[sound:今日.mp3][sound:notes.txt]"
     col.addNote(n)
     e = AnkiPackageExporter(col)
     fd, newname = tempfile.mkstemp(prefix="ankitest", suffix=".apkg")
@@ -99,6 +103,33 @@ def test_export_ankipkg():
     os.close(fd)
     os.unlink(newname)
     e.exportInto(newname)
+    # text is deflated, and other media stored
+    with zipfile.ZipFile(newname) as z:
+        assert z.testzip() is None
+        media = {v: k for k, v in json.loads(z.read("media")).items()}
+        assert z.getinfo(media["notes.txt"]).compress_type == zipfile.ZIP_DEFLATED
+        assert z.getinfo(media["今日.mp3"]).compress_type == zipfile.ZIP_STORED
+        assert z.getinfo("collection.anki2").compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_export_large_file():
+    setup1()
+    e = AnkiPackageExporter(col)
+    # several chunks, each deflated separately
+    data = os.urandom(DEFLATE_CHUNK_SIZE) + b"test " * DEFLATE_CHUNK_SIZE
+    fd, path = tempfile.mkstemp(prefix="ankitest")
+    with os.fdopen(fd, "wb") as file:
+        file.write(data)
+    fd, zpath = tempfile.mkstemp(prefix="ankitest", suffix=".zip")
+    os.close(fd)
+    with zipfile.ZipFile(zpath, "w") as z:
+        assert e._writeFile(z, path, "large", compress=True)
+    with zipfile.ZipFile(zpath) as z:
+        assert z.testzip() is None
+        assert z.read("large") == data
+        assert z.getinfo("large").compress_size < len(data)
+    os.unlink(path)
+    os.unlink(zpath)
 
 
 @errorsAfterMidnight
@@ -86,11 +86,15 @@ def test_apkg():
     assert os.listdir(col.media.dir()) == []
     imp.run()
     assert os.listdir(col.media.dir()) == ["foo.wav"]
-    # importing again should be idempotent in terms of media
+    # importing again should be idempotent in terms of media, and the
+    # matching file should not be rewritten
+    path = os.path.join(col.media.dir(), "foo.wav")
+    os.utime(path, (0, 0))
     col.remove_cards_and_orphaned_notes(col.db.list("select id from cards"))
     imp = AnkiPackageImporter(col, apkg)
     imp.run()
     assert os.listdir(col.media.dir()) == ["foo.wav"]
+    assert os.path.getmtime(path) == 0
     # but if the local file has different data, it will rename
     col.remove_cards_and_orphaned_notes(col.db.list("select id from cards"))
     with open(os.path.join(col.media.dir(), "foo.wav"), "w") as note:
@@ -150,6 +154,38 @@ def test_anki2_updates():
     assert dst.db.scalar("select flds from notes").startswith("goodbye")
 
 
+def test_anki2_batches(monkeypatch):
+    monkeypatch.setattr("anki.importing.anki2.NOTE_BATCH_SIZE", 2)
+    col = getEmptyCol()
+    for i in range(5):
+        n = col.newNote()
+        n["Front"] = str(i)
+        col.addNote(n)
+    srcNids = col.db.list("select id from notes order by id")
+    col.close()
+    dst = getEmptyCol()
+    # an existing note shares the id of an incoming one
+    n = dst.newNote()
+    n["Front"] = "existing"
+    dst.addNote(n)
+    dst.db.execute("update notes set id = ? where id = ?", srcNids[2], n.id)
+    dst.db.execute("update cards set nid = ? where nid = ?", srcNids[2], n.id)
+    imp = Anki2Importer(dst, col.path)
+    imp.run()
+    assert imp.added == 5
+    assert dst.noteCount() == 6
+    assert dst.cardCount() == 6
+    assert not dst.db.scalar(
+        "select 1 from cards where nid not in (select id from notes)"
+    )
+    # importing again finds every note across the batches
+    imp = Anki2Importer(dst, col.path)
+    imp.run()
+    assert imp.dupes == 5
+    assert imp.added == 0
+    assert dst.noteCount() == 6
+
+
 def test_csv():
     col = getEmptyCol()
     file = str(os.path.join(testDir, "support", "text-2fields.txt"))
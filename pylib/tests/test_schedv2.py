@@ -127,6 +127,36 @@ def test_newLimits():
     assert col.sched.newCount == 9
 
 
+def test_new_across_decks():
+    if is_2021():
+        pytest.skip("old sched only")
+    col = getEmptyCol()
+    dids = [1] + [col.decks.id(f"Default::{name}") for name in "abcd"]
+    # a and c have 3 cards each, b and d are empty
+    for (did, count) in ((1, 1), (dids[1], 3), (dids[3], 3)):
+        for i in range(count):
+            note = col.newNote()
+            note["Front"] = f"{did} {i}"
+            note.model()["did"] = did
+            col.addNote(note)
+    # c is limited to 2 cards per day
+    conf = col.decks.add_config_returning_id("limited")
+    col.decks.setConf(col.decks.get(dids[3]), conf)
+    conf = col.decks.get_config(conf)
+    conf["new"]["perDay"] = 2
+    col.decks.save(conf)
+    col.reset()
+    # make sure decks with more cards than fit in a queue fill correctly
+    col.sched.queueLimit = 2
+    seen = []
+    while c := col.sched.getCard():
+        seen.append((c.did, c.due))
+        col.sched.answerCard(c, 4)
+    # decks are shown in order, each in due order
+    assert [did for (did, due) in seen] == [1] + [dids[1]] * 3 + [dids[3]] * 2
+    assert seen == sorted(seen, key=lambda entry: (dids.index(entry[0]), entry[1]))
+
+
 def test_newBoxes():
     col = getEmptyCol()
     note = col.newNote()
@@ -1041,6 +1071,63 @@ def test_repCounts():
     assert col.sched.counts() == (1, 1, 0)
 
 
+def test_queue_snapshot():
+    if not is_2021():
+        pytest.skip("new sched only")
+    col = getEmptyCol()
+    for i in range(2):
+        note = col.newNote()
+        note["Front"] = str(i)
+        col.addNote(note)
+    col.reset()
+    col.set_backend_profiling_enabled(True)
+    # repeated lookups only fetch the queue once
+    assert col.sched.counts() == (2, 0, 0)
+    assert col.sched.newCount == 2
+    c = col.sched.getCard()
+    stats = col.backend_stats(reset=True)
+    assert stats["methods"]["SchedulingService.GetQueuedCards"]["count"] == 1
+    # answering invalidates the snapshot
+    col.sched.answerCard(c, 3)
+    assert col.sched.counts() == (1, 1, 0)
+    # as does undo
+    col.undo()
+    assert col.sched.counts() == (2, 0, 0)
+    # and changes made in Python
+    col.db.execute("update cards set queue = -1")
+    assert col.sched.counts() == (0, 0, 0)
+
+
+def test_answer_cards():
+    if not is_2021():
+        pytest.skip("new sched only")
+    col = getEmptyCol()
+    for i in range(3):
+        note = col.newNote()
+        note["Front"] = str(i)
+        col.addNote(note)
+    cids = sorted(col.find_cards(""))
+    now = intTime(1000)
+    # cards need not be due, and may be answered more than once
+    out = col.sched.answer_cards(
+        [(cids[2], 4, now, 1000), (cids[0], 1, now, 2000), (cids[0], 3, now, 3000)]
+    )
+    assert out.count == 3
+    assert col.getCard(cids[2]).type == CARD_TYPE_REV
+    assert col.getCard(cids[0]).reps == 2
+    assert col.getCard(cids[1]).queue == QUEUE_TYPE_NEW
+    assert col.db.list("select ease from revlog order by id") == [4, 1, 3]
+    assert col.db.scalar("select sum(time) from revlog") == 6000
+    assert col.sched.counts() == (1, 1, 0)
+    # the whole batch is undone in one step
+    col.undo()
+    assert col.db.scalar("select count() from revlog") == 0
+    assert col.sched.counts() == (3, 0, 0)
+    # invalid eases are rejected
+    with pytest.raises(AssertionError):
+        col.sched.answer_cards([(cids[0], 5, now, 0)])
+
+
 def test_timing():
     col = getEmptyCol()
     # add a few review cards, due today
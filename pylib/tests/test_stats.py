@@ -1,9 +1,15 @@
 # Copyright: Ankitects Pty Ltd and contributors
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 
+import copy
 import os
 import tempfile
 
+import pytest
+
+from anki import tables
+from anki.consts import *
+from anki.scheduler.simulator import _config_dict, sweep_table
 from tests.shared import getEmptyCol
 
 
@@ -27,6 +33,53 @@ def test_graphs_empty():
     assert col.stats().report()
 
 
+def test_graphs_cached():
+    col = getEmptyCol()
+    note = col.newNote()
+    note["Front"] = "foo"
+    col.addNote(note)
+    col.reset()
+    col.sched.answerCard(col.sched.getCard(), 3)
+    stats = col.stats()
+    aggregates = stats._aggregates()
+    assert sum(bucket.count for bucket in aggregates.revlog) == 1
+    # reused by later reports
+    assert col.stats()._aggregates() is aggregates
+    # until the collection changes
+    col.sched.answerCard(col.sched.getCard(), 3)
+    aggregates = stats._aggregates()
+    assert sum(bucket.count for bucket in aggregates.revlog) == 2
+    assert "Learn: <b>2</b>" in stats.todayStats()
+
+
+def test_revlog_days():
+    col = getEmptyCol()
+    note = col.newNote()
+    note["Front"] = "foo"
+    col.addNote(note)
+    col.reset()
+    c = col.sched.getCard()
+    col.sched.answerCard(c, 1)
+    col.sched.answerCard(c, 3)
+
+    def totals():
+        return col.db.first(
+            "select sum(count), sum(ease1), sum(ease3) from revlog_days where did = ?",
+            c.did,
+        )
+
+    assert "2 cards" in col.studied_today()
+    assert totals() == [2, 1, 1]
+    # answers follow their card to a new deck
+    did = col.decks.id("new deck")
+    col.set_deck([c.id], did)
+    c.load()
+    assert totals() == [2, 1, 1]
+    # and a rebuild gives the same totals
+    col.rebuild_revlog_days()
+    assert totals() == [2, 1, 1]
+
+
 def test_graphs():
     dir = tempfile.gettempdir()
     col = getEmptyCol()
@@ -35,3 +88,75 @@ def test_graphs():
     with open(os.path.join(dir, "test.html"), "w", encoding="UTF-8") as note:
         note.write(rep)
     return
+
+
+def test_workload():
+    pytest.importorskip("numpy")
+    col = getEmptyCol()
+    for i in range(30):
+        note = col.newNote()
+        note["Front"] = str(i)
+        col.addNote(note)
+    conf = col.decks.confForDid(1)
+    conf["new"]["perDay"] = 10
+    forecast = col.sched.simulate_workload("", 10, config=conf, seed=0)
+    # new cards are introduced up to the daily limit
+    assert list(forecast.new[:4]) == [10, 10, 10, 0]
+    # and come back for review once graduated
+    assert forecast.review.sum()
+    # the same seed gives the same forecast
+    again = col.sched.simulate_workload("", 10, config=conf, seed=0)
+    assert list(again.total()) == list(forecast.total())
+    assert "workload" in col.stats().report()
+    # and the report's forecast is reused until the collection changes
+    stats = col.stats()
+    assert stats._workload(10) is stats._workload(10)
+
+
+def test_sweep_deck_configs():
+    pytest.importorskip("numpy")
+    col = getEmptyCol()
+    for i in range(30):
+        note = col.newNote()
+        note["Front"] = str(i)
+        col.addNote(note)
+    configs = col.decks.get_deck_configs_for_update(1)
+    default = configs.all_config[0].config
+    faster = copy.deepcopy(default)
+    faster.name = "faster"
+    faster.config.new_per_day = 30
+    results = col.sched.sweep_deck_configs(1, [default, faster], 10, max_workers=2)
+    assert [r.config.name for r in results] == [default.name, "faster"]
+    assert list(results[0].forecast.new[:3]) == [20, 10, 0]
+    assert list(results[1].forecast.new[:3]) == [30, 0, 0]
+    assert "faster" in sweep_table(results)
+    # the float32 ease isn't truncated
+    faster.config.initial_ease = 2.3
+    assert _config_dict(faster)["new"]["initialFactor"] == 2300
+
+
+def test_tables():
+    pytest.importorskip("numpy")
+    col = getEmptyCol()
+    for i in range(3):
+        note = col.newNote()
+        note["Front"] = str(i)
+        col.addNote(note)
+    col.sched.answerCard(col.sched.getCard(), 3)
+    cards = col.cards_table()
+    assert len(cards) == 3
+    assert sorted(cards["nid"]) == sorted(col.db.list("select nid from cards"))
+    assert list(cards["queue"]).count(QUEUE_TYPE_NEW) == 2
+    revlog = col.revlog_table()
+    assert len(revlog) == 1
+    assert revlog["ease"][0] == 3
+    assert len(col.revlog_table("is:new")) == 0
+    # batches continue where the previous one ended
+    batches = list(tables.cards_batches(col, batch_size=2))
+    assert [len(b) for b in batches] == [2, 1]
+    assert list(batches[0]["id"]) + list(batches[1]["id"]) == list(cards["id"])
+    # searches are only run once, and their cards passed to each batch
+    batches = list(tables.cards_batches(col, "is:new", batch_size=1))
+    assert [len(b) for b in batches] == [1, 1]
+    assert [len(b) for b in tables.revlog_batches(col, "-is:new")] == [1]
+    assert list(tables.revlog_batches(col, "is:new")) == []
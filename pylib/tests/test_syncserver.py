@@ -0,0 +1,291 @@
+# Copyright: Ankitects Pty Ltd and contributors
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("waitress")
+
+from anki import syncserver
+from anki.syncserver import Method
+from anki.syncserver.metrics import Histogram, SyncMetrics
+from anki.syncserver.pool import (
+    CollectionBusy,
+    CollectionPool,
+    PooledCollection,
+    user_folder_name,
+)
+from anki.syncserver.users import Users
+
+
+def _tmpdir():
+    return tempfile.mkdtemp(prefix="anki_syncserver")
+
+
+def _pool(folder, **kwargs):
+    return CollectionPool(lambda user: os.path.join(folder, f"{user}.anki2"), **kwargs)
+
+
+def test_user_folder_name():
+    assert user_folder_name("bob@example.com") == "bob@example.com"
+    for name in ("", ".hidden", "../etc", "a/b", "a b"):
+        assert user_folder_name(name) is None
+
+
+def test_users():
+    folder = _tmpdir()
+    path = os.path.join(folder, "users")
+    keys_path = os.path.join(folder, "hkeys.json")
+    with open(path, "w", encoding="utf8") as file:
+        file.write("# comment\n\nalice:secret\nbob:pass:word\n")
+    users = Users(path, keys_path)
+    assert len(users) == 2
+    assert users.host_key("alice", "wrong") is None
+    assert users.host_key("carol", "secret") is None
+
+    hkey = users.host_key("alice", "secret")
+    assert hkey
+    # stable, and not shared between users
+    assert users.host_key("alice", "secret") == hkey
+    assert users.host_key("bob", "pass:word") not in (None, hkey)
+    assert users.user_for_host_key(hkey) == "alice"
+    assert users.user_for_host_key("") is None
+
+    # keys survive a restart, but not the removal of the user
+    assert Users(path, keys_path).user_for_host_key(hkey) == "alice"
+    with open(path, "w", encoding="utf8") as file:
+        file.write("bob:pass:word\n")
+    assert Users(path, keys_path).user_for_host_key(hkey) is None
+
+
+def test_users_invalid():
+    path = os.path.join(_tmpdir(), "users")
+    with open(path, "w", encoding="utf8") as file:
+        file.write("../alice:secret\n")
+    with pytest.raises(Exception):
+        Users(path, path + ".keys")
+
+
+def test_histogram():
+    hist = Histogram((1, 5))
+    for value in (0.5, 1, 3, 10):
+        hist.observe(value)
+    assert hist.render("x", "") == [
+        'x_bucket{le="1"} 2',
+        'x_bucket{le="5"} 3',
+        'x_bucket{le="+Inf"} 4',
+        "x_sum{} 14.5",
+        "x_count{} 4",
+    ]
+
+
+def test_metrics():
+    metrics = SyncMetrics()
+    metrics.record_request("meta", 200, 0.01)
+    metrics.record_request("meta", 200, 0.02)
+    metrics.record_request("chunk", 500, 0.5)
+    metrics.record_bytes_in("apply_chunk", 10, 40)
+    metrics.record_full_sync("full_upload", 3)
+    text = metrics.render(active_sessions=1, open_collections=2)
+    lines = text.splitlines()
+    assert 'anki_sync_requests_total{method="meta",status="200"} 2' in lines
+    assert 'anki_sync_requests_total{method="chunk",status="500"} 1' in lines
+    assert 'anki_sync_request_seconds_count{method="meta"} 2' in lines
+    assert (
+        'anki_sync_bytes_total{method="apply_chunk",direction="in",encoding="uncompressed"} 40'
+        in lines
+    )
+    assert 'anki_sync_full_sync_seconds_count{method="full_upload"} 1' in lines
+    assert "anki_sync_active_sessions 1" in lines
+    assert "anki_sync_open_collections 2" in lines
+
+
+def test_pool_reuses_and_evicts():
+    pool = _pool(_tmpdir(), max_open=2)
+    with pool.use("a") as entry:
+        col = entry.col
+        assert col
+    with pool.use("a") as entry:
+        assert entry.col is col
+    with pool.use("b"):
+        pass
+    assert pool.open_count() == 2
+    # opening a third closes the least recently used
+    with pool.use("c"):
+        pass
+    assert pool.open_count() == 2
+    with pool.use("a") as entry:
+        assert entry.col is not col
+    pool.close_all()
+    assert pool.open_count() == 0
+
+
+def test_pool_keeps_sessions_open():
+    pool = _pool(_tmpdir(), idle_secs=-1)
+    with pool.use("a") as entry:
+        entry.in_session = True
+    assert pool.open_count() == 1
+    assert pool.session_count() == 1
+    with pool.use("a") as entry:
+        entry.in_session = False
+    assert pool.open_count() == 0
+    assert pool.session_count() == 0
+
+
+def test_pool_busy():
+    pool = _pool(_tmpdir(), wait_secs=0.1)
+    opened = threading.Event()
+    done = threading.Event()
+
+    def hold():
+        with pool.use("a"):
+            opened.set()
+            done.wait(5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    try:
+        opened.wait(5)
+        with pytest.raises(CollectionBusy):
+            with pool.use("a"):
+                pass
+        # other users are not blocked
+        with pool.use("b"):
+            pass
+    finally:
+        done.set()
+        thread.join()
+    pool.close_all()
+
+
+def test_pool_closes_outside_lock():
+    pool = _pool(_tmpdir(), idle_secs=-1)
+    closed = []
+
+    def close(downgrade):
+        # other users can use the pool while a collection is closing
+        with pool.use("b"):
+            pass
+        closed.append("a")
+
+    entry = _entry(Exception("abort failed"))
+    entry.col.path = "a"
+    entry.col.close = close
+    pool._entries["a"] = entry
+    # a failed abort doesn't stop the collection being closed
+    pool.evict()
+    assert closed == ["a"]
+    assert entry.col is None
+    assert not entry.in_session
+    assert pool.open_count() == 0
+
+
+def _upload(data, max_bytes=None):
+    with syncserver.app.test_request_context():
+        if max_bytes is not None:
+            old = syncserver.max_upload_bytes
+            syncserver.max_upload_bytes = max_bytes
+        try:
+            return b"".join(syncserver.decompress_chunks(io.BytesIO(data)))
+        finally:
+            if max_bytes is not None:
+                syncserver.max_upload_bytes = old
+
+
+def test_decompress_chunks():
+    data = os.urandom(syncserver.CHUNK_SIZE * 3) + b"x" * syncserver.CHUNK_SIZE
+    assert _upload(gzip.compress(data)) == data
+    assert _upload(gzip.compress(b"")) == b""
+    with pytest.raises(Exception, match="truncated"):
+        _upload(gzip.compress(data)[:-100])
+    with pytest.raises(syncserver.UploadTooLarge):
+        _upload(gzip.compress(data), max_bytes=len(data) - 1)
+    zstandard = pytest.importorskip("zstandard")
+    assert _upload(zstandard.ZstdCompressor().compress(data)) == data
+
+
+def _download(path, headers):
+    with syncserver.app.test_request_context(headers=headers):
+        resp = syncserver.full_download_response(path, 0)
+        body = b"".join(resp.response)
+        resp.close()
+        return (resp, body)
+
+
+def test_download_range():
+    path = os.path.join(_tmpdir(), "snapshot")
+    with open(path, "wb") as file:
+        file.write(b"0123456789")
+    etag = os.path.basename(path)
+
+    (resp, body) = _download(path, {})
+    assert resp.status_code == 200
+    assert body == b"0123456789"
+    assert resp.headers["ETag"] == f'"{etag}"'
+
+    (resp, body) = _download(path, {"Range": "bytes=4-"})
+    assert resp.status_code == 206
+    assert body == b"456789"
+    assert resp.headers["Content-Range"] == "bytes 4-9/10"
+    assert resp.headers["Content-Length"] == "6"
+
+    (resp, body) = _download(path, {"Range": "bytes=2-3", "If-Range": f'"{etag}"'})
+    assert resp.status_code == 206
+    assert body == b"23"
+
+    # the snapshot has changed, so the whole file is sent
+    (resp, body) = _download(path, {"Range": "bytes=2-3", "If-Range": '"other"'})
+    assert resp.status_code == 200
+    assert body == b"0123456789"
+
+    (resp, body) = _download(path, {"Range": "bytes=20-"})
+    assert resp.status_code == 416
+    assert resp.headers["Content-Range"] == "bytes */10"
+
+
+def _call(entry, method):
+    data = {"data": (io.BytesIO(gzip.compress(b"{}")), "data")}
+    with syncserver.app.test_request_context(method="POST", data=data):
+        return syncserver.handle_collection_request(entry, method)
+
+
+def _entry(reply):
+    def sync_server_method(method, data):
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    backend = SimpleNamespace(sync_server_method=sync_server_method)
+    return PooledCollection(
+        last_used=0, col=SimpleNamespace(_backend=backend), in_session=True
+    )
+
+
+def test_session_state():
+    # a meta request from another client does not end the sync in progress
+    entry = _entry(Exception("busy"))
+    assert _call(entry, Method.META).status_code == 409
+    assert entry.in_session
+    # nor does a failed start
+    with pytest.raises(Exception):
+        _call(entry, Method.START)
+    assert entry.in_session
+    # but a failure during the sync does, as the backend aborts it
+    with pytest.raises(Exception):
+        _call(entry, Method.APPLY_CHUNK)
+    assert not entry.in_session
+
+    entry = _entry(json.dumps({"status": "ok"}).encode("utf8"))
+    _call(entry, Method.SANITY_CHECK)
+    assert entry.in_session
+    entry = _entry(json.dumps({"status": "bad"}).encode("utf8"))
+    _call(entry, Method.SANITY_CHECK)
+    assert not entry.in_session
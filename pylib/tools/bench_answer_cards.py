@@ -0,0 +1,69 @@
+# Copyright: Ankitects Pty Ltd and contributors
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+# Compare answering cards one at a time with answerCard() against a single
+# answer_cards() batch, on a collection of new cards. Reports answers per
+# second for each, and checks that one undo reverts the whole batch.
+#
+# Usage: bench_answer_cards.py [card count]
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from anki.collection import Collection
+from anki.utils import intTime
+
+
+def make_collection(count: int) -> Collection:
+    col = Collection(os.path.join(tempfile.mkdtemp(), "bench.anki2"))
+    col.set_2021_test_scheduler_enabled(True)
+    for i in range(count):
+        note = col.newNote()
+        note["Front"] = f"front {i}"
+        col.addNote(note)
+    col.save()
+    return col
+
+
+def one_at_a_time(col: Collection, cids: list) -> float:
+    # answerCard() requires the card at the top of the queue
+    start = time.perf_counter()
+    for _ in cids:
+        card = col.sched.getCard()
+        if not card:
+            break
+        col.sched.answerCard(card, random.randint(1, 4))
+    return time.perf_counter() - start
+
+
+def batched(col: Collection, cids: list) -> float:
+    now = intTime(1000)
+    answers = [(cid, random.randint(1, 4), now, 5000) for cid in cids]
+    start = time.perf_counter()
+    col.sched.answer_cards(answers)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    random.seed(0)
+    for (name, func) in (("answerCard", one_at_a_time), ("answer_cards", batched)):
+        col = make_collection(count)
+        cids = col.find_cards("")
+        # repeat each card a few times, as an import of review history would
+        cids = cids * 3
+        random.shuffle(cids)
+        elapsed = func(col, cids)
+        answered = col.db.scalar("select count() from revlog")
+        print(f"{name:<14}{answered / elapsed:>10.0f} answers/sec")
+        if func is batched:
+            col.undo()
+            assert not col.db.scalar("select count() from revlog")
+        col.close(downgrade=False)
+
+
+if __name__ == "__main__":
+    main()
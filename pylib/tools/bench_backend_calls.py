@@ -0,0 +1,62 @@
+# Copyright: Ankitects Pty Ltd and contributors
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+# Measure the per-call overhead of backend methods, with and without
+# pipelining.
+#
+# Usage: bench_backend_calls.py [card count]
+
+import os
+import sys
+import tempfile
+import time
+
+from anki.collection import Collection
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    path = os.path.join(tempfile.mkdtemp(), "bench.anki2")
+    col = Collection(path)
+    for i in range(count):
+        note = col.newNote()
+        note["Front"] = str(i)
+        col.addNote(note)
+    cids = col.find_cards("")
+
+    start = time.perf_counter()
+    for cid in cids:
+        col.get_card(cid)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    col.get_cards(cids)
+    pipelined = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in cids:
+        col._backend.get_undo_status()
+    trivial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pipeline = col._backend.pipeline()
+    for _ in cids:
+        pipeline.get_undo_status()
+    pipeline.execute()
+    trivial_pipelined = time.perf_counter() - start
+
+    def per_call(secs: float) -> str:
+        return f"{secs / len(cids) * 1_000_000:.1f}µs/call"
+
+    print(f"get_card x{len(cids)}")
+    print(f"  individually: {per_call(single)}")
+    print(f"  pipelined:    {per_call(pipelined)}")
+    print(f"get_undo_status x{len(cids)}")
+    print(f"  individually: {per_call(trivial)}")
+    print(f"  pipelined:    {per_call(trivial_pipelined)}")
+
+    col.close(save=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Copyright: Ankitects Pty Ltd and contributors
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+# Compare the binary columnar DB row transport with the older JSON one.
+#
+# Usage: bench_dbproxy.py [note count]
+
+import os
+import sys
+import tempfile
+import time
+
+from anki.collection import Collection
+from anki.utils import guid64, intTime
+
+QUERIES = (
+    "select id, mid, flds from notes",
+    "select id, nid, did, ord, ivl, factor from cards",
+    "select count() from notes",
+)
+
+
+def populate(col: Collection, count: int) -> None:
+    mid = col.models.current()["id"]
+    did = col.decks.id("Default")
+    now = intTime()
+    col.db.executemany(
+        "insert into notes values (?,?,?,?,?,?,?,?,?,?,?)",
+        (
+            (i + 1, guid64(), mid, now, -1, "", f"front {i}\x1fback {i}", "", 0, 0, "")
+            for i in range(count)
+        ),
+    )
+    col.db.executemany(
+        "insert into cards values (?,?,?,0,?,-1,0,0,?,0,2500,0,0,0,0,0,0,'')",
+        ((i + 1, i + 1, did, now, i) for i in range(count)),
+    )
+
+
+def timed(col: Collection, sql: str, rounds: int = 3) -> float:
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        col.db.all(sql)
+        taken = time.perf_counter() - start
+        best = taken if best is None else min(best, taken)
+    return best
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    path = os.path.join(tempfile.mkdtemp(), "bench.anki2")
+    col = Collection(path)
+    populate(col, count)
+
+    print(f"{count} notes/cards, best of 3")
+    for sql in QUERIES:
+        col._backend.binary_db_rows = False
+        json = timed(col, sql)
+        col._backend.binary_db_rows = True
+        binary = timed(col, sql)
+        print(f"{sql}\n  json: {json:.3f}s binary: {binary:.3f}s ({json/binary:.1f}x)")
+
+    col.close(save=False)
+
+
+if __name__ == "__main__":
+    main()
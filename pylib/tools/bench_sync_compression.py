@@ -0,0 +1,98 @@
+# Copyright: Ankitects Pty Ltd and contributors
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+# Compare gzip and zstd on sync payloads: the JSON of a large chunk of
+# notes and cards, and a full collection file. Reports the size on the wire,
+# and the CPU time taken to compress and decompress.
+#
+# Requires the zstandard module.
+#
+# Usage: bench_sync_compression.py [note count]
+
+import json
+import os
+import sys
+import tempfile
+import time
+import zlib
+from typing import Callable, Tuple
+
+import zstandard
+
+from anki.collection import Collection
+
+
+def gzip_codec(level: int) -> Tuple[Callable, Callable]:
+    def compress(data: bytes) -> bytes:
+        comp = zlib.compressobj(level, wbits=16 + zlib.MAX_WBITS)
+        return comp.compress(data) + comp.flush()
+
+    def decompress(data: bytes) -> bytes:
+        return zlib.decompress(data, wbits=16 + zlib.MAX_WBITS)
+
+    return (compress, decompress)
+
+
+def zstd_codec(level: int) -> Tuple[Callable, Callable]:
+    def decompress(data: bytes) -> bytes:
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    return (zstandard.ZstdCompressor(level=level).compress, decompress)
+
+
+CODECS = {
+    # the client's current setting
+    "gzip -1": gzip_codec(1),
+    "gzip -6": gzip_codec(6),
+    "zstd -1": zstd_codec(1),
+    # the default for the client and server
+    "zstd -3": zstd_codec(3),
+    "zstd -9": zstd_codec(9),
+}
+
+
+def payloads(count: int) -> Tuple[bytes, bytes]:
+    path = os.path.join(tempfile.mkdtemp(), "bench.anki2")
+    col = Collection(path)
+    for i in range(count):
+        note = col.newNote()
+        note["Front"] = f"front {i} " + "lorem ipsum dolor " * (i % 7)
+        note["Back"] = f"back {i} " + "sit amet consectetur " * (i % 5)
+        col.addNote(note)
+    chunk = json.dumps(
+        dict(
+            notes=col.db.all("select * from notes"),
+            cards=col.db.all("select * from cards"),
+        )
+    ).encode("utf8")
+    col.close(downgrade=False)
+    with open(path, "rb") as file:
+        return (chunk, file.read())
+
+
+def bench(data: bytes, compress: Callable, decompress: Callable) -> Tuple:
+    start = time.process_time()
+    compressed = compress(data)
+    mid = time.process_time()
+    assert decompress(compressed) == data
+    end = time.process_time()
+    return (len(compressed), (mid - start) * 1000, (end - mid) * 1000)
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    (chunk, collection) = payloads(count)
+    for (name, data) in (("chunk json", chunk), ("collection", collection)):
+        print(f"{name}: {len(data) / 1024:.0f}KB")
+        print(f"{'':<10}{'wire KB':>10}{'ratio':>8}{'comp ms':>10}{'decomp ms':>11}")
+        for (codec, (compress, decompress)) in CODECS.items():
+            (size, comp_ms, decomp_ms) = bench(data, compress, decompress)
+            print(
+                f"{codec:<10}{size / 1024:>10.0f}{len(data) / size:>8.2f}"
+                f"{comp_ms:>10.1f}{decomp_ms:>11.1f}"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+# Copyright: Ankitects Pty Ltd and contributors
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+# Load test for the sync server. Starts a local server in multi-user mode,
+# and drives it with simulated clients that each have their own account and
+# generated collection, using the real sync code:
+#
+# - a full upload of each client's collection
+# - rounds of normal syncs, with some notes added and edited between them
+# - a full download of each collection into a fresh client
+#
+# Reports throughput and latency for each phase, the server's own per-method
+# timings from /metrics, and the server's memory use.
+#
+# Usage: bench_syncserver.py [--clients 20] [--notes 1000] [--rounds 5] [--json]
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from anki.collection import Collection, SyncOutput
+
+
+class MemorySampler(threading.Thread):
+    "Track the resident memory of a process, in MB. Linux only."
+
+    def __init__(self, pid: int) -> None:
+        super().__init__(daemon=True)
+        self.path = f"/proc/{pid}/status"
+        self.peak = 0.0
+        self.last = 0.0
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.wait(0.1):
+            rss = self.sample()
+            if rss is None:
+                return
+            self.last = rss
+            self.peak = max(self.peak, rss)
+
+    def sample(self) -> Optional[float]:
+        try:
+            with open(self.path, encoding="utf8") as file:
+                for line in file:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return None
+
+    def stop(self) -> None:
+        self._done.set()
+
+
+class Client:
+    def __init__(self, folder: str, name: str, user: str, note_count: int) -> None:
+        self.user = user
+        self.col = Collection(os.path.join(folder, f"{name}.anki2"))
+        for i in range(note_count):
+            self.add_note(i)
+        self.col.save()
+        self.auth = self.col.sync_login(user, "pass")
+
+    def add_note(self, i: int) -> None:
+        note = self.col.newNote()
+        note["Front"] = f"{self.user} front {i} " + "lorem ipsum " * 5
+        note["Back"] = f"{self.user} back {i} " + "dolor sit amet " * 5
+        self.col.addNote(note)
+
+    def modify(self, round: int, count: int) -> None:
+        nids = self.col.find_notes("")[: count // 2]
+        for nid in nids:
+            note = self.col.get_note(nid)
+            note["Back"] += f" edited {round}"
+            self.col.update_note(note)
+        for i in range(count - len(nids)):
+            self.add_note(100_000 * (round + 1) + i)
+        self.col.save()
+
+    def sync(self) -> SyncOutput:
+        return self.col.sync_collection(self.auth)
+
+    def full_upload(self) -> None:
+        self.col.close_for_full_sync()
+        try:
+            self.col.full_upload(self.auth)
+        finally:
+            self.col.reopen(after_full_sync=True)
+
+    def full_download(self) -> None:
+        self.col.close_for_full_sync()
+        try:
+            self.col.full_download(self.auth)
+        finally:
+            self.col.reopen(after_full_sync=True)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(folder: str, users: List[str], port: int) -> subprocess.Popen:
+    users_file = os.path.join(folder, "users.txt")
+    with open(users_file, "w", encoding="utf8") as file:
+        file.writelines(f"{user}:pass\n" for user in users)
+    env = dict(
+        os.environ,
+        FOLDER=os.path.join(folder, "server"),
+        USERS_FILE=users_file,
+        HOST="127.0.0.1",
+        PORT=str(port),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "anki.syncserver"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise Exception("server exited during startup")
+            time.sleep(0.1)
+    server.kill()
+    raise Exception("server did not start")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[idx]
+
+
+def run_phase(
+    name: str,
+    clients: List[Client],
+    func: Callable[[Client], Any],
+    results: Dict[str, Any],
+) -> None:
+    "Run func for every client in parallel, and record the timings."
+
+    def timed(client: Client) -> float:
+        start = time.perf_counter()
+        func(client)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        times = sorted(executor.map(timed, clients))
+    elapsed = time.perf_counter() - start
+    results[name] = dict(
+        ops=len(times),
+        ops_per_sec=len(times) / elapsed,
+        p50_ms=percentile(times, 50) * 1000,
+        p95_ms=percentile(times, 95) * 1000,
+        p99_ms=percentile(times, 99) * 1000,
+        max_ms=times[-1] * 1000,
+    )
+
+
+def normal_sync(client: Client) -> None:
+    out = client.sync()
+    if out.required not in (out.NO_CHANGES, out.NORMAL_SYNC):
+        raise Exception(f"{client.user}: unexpected full sync")
+
+
+def first_sync(client: Client) -> None:
+    out = client.sync()
+    if out.required in (out.FULL_SYNC, out.FULL_UPLOAD):
+        client.full_upload()
+
+
+def server_timings(port: int) -> Dict[str, Dict[str, float]]:
+    "Per-method request counts and mean latency, from the server's metrics."
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as resp:
+        text = resp.read().decode("utf8")
+    timings: Dict[str, Dict[str, float]] = {}
+    for line in text.splitlines():
+        for (suffix, key) in (("_sum", "total_secs"), ("_count", "requests")):
+            prefix = f'anki_sync_request_seconds{suffix}{{method="'
+            if line.startswith(prefix):
+                method = line[len(prefix) :].split('"', maxsplit=1)[0]
+                timings.setdefault(method, {})[key] = float(line.split()[-1])
+    for entry in timings.values():
+        entry["mean_ms"] = entry["total_secs"] / max(entry["requests"], 1) * 1000
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the sync server.")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--notes", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--changes", type=int, default=50, help="per round")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    port = free_port()
+    os.environ["SYNC_ENDPOINT"] = f"http://127.0.0.1:{port}/sync/"
+    users = [f"user{i}" for i in range(args.clients)]
+    server = start_server(folder, users, port)
+    memory = MemorySampler(server.pid)
+    memory.start()
+    results: Dict[str, Any] = {}
+    try:
+        clients = [Client(folder, user, user, args.notes) for user in users]
+        run_phase("full_upload", clients, first_sync, results)
+        for round in range(args.rounds):
+            for client in clients:
+                client.modify(round, args.changes)
+            run_phase(f"normal_sync_{round + 1}", clients, normal_sync, results)
+        downloaders = [Client(folder, f"{user}-dl", user, 0) for user in users]
+        run_phase("full_download", downloaders, Client.full_download, results)
+        results["server"] = server_timings(port)
+        results["server_memory_mb"] = dict(peak=memory.peak, final=memory.last)
+        for client in clients + downloaders:
+            client.col.close(downgrade=False)
+    finally:
+        memory.stop()
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.clients} clients, {args.notes} notes each")
+    print(
+        f"{'phase':<16}{'ops/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    )
+    for (name, stats) in results.items():
+        if name.startswith(("full_", "normal_")):
+            print(
+                f"{name:<16}{stats['ops_per_sec']:>8.1f}{stats['p50_ms']:>10.1f}"
+                f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}"
+            )
+    print(f"\n{'server method':<16}{'requests':>10}{'mean ms':>10}")
+    for (method, stats) in sorted(results["server"].items()):
+        print(f"{method:<16}{stats['requests']:>10.0f}{stats['mean_ms']:>10.1f}")
+    mem = results["server_memory_mb"]
+    print(f"\nserver memory: peak {mem['peak']:.1f}MB, final {mem['final']:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -565,6 +565,7 @@ class AnkiQt(QMainWindow):
             corrupt = True
         finally:
             self.col = None
+            aqt.mediasrv.response_cache.clear()
             self.progress.finish()
         if corrupt:
             showWarning(tr.qt_misc_your_collection_file_appears_to_be())
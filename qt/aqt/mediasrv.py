@@ -10,14 +10,16 @@ import sys
 import threading
 import time
 import traceback
+from collections import OrderedDict
 from http import HTTPStatus
-from typing import Tuple
+from typing import Callable, Tuple
 
 import flask
 import flask_cors  # type: ignore
 from flask import Response, request
 from waitress.server import create_server
 
+import anki.lang
 import aqt
 from anki import hooks
 from anki.collection import GraphPreferences, OpChanges
@@ -254,9 +256,58 @@ def _redirectWebExports(path: str) -> Tuple[str, str]:
     return aqt.mw.col.media.dir(), path
 
 
+class ResponseCache:
+    """Recent responses to the slower POST requests, so that reopening a
+    page doesn't recompute them. Keys should include everything the response
+    depends on; the least recently used entries are dropped once the
+    responses exceed max_bytes in total."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._size = 0
+        self._entries: OrderedDict[Tuple, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple, compute: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                return data
+        # computed outside the lock, as the backend may take a while
+        data = compute()
+        if len(data) <= self.max_bytes:
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = data
+                    self._size += len(data)
+                while self._size > self.max_bytes:
+                    (_, old) = self._entries.popitem(last=False)
+                    self._size -= len(old)
+        return data
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+response_cache = ResponseCache(max_bytes=128 * 1024 * 1024)
+
+
+def _collection_key() -> Tuple:
+    # the modification time changes on every write, and the cutoff when a
+    # new day starts
+    col = aqt.mw.col
+    return (col.path, col.mod, col.sched.dayCutoff)
+
+
 def graph_data() -> bytes:
     args = from_json_bytes(request.data)
-    return aqt.mw.col.graph_data(search=args["search"], days=args["days"])
+    return response_cache.get(
+        ("graphData", args["search"], args["days"], *_collection_key()),
+        lambda: aqt.mw.col.graph_data(search=args["search"], days=args["days"]),
+    )
 
 
 def graph_preferences() -> bytes:
@@ -270,12 +321,20 @@ def set_graph_preferences() -> None:
 
 
 def congrats_info() -> bytes:
-    return aqt.mw.col.congrats_info()
+    # the time until the next learning card is shown in minutes
+    minute = int(time.time()) // 60
+    return response_cache.get(
+        ("congratsInfo", minute, *_collection_key()), aqt.mw.col.congrats_info
+    )
 
 
 def i18n_resources() -> bytes:
     args = from_json_bytes(request.data)
-    return aqt.mw.col.i18n_resources(modules=args["modules"])
+    modules = tuple(args["modules"])
+    return response_cache.get(
+        ("i18nResources", modules, anki.lang.currentLang),
+        lambda: aqt.mw.col.i18n_resources(modules=modules),
+    )
 
 
 def deck_configs_for_update() -> bytes:
@@ -8,15 +8,19 @@ import html
 import json
 import re
 import unicodedata as ucd
+from concurrent.futures import Future
+from dataclasses import dataclass
 from enum import Enum, auto
-from typing import Any, Callable, List, Match, Optional, Sequence, Tuple, Union
+from typing import Any, Callable, Dict, List, Match, Optional, Sequence, Tuple, Union
 
 from PyQt5.QtCore import Qt
 
 from anki import hooks
 from anki.cards import Card, CardId
-from anki.collection import Config, OpChanges, OpChangesWithCount
+from anki.collection import Collection, Config, OpChanges, OpChangesWithCount
+from anki.errors import TemplateError
 from anki.tags import MARKED_TAG
+from anki.template import PartiallyRenderedCard, TemplateRenderContext
 from anki.utils import stripHTML
 from aqt import AnkiQt, gui_hooks
 from aqt.operations.card import set_card_flag
@@ -43,6 +47,78 @@ class RefreshNeeded(Enum):
     QUEUES = auto()
 
 
+# number of upcoming cards to load and render in the background; they are
+# fetched together, and fetched again once they have been used up
+LOOKAHEAD_CARDS = 3
+
+
+@dataclass
+class PrefetchedCard:
+    """The backend's part of rendering a queued card. Hooks are not run until
+    the card is shown, as they must run on the main thread."""
+
+    # what the rendering depends on, to tell if it's out of date
+    render_key: Tuple
+    partial: PartiallyRenderedCard
+    # the next interval for each answer button
+    button_labels: Sequence[str]
+
+    def is_current(self, card: Card) -> bool:
+        "True if the card and its note are still as they were when rendered."
+        note = card.note()
+        return self.render_key == (
+            card.mod,
+            card.did,
+            card.odid,
+            card.ord,
+            card.flags,
+            note.mod,
+            note.mid,
+            tuple(note.fields),
+            tuple(note.tags),
+        )
+
+
+def prefetch_cards(
+    col: Collection, current: CardId, limit: int
+) -> Dict[CardId, PrefetchedCard]:
+    """Fetch the render data of the cards that follow the current one in the
+    queue, with a single lookup of the queue. Runs on a background thread, so
+    must only make backend calls."""
+    info = col._backend.get_queued_cards(
+        fetch_limit=limit + 1, intraday_learning_only=False
+    )
+    cards: Dict[CardId, PrefetchedCard] = {}
+    if info.WhichOneof("value") != "queued_cards":
+        return cards
+    for queued in info.queued_cards.cards:
+        card = queued.card
+        if card.id == current:
+            continue
+        note = col._backend.get_note(card.note_id)
+        try:
+            out = col._backend.render_existing_card(card_id=card.id, browser=False)
+        except TemplateError:
+            # rendered as usual when shown, so the error is displayed
+            continue
+        cards[CardId(card.id)] = PrefetchedCard(
+            render_key=(
+                card.mtime_secs,
+                card.deck_id,
+                card.original_deck_id,
+                card.template_idx,
+                card.flags,
+                note.mtime_secs,
+                note.notetype_id,
+                tuple(note.fields),
+                tuple(note.tags),
+            ),
+            partial=PartiallyRenderedCard.from_proto(out),
+            button_labels=col._backend.describe_next_states(queued.next_states),
+        )
+    return cards
+
+
 class ReviewerBottomBar:
     def __init__(self, reviewer: Reviewer) -> None:
         self.reviewer = reviewer
@@ -72,6 +148,8 @@ class Reviewer:
         self.typeCorrect: str = None  # web init happens before this is set
         self.state: Optional[str] = None
         self._refresh_needed: Optional[RefreshNeeded] = None
+        self._prefetched: Optional[Future] = None
+        self._button_labels: Optional[Sequence[str]] = None
         self.bottom = BottomBar(mw, mw.bottomWeb)
         hooks.card_did_leech.append(self.onLeech)
 
@@ -96,9 +174,11 @@ class Reviewer:
     def cleanup(self) -> None:
         gui_hooks.reviewer_will_end()
         self.card = None
+        self._prefetched = None
 
     def refresh_if_needed(self) -> None:
         if self._refresh_needed is RefreshNeeded.QUEUES:
+            self._prefetched = None
             self.mw.col.reset()
             self.nextCard()
             self.mw.fade_in_webview()
@@ -111,6 +191,8 @@ class Reviewer:
     def op_executed(
         self, changes: OpChanges, handler: Optional[object], focused: bool
     ) -> bool:
+        # any change may affect the upcoming cards or how they render
+        self._prefetched = None
         if handler is not self:
             if changes.study_queues:
                 self._refresh_needed = RefreshNeeded.QUEUES
@@ -157,6 +239,9 @@ class Reviewer:
                 self.mw.col.reset()
                 self.hadCardQueue = False
             c = self.mw.col.sched.getCard()
+        self._button_labels = None
+        if c:
+            self._use_prefetched(c)
         self.card = c
         if not c:
             self.mw.moveToState("overview")
@@ -165,6 +250,45 @@ class Reviewer:
             # we recycle the webview periodically so webkit can free memory
             self._initWeb()
         self._showQuestion()
+        self._prefetch_next_cards()
+
+    def _use_prefetched(self, card: Card) -> None:
+        """If the card's render data was fetched in the background, and the
+        card and its note have not changed since, finish rendering it from
+        that. Never waits for the fetch to finish."""
+        fut = self._prefetched
+        if not fut or not fut.done():
+            return
+        if fut.exception():
+            self._prefetched = None
+            return
+        prefetched = fut.result().pop(card.id, None)
+        if not prefetched:
+            # the queue has changed since it was fetched, so fetch it again
+            self._prefetched = None
+            return
+        if not prefetched.is_current(card):
+            return
+        card.set_render_output(
+            TemplateRenderContext.from_existing_card(
+                card, browser=False, partial=prefetched.partial
+            ).render()
+        )
+        self._button_labels = prefetched.button_labels
+
+    def _prefetch_next_cards(self) -> None:
+        # only the v3 scheduler can return more than one card
+        if self.mw.col.sched.version != 3 or self.cardQueue:
+            self._prefetched = None
+            return
+        fut = self._prefetched
+        if fut and (not fut.done() or (not fut.exception() and fut.result())):
+            # still fetching, or some of the fetched cards are yet to be shown
+            return
+        self._prefetched = self.mw.taskman.run_in_background(
+            prefetch_cards,
+            args=dict(col=self.mw.col, current=self.card.id, limit=LOOKAHEAD_CARDS),
+        )
 
     # Audio
     ##########################################################################
@@ -721,7 +845,10 @@ time = %(time)d;
     def _buttonTime(self, i: int) -> str:
         if not self.mw.col.conf["estTimes"]:
             return "<div class=spacer></div>"
-        txt = self.mw.col.sched.nextIvlStr(self.card, i, True) or "&nbsp;"
+        if self._button_labels:
+            txt = self._button_labels[i - 1] or "&nbsp;"
+        else:
+            txt = self.mw.col.sched.nextIvlStr(self.card, i, True) or "&nbsp;"
         return f"<span class=nobold>{txt}</span><br>"
 
     # Leeches
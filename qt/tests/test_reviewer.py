@@ -0,0 +1,34 @@
+# Copyright: Ankitects Pty Ltd and contributors
+# License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+import os
+import tempfile
+
+from anki.collection import Collection
+from aqt.reviewer import LOOKAHEAD_CARDS, prefetch_cards
+
+
+def test_prefetch_cards():
+    (fd, path) = tempfile.mkstemp(suffix=".anki2")
+    os.close(fd)
+    os.unlink(path)
+    col = Collection(path)
+    col.set_2021_test_scheduler_enabled(True)
+    for i in range(3):
+        note = col.newNote()
+        note["Front"] = str(i)
+        col.addNote(note)
+    current = col.sched.getCard()
+    prefetched = prefetch_cards(col, current.id, LOOKAHEAD_CARDS)
+    # the current card is not included
+    assert len(prefetched) == 2
+    assert current.id not in prefetched
+    (cid, entry) = next(iter(prefetched.items()))
+    assert entry.is_current(col.getCard(cid))
+    # changes are noticed, even if made in the same second
+    card = col.getCard(cid)
+    note = card.note()
+    note["Front"] = "changed"
+    col.update_note(note)
+    assert not entry.is_current(col.getCard(cid))
+    col.close(downgrade=False)
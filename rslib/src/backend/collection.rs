@@ -62,6 +62,7 @@ impl CollectionService for Backend {
         }
 
         let col_inner = col.take().unwrap();
+        self.db_iterators.lock().unwrap().clear();
         if input.downgrade_to_schema11 {
             let log = log::terminal();
             if let Err(e) = col_inner.close(input.downgrade_to_schema11) {
@@ -1,7 +1,10 @@
 // Copyright: Ankitects Pty Ltd and contributors
 // License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 
+use std::collections::HashMap;
+
 use rusqlite::{
+    params,
     types::{FromSql, FromSqlError, ToSql, ToSqlOutput, ValueRef},
     OptionalExtension,
 };
@@ -16,6 +19,10 @@ pub(super) enum DbRequest {
         sql: String,
         args: Vec<SqlValue>,
         first_row_only: bool,
+        /// If true, rows are returned in the columnar format produced by
+        /// [rows_to_columnar], instead of JSON.
+        #[serde(default)]
+        binary: bool,
     },
     Begin,
     Commit,
@@ -24,15 +31,134 @@ pub(super) enum DbRequest {
         sql: String,
         args: Vec<Vec<SqlValue>>,
     },
+    /// Run a query, holding the resulting rows in the backend so they can
+    /// be fetched in batches with IterNext. See [DbIterators].
+    IterStart {
+        sql: String,
+        args: Vec<SqlValue>,
+    },
+    IterNext {
+        id: u32,
+        batch_size: usize,
+        #[serde(default)]
+        binary: bool,
+    },
+    IterClose {
+        id: u32,
+    },
 }
 
 #[derive(Serialize)]
 #[serde(untagged)]
 pub(super) enum DbResult {
     Rows(Vec<Vec<SqlValue>>),
+    Id(u32),
     None,
 }
 
+/// Queries started with [DbRequest::IterStart] that have not yet been
+/// fully passed to Python.
+///
+/// The rows of a select are copied into a temporary table when iteration
+/// starts, and read from it a batch at a time, so like a normal query, the
+/// results are not affected by any changes made while iterating. The
+/// temporary table lives in SQLite's temp store, which is paged to disk,
+/// so memory use does not grow with the size of the result.
+#[derive(Default)]
+pub(super) struct DbIterators {
+    next_id: u32,
+    iterators: HashMap<u32, DbIterator>,
+}
+
+enum DbIterator {
+    /// Rows are read from the table after the given rowid.
+    Table { last_rowid: i64 },
+    /// Statements other than selects can't be copied into a table, so
+    /// their rows are held in memory.
+    Rows(std::vec::IntoIter<Vec<SqlValue>>),
+}
+
+fn iterator_table(id: u32) -> String {
+    format!("temp.db_iterator_{}", id)
+}
+
+impl DbIterators {
+    fn start(&mut self, storage: &SqliteStorage, sql: &str, args: &[SqlValue]) -> Result<u32> {
+        self.next_id = self.next_id.wrapping_add(1);
+        let id = self.next_id;
+        let iterator = if is_dql(sql) {
+            let table = iterator_table(id);
+            storage
+                .db
+                .execute_batch(&format!("drop table if exists {}", table))?;
+            storage
+                .db
+                .prepare(&format!("create table {} as {}", table, sql))?
+                .execute(args)?;
+            DbIterator::Table { last_rowid: 0 }
+        } else {
+            DbIterator::Rows(query_rows(storage, sql, args)?.into_iter())
+        };
+        self.iterators.insert(id, iterator);
+        Ok(id)
+    }
+
+    /// Take up to `batch_size` rows. Once no rows remain, the iterator is
+    /// removed.
+    fn next_batch(
+        &mut self,
+        storage: &SqliteStorage,
+        id: u32,
+        batch_size: usize,
+    ) -> Result<Vec<Vec<SqlValue>>> {
+        let batch_size = batch_size.max(1);
+        let iterator = self
+            .iterators
+            .get_mut(&id)
+            .ok_or_else(|| AnkiError::invalid_input("unknown db iterator"))?;
+        let batch: Vec<_> = match iterator {
+            DbIterator::Table { last_rowid } => {
+                let mut stmt = storage.db.prepare_cached(&format!(
+                    "select rowid, * from {} where rowid > ? order by rowid limit ?",
+                    iterator_table(id)
+                ))?;
+                let columns = stmt.column_count();
+                let mut rows = stmt.query(params![*last_rowid, batch_size as i64])?;
+                let mut batch = Vec::with_capacity(batch_size);
+                while let Some(row) = rows.next()? {
+                    *last_rowid = row.get(0)?;
+                    let mut orow = Vec::with_capacity(columns - 1);
+                    for i in 1..columns {
+                        orow.push(row.get(i)?);
+                    }
+                    batch.push(orow);
+                }
+                batch
+            }
+            DbIterator::Rows(rows) => rows.take(batch_size).collect(),
+        };
+        if batch.is_empty() {
+            self.remove(storage, id)?;
+        }
+        Ok(batch)
+    }
+
+    fn remove(&mut self, storage: &SqliteStorage, id: u32) -> Result<()> {
+        if let Some(DbIterator::Table { .. }) = self.iterators.remove(&id) {
+            storage
+                .db
+                .execute_batch(&format!("drop table if exists {}", iterator_table(id)))?;
+        }
+        Ok(())
+    }
+
+    /// Forget all iterators. Their tables are removed when the collection
+    /// is closed.
+    pub(super) fn clear(&mut self) {
+        self.iterators.clear();
+    }
+}
+
 #[derive(Serialize, Deserialize, Debug)]
 #[serde(untagged)]
 pub(super) enum SqlValue {
@@ -69,20 +195,31 @@ impl FromSql for SqlValue {
     }
 }
 
-pub(super) fn db_command_bytes(col: &mut Collection, input: &[u8]) -> Result<Vec<u8>> {
+pub(super) fn db_command_bytes(
+    col: &mut Collection,
+    iterators: &mut DbIterators,
+    input: &[u8],
+) -> Result<Vec<u8>> {
     let req: DbRequest = serde_json::from_slice(input)?;
     let resp = match req {
         DbRequest::Query {
             sql,
             args,
             first_row_only,
+            binary,
         } => {
             update_state_after_modification(col, &sql);
-            if first_row_only {
+            let rows = if first_row_only {
                 db_query_row(&col.storage, &sql, &args)?
             } else {
                 db_query(&col.storage, &sql, &args)?
+            };
+            if binary {
+                if let DbResult::Rows(rows) = rows {
+                    return Ok(rows_to_columnar(&rows));
+                }
             }
+            rows
         }
         DbRequest::Begin => {
             col.storage.begin_trx()?;
@@ -105,10 +242,128 @@ pub(super) fn db_command_bytes(col: &mut Collection, input: &[u8]) -> Result<Vec
             update_state_after_modification(col, &sql);
             db_execute_many(&col.storage, &sql, &args)?
         }
+        DbRequest::IterStart { sql, args } => {
+            update_state_after_modification(col, &sql);
+            DbResult::Id(iterators.start(&col.storage, &sql, &args)?)
+        }
+        DbRequest::IterNext {
+            id,
+            batch_size,
+            binary,
+        } => {
+            let rows = iterators.next_batch(&col.storage, id, batch_size)?;
+            if binary {
+                return Ok(rows_to_columnar(&rows));
+            }
+            DbResult::Rows(rows)
+        }
+        DbRequest::IterClose { id } => {
+            iterators.remove(&col.storage, id)?;
+            DbResult::None
+        }
     };
     Ok(serde_json::to_vec(&resp)?)
 }
 
+/// Column kinds used by [rows_to_columnar].
+const COLUMN_NULL: u8 = 0;
+const COLUMN_INT: u8 = 1;
+const COLUMN_DOUBLE: u8 = 2;
+const COLUMN_TEXT: u8 = 3;
+const COLUMN_BLOB: u8 = 4;
+const COLUMN_MIXED: u8 = 5;
+
+/// Encode rows column by column, so the Python side can decode each column
+/// in a single struct.unpack() call instead of parsing JSON.
+///
+/// Layout (little endian): u32 row count, u32 column count, then for each
+/// column a kind byte followed by:
+/// - null: nothing
+/// - int/double: row count * 8 byte values
+/// - text/blob: row count * u32 byte lengths, then the concatenated bytes
+/// - mixed: for each row, a kind byte and the value encoded as above, with
+///   text/blob values prefixed by their u32 length
+fn rows_to_columnar(rows: &[Vec<SqlValue>]) -> Vec<u8> {
+    let row_count = rows.len();
+    let column_count = rows.first().map(|r| r.len()).unwrap_or_default();
+    let mut out = Vec::with_capacity(8 + row_count * column_count * 9);
+    out.extend_from_slice(&(row_count as u32).to_le_bytes());
+    out.extend_from_slice(&(column_count as u32).to_le_bytes());
+
+    for column in 0..column_count {
+        let kind = column_kind(rows.iter().map(|row| &row[column]));
+        out.push(kind);
+        match kind {
+            COLUMN_NULL => (),
+            COLUMN_INT | COLUMN_DOUBLE => {
+                for row in rows {
+                    match &row[column] {
+                        SqlValue::Int(v) => out.extend_from_slice(&v.to_le_bytes()),
+                        SqlValue::Double(v) => out.extend_from_slice(&v.to_le_bytes()),
+                        _ => unreachable!(),
+                    }
+                }
+            }
+            COLUMN_TEXT | COLUMN_BLOB => {
+                for row in rows {
+                    let len = sql_value_bytes(&row[column]).len() as u32;
+                    out.extend_from_slice(&len.to_le_bytes());
+                }
+                for row in rows {
+                    out.extend_from_slice(sql_value_bytes(&row[column]));
+                }
+            }
+            _ => {
+                for row in rows {
+                    let value = &row[column];
+                    let value_kind = column_kind(std::iter::once(value));
+                    out.push(value_kind);
+                    match value {
+                        SqlValue::Null => (),
+                        SqlValue::Int(v) => out.extend_from_slice(&v.to_le_bytes()),
+                        SqlValue::Double(v) => out.extend_from_slice(&v.to_le_bytes()),
+                        SqlValue::String(_) | SqlValue::Blob(_) => {
+                            let bytes = sql_value_bytes(value);
+                            out.extend_from_slice(&(bytes.len() as u32).to_le_bytes());
+                            out.extend_from_slice(bytes);
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+    out
+}
+
+/// The shared kind of the provided values, or [COLUMN_MIXED].
+fn column_kind<'a>(values: impl Iterator<Item = &'a SqlValue>) -> u8 {
+    let mut kind = None;
+    for value in values {
+        let value_kind = match value {
+            SqlValue::Null => COLUMN_NULL,
+            SqlValue::Int(_) => COLUMN_INT,
+            SqlValue::Double(_) => COLUMN_DOUBLE,
+            SqlValue::String(_) => COLUMN_TEXT,
+            SqlValue::Blob(_) => COLUMN_BLOB,
+        };
+        match kind {
+            None => kind = Some(value_kind),
+            Some(existing) if existing != value_kind => return COLUMN_MIXED,
+            _ => (),
+        }
+    }
+    kind.unwrap_or(COLUMN_NULL)
+}
+
+fn sql_value_bytes(value: &SqlValue) -> &[u8] {
+    match value {
+        SqlValue::String(v) => v.as_bytes(),
+        SqlValue::Blob(v) => v,
+        _ => &[],
+    }
+}
+
 fn update_state_after_modification(col: &mut Collection, sql: &str) {
     if !is_dql(sql) {
         println!("clearing undo+study due to {}", sql);
@@ -152,6 +407,10 @@ pub(super) fn db_query_row(ctx: &SqliteStorage, sql: &str, args: &[SqlValue]) ->
 }
 
 pub(super) fn db_query(ctx: &SqliteStorage, sql: &str, args: &[SqlValue]) -> Result<DbResult> {
+    Ok(DbResult::Rows(query_rows(ctx, sql, args)?))
+}
+
+fn query_rows(ctx: &SqliteStorage, sql: &str, args: &[SqlValue]) -> Result<Vec<Vec<SqlValue>>> {
     let mut stmt = ctx.db.prepare_cached(sql)?;
     let columns = stmt.column_count();
 
@@ -166,7 +425,7 @@ pub(super) fn db_query(ctx: &SqliteStorage, sql: &str, args: &[SqlValue]) -> Res
         })?
         .collect();
 
-    Ok(DbResult::Rows(res?))
+    Ok(res?)
 }
 
 pub(super) fn db_execute_many(
@@ -182,3 +441,66 @@ pub(super) fn db_execute_many(
 
     Ok(DbResult::None)
 }
+
+#[cfg(test)]
+mod test {
+    use super::*;
+
+    #[test]
+    fn columnar() {
+        let rows = vec![
+            vec![
+                SqlValue::Int(1),
+                SqlValue::String("a".into()),
+                SqlValue::Null,
+            ],
+            vec![
+                SqlValue::Int(2),
+                SqlValue::String("bc".into()),
+                SqlValue::Double(1.5),
+            ],
+        ];
+        let out = rows_to_columnar(&rows);
+        let mut expected = vec![2, 0, 0, 0, 3, 0, 0, 0];
+        expected.push(COLUMN_INT);
+        expected.extend_from_slice(&1i64.to_le_bytes());
+        expected.extend_from_slice(&2i64.to_le_bytes());
+        expected.push(COLUMN_TEXT);
+        expected.extend_from_slice(&1u32.to_le_bytes());
+        expected.extend_from_slice(&2u32.to_le_bytes());
+        expected.extend_from_slice(b"abc");
+        expected.push(COLUMN_MIXED);
+        expected.push(COLUMN_NULL);
+        expected.push(COLUMN_DOUBLE);
+        expected.extend_from_slice(&1.5f64.to_le_bytes());
+        assert_eq!(out, expected);
+
+        assert_eq!(rows_to_columnar(&[]), vec![0; 8]);
+    }
+
+    #[test]
+    fn iterators() -> Result<()> {
+        let col = crate::collection::open_test_collection();
+        let storage = &col.storage;
+        storage.db.execute_batch(
+            "create table t (n integer); insert into t values (0), (1), (2), (3), (4)",
+        )?;
+        let mut iterators = DbIterators::default();
+        let id = iterators.start(storage, "select n from t where n < ?", &[SqlValue::Int(5)])?;
+        // the rows are a snapshot of the query
+        storage.db.execute_batch("delete from t")?;
+        let batch = iterators.next_batch(storage, id, 2)?;
+        assert_eq!(batch.len(), 2);
+        assert!(matches!(batch[1][..], [SqlValue::Int(1)]));
+        assert_eq!(iterators.next_batch(storage, id, 2)?.len(), 2);
+        assert_eq!(iterators.next_batch(storage, id, 2)?.len(), 1);
+        assert!(iterators.next_batch(storage, id, 2)?.is_empty());
+        // exhausted iterators are removed, along with their table
+        assert!(iterators.next_batch(storage, id, 2).is_err());
+        assert!(storage
+            .db
+            .prepare(&format!("select * from {}", iterator_table(id)))
+            .is_err());
+        Ok(())
+    }
+}
@@ -55,7 +55,7 @@ use self::{
     tags::TagsService,
 };
 use crate::{
-    backend::dbproxy::db_command_bytes,
+    backend::dbproxy::{db_command_bytes, DbIterators},
     backend_proto as pb,
     collection::Collection,
     error::{AnkiError, Result},
@@ -70,6 +70,7 @@ pub struct Backend {
     progress_state: Arc<Mutex<ProgressState>>,
     runtime: OnceCell<Runtime>,
     state: Arc<Mutex<BackendState>>,
+    db_iterators: Arc<Mutex<DbIterators>>,
 }
 
 #[derive(Default)]
@@ -101,6 +102,7 @@ impl Backend {
             })),
             runtime: OnceCell::new(),
             state: Arc::new(Mutex::new(BackendState::default())),
+            db_iterators: Arc::new(Mutex::new(DbIterators::default())),
         }
     }
 
@@ -183,6 +185,6 @@ impl Backend {
     }
 
     fn db_command(&self, input: &[u8]) -> Result<Vec<u8>> {
-        self.with_col(|col| db_command_bytes(col, input))
+        self.with_col(|col| db_command_bytes(col, &mut self.db_iterators.lock().unwrap(), input))
     }
 }
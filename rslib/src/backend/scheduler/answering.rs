@@ -5,7 +5,7 @@ use crate::{
     backend_proto as pb,
     prelude::*,
     scheduler::{
-        answering::{CardAnswer, Rating},
+        answering::{CardAnswer, RatedAnswer, Rating},
         queue::{QueuedCard, QueuedCards},
     },
 };
@@ -23,6 +23,28 @@ impl From<pb::AnswerCardIn> for CardAnswer {
     }
 }
 
+pub(super) fn rated_answers(input: pb::AnswerCardsIn) -> Result<Vec<RatedAnswer>> {
+    let count = input.card_ids.len();
+    if input.ratings.len() != count
+        || input.answered_at_millis.len() != count
+        || input.milliseconds_taken.len() != count
+    {
+        return Err(AnkiError::invalid_input("answer lists differ in length"));
+    }
+    let mut answers = Vec::with_capacity(count);
+    for idx in 0..count {
+        let rating = pb::answer_card_in::Rating::from_i32(input.ratings[idx])
+            .ok_or_else(|| AnkiError::invalid_input("invalid rating"))?;
+        answers.push(RatedAnswer {
+            card_id: CardId(input.card_ids[idx]),
+            rating: rating.into(),
+            answered_at: TimestampMillis(input.answered_at_millis[idx]),
+            milliseconds_taken: input.milliseconds_taken[idx],
+        });
+    }
+    Ok(answers)
+}
+
 impl From<pb::answer_card_in::Rating> for Rating {
     fn from(rating: pb::answer_card_in::Rating) -> Self {
         match rating {
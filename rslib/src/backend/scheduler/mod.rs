@@ -4,6 +4,8 @@
 mod answering;
 mod states;
 
+use answering::rated_answers;
+
 use super::Backend;
 pub(super) use crate::backend_proto::scheduling_service::Service as SchedulingService;
 use crate::{
@@ -174,6 +176,12 @@ impl SchedulingService for Backend {
             .map(Into::into)
     }
 
+    fn answer_cards(&self, input: pb::AnswerCardsIn) -> Result<pb::OpChangesWithCount> {
+        let answers = rated_answers(input)?;
+        self.with_col(|col| col.answer_cards(&answers))
+            .map(Into::into)
+    }
+
     fn upgrade_scheduler(&self, _input: pb::Empty) -> Result<pb::Empty> {
         self.with_col(|col| col.transact_no_undo(|col| col.upgrade_to_v2_scheduler()))
             .map(Into::into)
@@ -15,6 +15,19 @@ impl StatsService for Backend {
         self.with_col(|col| col.graph_data_for_search(&input.search, input.days))
     }
 
+    fn update_revlog_days(&self, input: pb::Bool) -> Result<pb::Int64> {
+        self.with_col(|col| col.update_revlog_days(input.val))
+            .map(Into::into)
+    }
+
+    fn revlog_table(&self, input: pb::TableIn) -> Result<pb::TableOut> {
+        self.with_col(|col| col.revlog_table(input))
+    }
+
+    fn cards_table(&self, input: pb::TableIn) -> Result<pb::TableOut> {
+        self.with_col(|col| col.cards_table(input))
+    }
+
     fn get_graph_preferences(&self, _input: pb::Empty) -> Result<pb::GraphPreferences> {
         self.with_col(|col| Ok(col.get_graph_preferences()))
     }
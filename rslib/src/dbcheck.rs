@@ -373,6 +373,8 @@ impl Collection {
             self.set_schema_modified()?;
             out.revlog_properties_invalid = cnt;
         }
+        // rebuilt when next needed
+        self.storage.clear_revlog_days()?;
 
         Ok(())
     }
@@ -8,6 +8,7 @@ pub enum Op {
     AddDeck,
     AddNote,
     AnswerCard,
+    AnswerCards,
     BuildFilteredDeck,
     Bury,
     ClearUnusedTags,
@@ -44,6 +45,7 @@ impl Op {
             Op::AddDeck => tr.undo_add_deck(),
             Op::AddNote => tr.undo_add_note(),
             Op::AnswerCard => tr.undo_answer_card(),
+            Op::AnswerCards => tr.undo_answer_cards(),
             Op::Bury => tr.studying_bury(),
             Op::RemoveDeck => tr.decks_delete_deck(),
             Op::RemoveNote => tr.studying_delete_note(),
@@ -9,6 +9,8 @@ mod review;
 mod revlog;
 mod undo;
 
+use std::collections::HashMap;
+
 use revlog::RevlogEntryPartial;
 
 use super::{
@@ -43,6 +45,16 @@ pub struct CardAnswer {
     pub milliseconds_taken: u32,
 }
 
+/// An answer whose new state is determined by the rating, for importing
+/// reviews in bulk. The state is calculated as of answered_at, which may be
+/// on an earlier day.
+pub struct RatedAnswer {
+    pub card_id: CardId,
+    pub rating: Rating,
+    pub answered_at: TimestampMillis,
+    pub milliseconds_taken: u32,
+}
+
 // fixme: log preview review
 
 /// Holds the information required to determine a given card's
@@ -243,15 +255,41 @@ impl Collection {
         self.transact(Op::AnswerCard, |col| col.answer_card_inner(answer))
     }
 
+    /// Answer many cards in a single undoable operation, applying the state
+    /// each rating leads to at the time the answer was given. Answers are
+    /// applied in order, so the same card may be answered more than once, but
+    /// a card's answers must be in chronological order, and none may be in
+    /// the future. The cards do not need to be in the study queues, which are
+    /// rebuilt afterwards. Answers from earlier days do not count towards
+    /// today's limits, or bury siblings. Returns the number of answers applied.
+    pub fn answer_cards(&mut self, answers: &[RatedAnswer]) -> Result<OpOutput<usize>> {
+        self.transact(Op::AnswerCards, |col| {
+            let now = TimestampSecs::now();
+            let mut decks = HashMap::new();
+            let mut last_answered = HashMap::new();
+            for answer in answers {
+                if answer.answered_at.as_secs() > now {
+                    return Err(AnkiError::invalid_input("answer is in the future"));
+                }
+                if let Some(previous) = last_answered.insert(answer.card_id, answer.answered_at) {
+                    if previous.0 > answer.answered_at.0 {
+                        return Err(AnkiError::invalid_input(
+                            "answers for a card must be in chronological order",
+                        ));
+                    }
+                }
+                col.answer_card_with_rating(answer, &mut decks)?;
+            }
+            Ok(answers.len())
+        })
+    }
+
     fn answer_card_inner(&mut self, answer: &CardAnswer) -> Result<()> {
         let card = self
             .storage
             .get_card(answer.card_id)?
             .ok_or(AnkiError::NotFound)?;
-        let original = card.clone();
-        let usn = self.usn()?;
-
-        let mut updater = self.card_state_updater(card)?;
+        let updater = self.card_state_updater(card)?;
         let current_state = updater.current_card_state();
         if current_state != answer.current_state {
             return Err(AnkiError::invalid_input(format!(
@@ -259,12 +297,75 @@ impl Collection {
                 current_state, answer.current_state,
             )));
         }
-        if let Some(revlog_partial) = updater.apply_study_state(current_state, answer.new_state)? {
+        let timing = updater.timing;
+        let card = self.apply_answer(updater, answer)?;
+
+        self.update_queues_after_answering_card(&card, timing)
+    }
+
+    /// Like answer_card_inner(), but the new state is derived from the
+    /// rating as of the time of the answer, and the queues are not updated. Decks and their configs are
+    /// cached in `decks`, as they don't change while answering.
+    fn answer_card_with_rating(
+        &mut self,
+        answer: &RatedAnswer,
+        decks: &mut HashMap<DeckId, (Deck, DeckConfig)>,
+    ) -> Result<()> {
+        let card = self
+            .storage
+            .get_card(answer.card_id)?
+            .ok_or(AnkiError::NotFound)?;
+        let (deck, config) = match decks.get(&card.deck_id) {
+            Some(entry) => entry.clone(),
+            None => {
+                let entry = self.deck_and_config(&card)?;
+                decks.insert(card.deck_id, entry.clone());
+                entry
+            }
+        };
+        let mut updater = self.card_state_updater_for_deck(card, deck, config)?;
+        let answered_at = answer.answered_at.as_secs();
+        updater.timing = self.timing_for_timestamp(answered_at)?;
+        updater.now = answered_at;
+        let current_state = updater.current_card_state();
+        let next = current_state.next_states(&updater.state_context());
+        let new_state = match answer.rating {
+            Rating::Again => next.again,
+            Rating::Hard => next.hard,
+            Rating::Good => next.good,
+            Rating::Easy => next.easy,
+        };
+        self.apply_answer(
+            updater,
+            &CardAnswer {
+                card_id: answer.card_id,
+                current_state,
+                new_state,
+                rating: answer.rating,
+                answered_at: answer.answered_at,
+                milliseconds_taken: answer.milliseconds_taken,
+            },
+        )?;
+
+        Ok(())
+    }
+
+    /// Write the answer's new state, revlog entry and deck stats, returning
+    /// the updated card. The caller must check the answer's current state.
+    fn apply_answer(&mut self, mut updater: CardStateUpdater, answer: &CardAnswer) -> Result<Card> {
+        let original = updater.card.clone();
+        let usn = self.usn()?;
+
+        if let Some(revlog_partial) =
+            updater.apply_study_state(answer.current_state, answer.new_state)?
+        {
             self.add_partial_revlog(revlog_partial, usn, &answer)?;
         }
-        self.update_deck_stats_from_answer(usn, &answer, &updater)?;
-        self.maybe_bury_siblings(&original, &updater.config)?;
-        let timing = updater.timing;
+        // answers from an earlier day don't count towards today's limits
+        if updater.timing.days_elapsed == self.timing_today()?.days_elapsed {
+            self.update_deck_stats_from_answer(usn, &answer, &updater)?;
+            self.maybe_bury_siblings(&original, &updater.config)?;
+        }
         let mut card = updater.into_card();
         self.update_card_inner(&mut card, original, usn)?;
         println!("fixme: add_leech calls update_note_tags() which creates a transaction");
@@ -272,7 +373,7 @@ impl Collection {
             self.add_leech_tag(card.note_id)?;
         }
 
-        self.update_queues_after_answering_card(&card, timing)
+        Ok(card)
     }
 
     fn maybe_bury_siblings(&mut self, card: &Card, config: &DeckConfig) -> Result<()> {
@@ -336,12 +437,26 @@ impl Collection {
     }
 
     fn card_state_updater(&mut self, card: Card) -> Result<CardStateUpdater> {
-        let timing = self.timing_today()?;
+        let (deck, config) = self.deck_and_config(&card)?;
+        self.card_state_updater_for_deck(card, deck, config)
+    }
+
+    fn deck_and_config(&self, card: &Card) -> Result<(Deck, DeckConfig)> {
         let deck = self
             .storage
             .get_deck(card.deck_id)?
             .ok_or(AnkiError::NotFound)?;
         let config = self.home_deck_config(deck.config_id(), card.original_deck_id)?;
+        Ok((deck, config))
+    }
+
+    fn card_state_updater_for_deck(
+        &mut self,
+        card: Card,
+        deck: Deck,
+        config: DeckConfig,
+    ) -> Result<CardStateUpdater> {
+        let timing = self.timing_today()?;
         Ok(CardStateUpdater {
             fuzz_seed: get_fuzz_seed(&card),
             card,
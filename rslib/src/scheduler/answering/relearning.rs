@@ -25,7 +25,7 @@ impl CardStateUpdater {
         match interval {
             IntervalKind::InSecs(secs) => {
                 self.card.queue = CardQueue::Learn;
-                self.card.due = TimestampSecs::now().0 as i32 + secs as i32;
+                self.card.due = self.now.0 as i32 + secs as i32;
             }
             IntervalKind::InDays(days) => {
                 self.card.queue = CardQueue::DayLearn;
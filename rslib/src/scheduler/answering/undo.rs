@@ -8,7 +8,8 @@ mod test {
         collection::open_test_collection,
         deckconfig::LeechAction,
         prelude::*,
-        scheduler::answering::{CardAnswer, Rating},
+        scheduler::answering::{CardAnswer, RatedAnswer, Rating},
+        search::SortMode,
     };
 
     #[test]
@@ -142,4 +143,112 @@ mod test {
 
         Ok(())
     }
+
+    #[test]
+    fn answer_cards() -> Result<()> {
+        let mut col = open_test_collection();
+        let nt = col.get_notetype_by_name("Basic")?.unwrap();
+        for idx in 0..3 {
+            let mut note = nt.new_note();
+            note.set_field(0, idx.to_string())?;
+            col.add_note(&mut note, DeckId(1))?;
+        }
+        let cids = col.search_cards("", SortMode::NoOrder)?;
+        let rated = |card_id, rating| RatedAnswer {
+            card_id,
+            rating,
+            answered_at: TimestampMillis::now(),
+            milliseconds_taken: 1000,
+        };
+
+        // cards don't need to be at the top of the queue, and may be
+        // answered more than once
+        let out = col.answer_cards(&[
+            rated(cids[2], Rating::Easy),
+            rated(cids[0], Rating::Again),
+            rated(cids[0], Rating::Good),
+        ])?;
+        assert_eq!(out.output, 3);
+        assert_eq!(
+            col.storage.get_card(cids[2])?.unwrap().ctype,
+            CardType::Review
+        );
+        assert_eq!(col.storage.get_card(cids[0])?.unwrap().reps, 2);
+        assert_eq!(
+            col.storage.get_card(cids[1])?.unwrap().queue,
+            CardQueue::New
+        );
+        assert_eq!(
+            col.storage.get_all_revlog_entries(TimestampSecs(0))?.len(),
+            3
+        );
+        assert_eq!(col.get_deck(DeckId(1))?.unwrap().common.new_studied, 2);
+        let counts = col.get_queues()?.counts();
+        assert_eq!((counts.new, counts.learning, counts.review), (1, 1, 0));
+
+        // a single undo reverts the whole batch
+        col.undo()?;
+        for cid in &cids {
+            assert_eq!(col.storage.get_card(*cid)?.unwrap().queue, CardQueue::New);
+        }
+        assert_eq!(
+            col.storage.get_all_revlog_entries(TimestampSecs(0))?.len(),
+            0
+        );
+        assert_eq!(col.get_deck(DeckId(1))?.unwrap().common.new_studied, 0);
+        let counts = col.get_queues()?.counts();
+        assert_eq!((counts.new, counts.learning, counts.review), (3, 0, 0));
+
+        Ok(())
+    }
+
+    #[test]
+    fn answer_cards_on_earlier_day() -> Result<()> {
+        let mut col = open_test_collection();
+        col.storage
+            .set_creation_stamp(TimestampSecs::now().adding_secs(-30 * 86_400))?;
+        col.state.scheduler_info = None;
+        let nt = col.get_notetype_by_name("Basic")?.unwrap();
+        let mut note = nt.new_note();
+        note.set_field(0, "one")?;
+        col.add_note(&mut note, DeckId(1))?;
+        let cid = col.search_cards("", SortMode::NoOrder)?[0];
+        let rated = |rating, answered_at: TimestampSecs| RatedAnswer {
+            card_id: cid,
+            rating,
+            answered_at: answered_at.as_millis(),
+            milliseconds_taken: 1000,
+        };
+
+        // answers can't be in the future, or out of order
+        let ten_days_ago = TimestampSecs::now().adding_secs(-10 * 86_400);
+        assert!(col
+            .answer_cards(&[rated(Rating::Good, TimestampSecs::now().adding_secs(3600))])
+            .is_err());
+        assert!(col
+            .answer_cards(&[
+                rated(Rating::Good, ten_days_ago.adding_secs(600)),
+                rated(Rating::Good, ten_days_ago),
+            ])
+            .is_err());
+
+        // the card graduates on the day it was answered, so it is now overdue
+        col.answer_cards(&[
+            rated(Rating::Good, ten_days_ago),
+            rated(Rating::Good, ten_days_ago.adding_secs(600)),
+        ])?;
+        let answer_day = col
+            .timing_for_timestamp(ten_days_ago.adding_secs(600))?
+            .days_elapsed;
+        let card = col.storage.get_card(cid)?.unwrap();
+        assert_eq!(card.ctype, CardType::Review);
+        assert_eq!(card.due as u32, answer_day + card.interval);
+        assert!((card.due as u32) < col.timing_today()?.days_elapsed);
+        let revlog = col.storage.get_all_revlog_entries(TimestampSecs(0))?;
+        assert_eq!(revlog[0].id, ten_days_ago.as_millis().0);
+        // and the answers don't count towards today's limits
+        assert_eq!(col.get_deck(DeckId(1))?.unwrap().common.new_studied, 0);
+
+        Ok(())
+    }
 }
@@ -34,11 +34,23 @@ impl Collection {
         let local_offset_secs = offset.local_minus_utc() as i64;
 
         let cards = self.storage.all_searched_cards()?;
-        let revlog = if all {
-            self.storage.get_all_revlog_entries(revlog_start)?
+        let (revlog, revlog_days) = if all {
+            let today = self.revlog_days_today()?;
+            let since = if days > 0 {
+                today - days as i64
+            } else {
+                i64::MIN
+            };
+            (
+                self.storage.get_all_revlog_entries(revlog_start)?,
+                self.storage.get_revlog_days(today, since)?,
+            )
         } else {
-            self.storage
-                .get_revlog_entries_for_searched_cards(revlog_start)?
+            (
+                self.storage
+                    .get_revlog_entries_for_searched_cards(revlog_start)?,
+                vec![],
+            )
         };
 
         self.storage.clear_searched_cards_table()?;
@@ -50,6 +62,7 @@ impl Collection {
             next_day_at_secs: timing.next_day_at.0 as u32,
             scheduler_version: self.scheduler_version() as u32,
             local_offset_secs: local_offset_secs as i32,
+            revlog_days,
         })
     }
 
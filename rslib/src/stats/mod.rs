@@ -3,6 +3,8 @@
 
 mod card;
 mod graphs;
+mod revlog_days;
+mod tables;
 mod today;
 
 pub use today::studied_today;
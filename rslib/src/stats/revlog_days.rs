@@ -0,0 +1,121 @@
+// Copyright: Ankitects Pty Ltd and contributors
+// License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+use crate::prelude::*;
+
+impl Collection {
+    /// The number of today in the revlog_days table. The table is rebuilt
+    /// first if it is out of date, or the day cutoff has moved since it was
+    /// built.
+    pub(crate) fn revlog_days_today(&mut self) -> Result<i64> {
+        let next_day_at = self.timing_today()?.next_day_at.0;
+        let cutoff = next_day_at.rem_euclid(86_400);
+        if self.storage.revlog_days_cutoff()? != Some(cutoff) {
+            self.storage.rebuild_revlog_days(cutoff)?;
+        }
+        Ok((next_day_at - cutoff) / 86_400 - 1)
+    }
+
+    /// Make sure the daily totals of the revlog are up to date, rebuilding
+    /// them from scratch if `rebuild` is true. Returns the number of today.
+    pub fn update_revlog_days(&mut self, rebuild: bool) -> Result<i64> {
+        if rebuild {
+            self.storage.clear_revlog_days()?;
+        }
+        self.revlog_days_today()
+    }
+}
+
+#[cfg(test)]
+mod test {
+    use super::*;
+    use crate::{
+        collection::open_test_collection,
+        revlog::RevlogEntry,
+        scheduler::answering::{RatedAnswer, Rating},
+        search::SortMode,
+    };
+
+    fn answers_in_deck(col: &Collection, did: DeckId) -> Result<i64> {
+        Ok(col.storage.db.query_row(
+            "select coalesce(sum(count), 0) from revlog_days where did = ?",
+            &[did],
+            |row| row.get(0),
+        )?)
+    }
+
+    #[test]
+    fn revlog_days() -> Result<()> {
+        let mut col = open_test_collection();
+        let today = col.revlog_days_today()?;
+        let entry = RevlogEntry {
+            id: RevlogId::new(),
+            cid: CardId(1),
+            taken_millis: 2000,
+            ..Default::default()
+        };
+        col.storage.add_revlog_entry(&entry, true)?;
+        let studied = col.storage.studied_today(today)?;
+        assert_eq!(studied.cards, 1);
+        assert_eq!(studied.seconds, 2.0);
+
+        // removing the entry updates the totals
+        col.storage.remove_revlog_entry(entry.id)?;
+        assert_eq!(col.storage.studied_today(today)?.cards, 0);
+
+        // totals that are out of date are rebuilt when next needed
+        col.storage.add_revlog_entry(&entry, true)?;
+        col.storage.clear_revlog_days()?;
+        assert_eq!(col.storage.studied_today(today)?.cards, 0);
+        let today = col.update_revlog_days(false)?;
+        assert_eq!(col.storage.studied_today(today)?.cards, 1);
+
+        // and the graphs read them too
+        let graphs = col.graph_data_for_search("", 30)?;
+        assert_eq!(graphs.revlog_days.len(), 1);
+        assert_eq!(graphs.revlog_days[0].day, 0);
+        assert_eq!(graphs.revlog_days[0].count, 1);
+        assert_eq!(graphs.revlog_days[0].taken_millis, 2000);
+
+        Ok(())
+    }
+
+    #[test]
+    fn undo_and_sync_keep_deck_totals() -> Result<()> {
+        let mut col = open_test_collection();
+        col.revlog_days_today()?;
+        let nt = col.get_notetype_by_name("Basic")?.unwrap();
+        let mut note = nt.new_note();
+        note.set_field(0, "one")?;
+        col.add_note(&mut note, DeckId(1))?;
+        let cid = col.search_cards("", SortMode::NoOrder)?[0];
+        let answer = |col: &mut Collection, rating| {
+            col.answer_cards(&[RatedAnswer {
+                card_id: cid,
+                rating,
+                answered_at: TimestampMillis::now(),
+                milliseconds_taken: 1000,
+            }])
+        };
+        answer(&mut col, Rating::Again)?;
+        answer(&mut col, Rating::Good)?;
+        assert_eq!(answers_in_deck(&col, DeckId(1))?, 2);
+
+        // undo writes the old card back over the existing one
+        col.undo()?;
+        assert_eq!(answers_in_deck(&col, DeckId(1))?, 1);
+        assert_eq!(answers_in_deck(&col, DeckId(0))?, 0);
+
+        // as does a sync, which may also move the card
+        let mut card = col.storage.get_card(cid)?.unwrap();
+        col.storage.add_or_update_card(&card)?;
+        assert_eq!(answers_in_deck(&col, DeckId(1))?, 1);
+        card.deck_id = DeckId(2);
+        col.storage.add_or_update_card(&card)?;
+        assert_eq!(answers_in_deck(&col, DeckId(1))?, 0);
+        assert_eq!(answers_in_deck(&col, DeckId(2))?, 1);
+        assert_eq!(answers_in_deck(&col, DeckId(0))?, 0);
+
+        Ok(())
+    }
+}
@@ -0,0 +1,135 @@
+// Copyright: Ankitects Pty Ltd and contributors
+// License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
+
+//! The revlog and cards tables as packed rows of fixed-width little-endian
+//! integers, which the frontend can read into arrays without converting
+//! each value. The layouts must match pylib/anki/tables.py.
+
+use rusqlite::Row;
+
+use crate::{backend_proto as pb, prelude::*, search::SortMode};
+
+/// Bytes per column: id, cid, usn, ease, ivl, lastIvl, factor, time, type
+const REVLOG_WIDTHS: &[usize] = &[8, 8, 4, 1, 4, 4, 4, 4, 1];
+
+/// Bytes per column: id, nid, did, ord, mod, usn, type, queue, due, ivl,
+/// factor, reps, lapses, left, odue, odid, flags
+const CARD_WIDTHS: &[usize] = &[8, 8, 8, 4, 8, 4, 1, 1, 4, 4, 4, 4, 4, 4, 4, 8, 1];
+
+/// Append the row to `out`, truncating each column to its width.
+fn pack_row(row: &Row, widths: &[usize], out: &mut pb::TableOut) -> Result<()> {
+    out.last_id = row.get(0)?;
+    for (idx, width) in widths.iter().enumerate() {
+        // like the rest of the code, invalid values are read as zero
+        let val: i64 = row.get(idx).unwrap_or_default();
+        out.rows.extend_from_slice(&val.to_le_bytes()[..*width]);
+    }
+    out.count += 1;
+    Ok(())
+}
+
+impl Collection {
+    pub(crate) fn revlog_table(&mut self, input: pb::TableIn) -> Result<pb::TableOut> {
+        let searched = self.search_cards_for_table(&input)?;
+        let mut out = pb::TableOut::default();
+        let result =
+            self.storage
+                .for_each_revlog_row(searched, input.after_id, input.limit as i64, |row| {
+                    pack_row(row, REVLOG_WIDTHS, &mut out)
+                });
+        self.storage.clear_searched_cards_table()?;
+        result.map(|_| out)
+    }
+
+    pub(crate) fn cards_table(&mut self, input: pb::TableIn) -> Result<pb::TableOut> {
+        let searched = self.search_cards_for_table(&input)?;
+        let mut out = pb::TableOut::default();
+        let result =
+            self.storage
+                .for_each_card_row(searched, input.after_id, input.limit as i64, |row| {
+                    pack_row(row, CARD_WIDTHS, &mut out)
+                });
+        self.storage.clear_searched_cards_table()?;
+        result.map(|_| out)
+    }
+
+    /// Card ids are used in place of the search if provided. An empty search
+    /// reads the whole table, without a search.
+    fn search_cards_for_table(&mut self, input: &pb::TableIn) -> Result<bool> {
+        if !input.card_ids.is_empty() {
+            let cids: Vec<_> = input.card_ids.iter().copied().map(CardId).collect();
+            self.storage.set_search_table_to_card_ids(&cids, false)?;
+            Ok(true)
+        } else if input.search.trim().is_empty() {
+            Ok(false)
+        } else {
+            self.search_cards_into_table(&input.search, SortMode::NoOrder)?;
+            Ok(true)
+        }
+    }
+}
+
+#[cfg(test)]
+mod test {
+    use super::*;
+    use crate::{collection::open_test_collection, revlog::RevlogEntry};
+
+    #[test]
+    fn tables() -> Result<()> {
+        let mut col = open_test_collection();
+        for cid in 1..=3 {
+            let entry = RevlogEntry {
+                id: RevlogId(cid),
+                cid: CardId(cid),
+                button_chosen: 3,
+                ..Default::default()
+            };
+            col.storage.add_revlog_entry(&entry, false)?;
+        }
+        let row_width: usize = REVLOG_WIDTHS.iter().sum();
+
+        let out = col.revlog_table(pb::TableIn {
+            search: "".into(),
+            after_id: 0,
+            limit: 2,
+            card_ids: vec![],
+        })?;
+        assert_eq!(out.count, 2);
+        assert_eq!(out.rows.len(), row_width * 2);
+        assert_eq!(out.last_id, 2);
+        // the ease follows the id, cid and usn
+        assert_eq!(out.rows[20], 3);
+
+        // the next batch continues from the last id
+        let out = col.revlog_table(pb::TableIn {
+            search: "".into(),
+            after_id: out.last_id,
+            limit: 2,
+            card_ids: vec![],
+        })?;
+        assert_eq!(out.count, 1);
+        assert_eq!(out.last_id, 3);
+
+        // the cards have not been added, so only a search-less read includes
+        // their entries
+        let out = col.revlog_table(pb::TableIn {
+            search: "cid:2".into(),
+            after_id: 0,
+            limit: 0,
+            card_ids: vec![],
+        })?;
+        assert_eq!(out.count, 0);
+
+        // unless the card ids are provided instead
+        let out = col.revlog_table(pb::TableIn {
+            search: "".into(),
+            after_id: 0,
+            limit: 0,
+            card_ids: vec![2, 3],
+        })?;
+        assert_eq!(out.count, 2);
+        assert_eq!(out.last_id, 3);
+
+        Ok(())
+    }
+}
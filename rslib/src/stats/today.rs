@@ -18,8 +18,8 @@ pub fn studied_today(cards: u32, secs: f32, tr: &I18n) -> String {
 
 impl Collection {
     pub fn studied_today(&mut self) -> Result<String> {
-        let timing = self.timing_today()?;
-        let today = self.storage.studied_today(timing.next_day_at)?;
+        let today = self.revlog_days_today()?;
+        let today = self.storage.studied_today(today)?;
         Ok(studied_today(today.cards, today.seconds as f32, &self.tr))
     }
 }
@@ -1,5 +1,4 @@
-INSERT
-  OR REPLACE INTO cards (
+INSERT INTO cards (
     id,
     nid,
     did,
@@ -38,4 +37,22 @@ VALUES (
     ?,
     ?,
     ?
-  )
\ No newline at end of file
+  ) ON CONFLICT (id) DO
+UPDATE
+SET nid = excluded.nid,
+  did = excluded.did,
+  ord = excluded.ord,
+  mod = excluded.mod,
+  usn = excluded.usn,
+  type = excluded.type,
+  queue = excluded.queue,
+  due = excluded.due,
+  ivl = excluded.ivl,
+  factor = excluded.factor,
+  reps = excluded.reps,
+  lapses = excluded.lapses,
+  left = excluded.left,
+  odue = excluded.odue,
+  odid = excluded.odid,
+  flags = excluded.flags,
+  data = excluded.data
\ No newline at end of file
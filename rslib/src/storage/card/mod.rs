@@ -131,6 +131,8 @@ impl super::SqliteStorage {
     }
 
     /// Add or update card, using the provided ID. Used for syncing & undoing.
+    /// An existing card is updated in place rather than replaced, so the
+    /// revlog_days triggers see a deck change instead of a new card.
     pub(crate) fn add_or_update_card(&self, card: &Card) -> Result<()> {
         let mut stmt = self.db.prepare_cached(include_str!("add_or_update.sql"))?;
         stmt.execute(params![
@@ -453,6 +455,38 @@ impl super::SqliteStorage {
         Ok(())
     }
 
+    /// Call `func` with the raw columns of cards with an id above
+    /// `after_id`, in id order, stopping after `limit` cards if it is
+    /// positive. If `searched` is true, only cards in the search table are
+    /// included.
+    pub(crate) fn for_each_card_row<F>(
+        &self,
+        searched: bool,
+        after_id: i64,
+        limit: i64,
+        mut func: F,
+    ) -> Result<()>
+    where
+        F: FnMut(&Row) -> Result<()>,
+    {
+        let sql = format!(
+            "select id, nid, did, ord, mod, usn, type, queue, due, ivl, factor, \
+             reps, lapses, left, odue, odid, flags from cards where id > ? {} \
+             order by id limit ?",
+            if searched {
+                "and id in (select cid from search_cids)"
+            } else {
+                ""
+            }
+        );
+        let mut stmt = self.db.prepare_cached(&sql)?;
+        let mut rows = stmt.query(params![after_id, if limit > 0 { limit } else { -1 }])?;
+        while let Some(row) = rows.next()? {
+            func(row)?;
+        }
+        Ok(())
+    }
+
     pub(crate) fn clear_searched_cards_table(&self) -> Result<()> {
         self.db
             .execute("drop table if exists search_cids", NO_PARAMS)?;
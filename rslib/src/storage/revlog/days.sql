@@ -0,0 +1,14 @@
+SELECT day - ?,
+  type,
+  mature,
+  sum(count),
+  sum(ease1),
+  sum(ease2),
+  sum(ease3),
+  sum(ease4),
+  sum(time)
+FROM revlog_days
+WHERE day >= ?
+GROUP BY day,
+  type,
+  mature
@@ -135,11 +135,60 @@ impl SqliteStorage {
             .collect()
     }
 
-    pub(crate) fn studied_today(&self, day_cutoff: TimestampSecs) -> Result<StudiedToday> {
-        let start = day_cutoff.adding_secs(-86_400).as_millis();
+    /// Call `func` with the raw columns of entries with an id above
+    /// `after_id`, in id order, stopping after `limit` entries if it is
+    /// positive. If `searched` is true, only entries of cards in the search
+    /// table are included; otherwise entries of deleted cards are too.
+    pub(crate) fn for_each_revlog_row<F>(
+        &self,
+        searched: bool,
+        after_id: i64,
+        limit: i64,
+        mut func: F,
+    ) -> Result<()>
+    where
+        F: FnMut(&Row) -> Result<()>,
+    {
+        let sql = format!(
+            "{} where id > ? {} order by id limit ?",
+            include_str!("get.sql"),
+            if searched {
+                "and cid in (select cid from search_cids)"
+            } else {
+                ""
+            }
+        );
+        let mut stmt = self.db.prepare_cached(&sql)?;
+        let mut rows = stmt.query(params![after_id, if limit > 0 { limit } else { -1 }])?;
+        while let Some(row) = rows.next()? {
+            func(row)?;
+        }
+        Ok(())
+    }
+
+    /// Daily totals of the whole collection from day `since` onwards, with
+    /// days relative to `today`. Both are days of the revlog_days table.
+    pub(crate) fn get_revlog_days(&self, today: i64, since: i64) -> Result<Vec<pb::RevlogDay>> {
+        self.db
+            .prepare_cached(include_str!("days.sql"))?
+            .query_and_then(&[today, since], |row| {
+                Ok(pb::RevlogDay {
+                    day: row.get(0)?,
+                    review_kind: row.get(1)?,
+                    mature: row.get(2)?,
+                    count: row.get(3)?,
+                    button_counts: vec![row.get(4)?, row.get(5)?, row.get(6)?, row.get(7)?],
+                    taken_millis: row.get::<_, i64>(8)?.max(0) as u64,
+                })
+            })?
+            .collect()
+    }
+
+    /// `today` is a day of the revlog_days table.
+    pub(crate) fn studied_today(&self, today: i64) -> Result<StudiedToday> {
         self.db
             .prepare_cached(include_str!("studied_today.sql"))?
-            .query_map(&[start.0, RevlogReviewKind::Manual as i64], |row| {
+            .query_map(&[today, RevlogReviewKind::Manual as i64], |row| {
                 Ok(StudiedToday {
                     cards: row.get(0)?,
                     seconds: row.get(1)?,
@@ -150,6 +199,37 @@ impl SqliteStorage {
             .map_err(Into::into)
     }
 
+    /// The cutoff the daily totals were built for, if they are up to date.
+    pub(crate) fn revlog_days_cutoff(&self) -> Result<Option<i64>> {
+        self.db
+            .prepare_cached("select cutoff from revlog_days_cutoff")?
+            .query_row(NO_PARAMS, |row| row.get(0))
+            .map_err(Into::into)
+    }
+
+    /// Rebuild the daily totals from the revlog, counting days from `cutoff`
+    /// seconds past midnight UTC.
+    pub(crate) fn rebuild_revlog_days(&self, cutoff: i64) -> Result<()> {
+        // the triggers are disabled until the rebuild completes
+        self.clear_revlog_days()?;
+        self.db
+            .prepare(include_str!("rebuild_days.sql"))?
+            .execute(&[cutoff])?;
+        self.db
+            .prepare_cached("update revlog_days_cutoff set cutoff = ?")?
+            .execute(&[cutoff])?;
+        Ok(())
+    }
+
+    /// Mark the daily totals as out of date, so they are rebuilt when next
+    /// needed.
+    pub(crate) fn clear_revlog_days(&self) -> Result<()> {
+        self.db.execute_batch(
+            "update revlog_days_cutoff set cutoff = null; delete from revlog_days",
+        )?;
+        Ok(())
+    }
+
     pub(crate) fn upgrade_revlog_to_v2(&self) -> Result<()> {
         self.db
             .execute_batch(include_str!("v2_upgrade.sql"))
@@ -0,0 +1,28 @@
+INSERT INTO revlog_days (
+    day,
+    did,
+    type,
+    mature,
+    count,
+    ease1,
+    ease2,
+    ease3,
+    ease4,
+    time
+  )
+SELECT (r.id / 1000 - ?) / 86400,
+  coalesce(c.did, 0),
+  r.type,
+  r.lastIvl >= 21,
+  count(),
+  sum(r.ease = 1),
+  sum(r.ease = 2),
+  sum(r.ease = 3),
+  sum(r.ease = 4),
+  sum(r.time)
+FROM revlog r
+  LEFT JOIN cards c ON c.id = r.cid
+GROUP BY 1,
+  2,
+  3,
+  4
@@ -1,5 +1,5 @@
-SELECT COUNT(),
+SELECT coalesce(sum(count), 0),
   coalesce(sum(time) / 1000.0, 0.0)
-FROM revlog
-WHERE id > ?
-  AND type != ?
\ No newline at end of file
+FROM revlog_days
+WHERE day >= ?
+  AND type != ?
@@ -6,7 +6,7 @@ pub(super) const SCHEMA_MIN_VERSION: u8 = 11;
 /// The version new files are initially created with.
 pub(super) const SCHEMA_STARTING_VERSION: u8 = 11;
 /// The maximum schema version we can open.
-pub(super) const SCHEMA_MAX_VERSION: u8 = 18;
+pub(super) const SCHEMA_MAX_VERSION: u8 = 19;
 
 use super::SqliteStorage;
 use crate::error::Result;
@@ -39,6 +39,10 @@ impl SqliteStorage {
             self.db
                 .execute_batch(include_str!("schema18_upgrade.sql"))?;
         }
+        if ver < 19 {
+            self.db
+                .execute_batch(include_str!("schema19_upgrade.sql"))?;
+        }
 
         // in some future schema upgrade, we may want to change
         // _collapsed to _expanded in DeckCommon and invert existing values, so
@@ -51,6 +55,8 @@ impl SqliteStorage {
     pub(super) fn downgrade_to_schema_11(&self) -> Result<()> {
         self.begin_trx()?;
 
+        self.db
+            .execute_batch(include_str!("schema19_downgrade.sql"))?;
         self.db
             .execute_batch(include_str!("schema18_downgrade.sql"))?;
         self.downgrade_deck_conf_from_schema16()?;
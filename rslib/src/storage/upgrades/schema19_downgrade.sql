@@ -0,0 +1,11 @@
+DROP TRIGGER revlog_days_insert;
+DROP TRIGGER revlog_days_delete;
+DROP TRIGGER revlog_days_update_before;
+DROP TRIGGER revlog_days_update_after;
+DROP TRIGGER revlog_days_card_moved;
+DROP TRIGGER revlog_days_card_deleted;
+DROP TRIGGER revlog_days_card_added;
+DROP TABLE revlog_days;
+DROP TABLE revlog_days_cutoff;
+UPDATE col
+SET ver = 18;
\ No newline at end of file
@@ -0,0 +1,437 @@
+-- Answers per day and deck, kept up to date by the triggers below. The day
+-- is counted from the cutoff in revlog_days_cutoff, and the table is rebuilt
+-- when the day cutoff moves. Answers are attributed to the current deck of
+-- their card, or to deck 0 if the card has been deleted.
+CREATE TABLE revlog_days (
+  day integer NOT NULL,
+  did integer NOT NULL,
+  type integer NOT NULL,
+  -- lastIvl >= 21
+  mature integer NOT NULL,
+  count integer NOT NULL,
+  ease1 integer NOT NULL,
+  ease2 integer NOT NULL,
+  ease3 integer NOT NULL,
+  ease4 integer NOT NULL,
+  -- milliseconds
+  time integer NOT NULL,
+  PRIMARY KEY (day, did, type, mature)
+) WITHOUT ROWID;
+-- Seconds past midnight UTC of the day cutoff. While null, the table is
+-- out of date and the triggers do nothing.
+CREATE TABLE revlog_days_cutoff (cutoff integer);
+INSERT INTO revlog_days_cutoff
+VALUES (NULL);
+CREATE TRIGGER revlog_days_insert
+AFTER
+INSERT ON revlog BEGIN
+  INSERT INTO revlog_days (
+      day,
+      did,
+      type,
+      mature,
+      count,
+      ease1,
+      ease2,
+      ease3,
+      ease4,
+      time
+    )
+  SELECT (r.id / 1000 - c.cutoff) / 86400,
+    coalesce((
+      SELECT did
+      FROM cards
+      WHERE id = r.cid
+    ), 0),
+    r.type,
+    r.lastIvl >= 21,
+    count(),
+    sum(r.ease = 1),
+    sum(r.ease = 2),
+    sum(r.ease = 3),
+    sum(r.ease = 4),
+    sum(r.time)
+  FROM revlog r,
+    revlog_days_cutoff c
+  WHERE r.id = new.id
+    AND c.cutoff IS NOT NULL
+  GROUP BY 1,
+    2,
+    3,
+    4 ON CONFLICT (day, did, type, mature) DO
+  UPDATE
+  SET count = count + excluded.count,
+    ease1 = ease1 + excluded.ease1,
+    ease2 = ease2 + excluded.ease2,
+    ease3 = ease3 + excluded.ease3,
+    ease4 = ease4 + excluded.ease4,
+    time = time + excluded.time;
+END;
+CREATE TRIGGER revlog_days_delete BEFORE DELETE ON revlog BEGIN
+  INSERT INTO revlog_days (
+      day,
+      did,
+      type,
+      mature,
+      count,
+      ease1,
+      ease2,
+      ease3,
+      ease4,
+      time
+    )
+  SELECT (r.id / 1000 - c.cutoff) / 86400,
+    coalesce((
+      SELECT did
+      FROM cards
+      WHERE id = r.cid
+    ), 0),
+    r.type,
+    r.lastIvl >= 21,
+    -count(),
+    -sum(r.ease = 1),
+    -sum(r.ease = 2),
+    -sum(r.ease = 3),
+    -sum(r.ease = 4),
+    -sum(r.time)
+  FROM revlog r,
+    revlog_days_cutoff c
+  WHERE r.id = old.id
+    AND c.cutoff IS NOT NULL
+  GROUP BY 1,
+    2,
+    3,
+    4 ON CONFLICT (day, did, type, mature) DO
+  UPDATE
+  SET count = count + excluded.count,
+    ease1 = ease1 + excluded.ease1,
+    ease2 = ease2 + excluded.ease2,
+    ease3 = ease3 + excluded.ease3,
+    ease4 = ease4 + excluded.ease4,
+    time = time + excluded.time;
+END;
+CREATE TRIGGER revlog_days_update_before BEFORE
+UPDATE OF id, cid, ease, lastIvl, time, type ON revlog BEGIN
+  INSERT INTO revlog_days (
+      day,
+      did,
+      type,
+      mature,
+      count,
+      ease1,
+      ease2,
+      ease3,
+      ease4,
+      time
+    )
+  SELECT (r.id / 1000 - c.cutoff) / 86400,
+    coalesce((
+      SELECT did
+      FROM cards
+      WHERE id = r.cid
+    ), 0),
+    r.type,
+    r.lastIvl >= 21,
+    -count(),
+    -sum(r.ease = 1),
+    -sum(r.ease = 2),
+    -sum(r.ease = 3),
+    -sum(r.ease = 4),
+    -sum(r.time)
+  FROM revlog r,
+    revlog_days_cutoff c
+  WHERE r.id = old.id
+    AND c.cutoff IS NOT NULL
+  GROUP BY 1,
+    2,
+    3,
+    4 ON CONFLICT (day, did, type, mature) DO
+  UPDATE
+  SET count = count + excluded.count,
+    ease1 = ease1 + excluded.ease1,
+    ease2 = ease2 + excluded.ease2,
+    ease3 = ease3 + excluded.ease3,
+    ease4 = ease4 + excluded.ease4,
+    time = time + excluded.time;
+END;
+CREATE TRIGGER revlog_days_update_after
+AFTER
+UPDATE OF id, cid, ease, lastIvl, time, type ON revlog BEGIN
+  INSERT INTO revlog_days (
+      day,
+      did,
+      type,
+      mature,
+      count,
+      ease1,
+      ease2,
+      ease3,
+      ease4,
+      time
+    )
+  SELECT (r.id / 1000 - c.cutoff) / 86400,
+    coalesce((
+      SELECT did
+      FROM cards
+      WHERE id = r.cid
+    ), 0),
+    r.type,
+    r.lastIvl >= 21,
+    count(),
+    sum(r.ease = 1),
+    sum(r.ease = 2),
+    sum(r.ease = 3),
+    sum(r.ease = 4),
+    sum(r.time)
+  FROM revlog r,
+    revlog_days_cutoff c
+  WHERE r.id = new.id
+    AND c.cutoff IS NOT NULL
+  GROUP BY 1,
+    2,
+    3,
+    4 ON CONFLICT (day, did, type, mature) DO
+  UPDATE
+  SET count = count + excluded.count,
+    ease1 = ease1 + excluded.ease1,
+    ease2 = ease2 + excluded.ease2,
+    ease3 = ease3 + excluded.ease3,
+    ease4 = ease4 + excluded.ease4,
+    time = time + excluded.time;
+END;
+CREATE TRIGGER revlog_days_card_moved
+AFTER
+UPDATE OF did ON cards
+  WHEN old.did != new.did BEGIN
+  INSERT INTO revlog_days (
+      day,
+      did,
+      type,
+      mature,
+      count,
+      ease1,
+      ease2,
+      ease3,
+      ease4,
+      time
+    )
+  SELECT (r.id / 1000 - c.cutoff) / 86400,
+    old.did,
+    r.type,
+    r.lastIvl >= 21,
+    -count(),
+    -sum(r.ease = 1),
+    -sum(r.ease = 2),
+    -sum(r.ease = 3),
+    -sum(r.ease = 4),
+    -sum(r.time)
+  FROM revlog r,
+    revlog_days_cutoff c
+  WHERE r.cid = old.id
+    AND c.cutoff IS NOT NULL
+  GROUP BY 1,
+    2,
+    3,
+    4 ON CONFLICT (day, did, type, mature) DO
+  UPDATE
+  SET count = count + excluded.count,
+    ease1 = ease1 + excluded.ease1,
+    ease2 = ease2 + excluded.ease2,
+    ease3 = ease3 + excluded.ease3,
+    ease4 = ease4 + excluded.ease4,
+    time = time + excluded.time;
+  INSERT INTO revlog_days (
+      day,
+      did,
+      type,
+      mature,
+      count,
+      ease1,
+      ease2,
+      ease3,
+      ease4,
+      time
+    )
+  SELECT (r.id / 1000 - c.cutoff) / 86400,
+    new.did,
+    r.type,
+    r.lastIvl >= 21,
+    count(),
+    sum(r.ease = 1),
+    sum(r.ease = 2),
+    sum(r.ease = 3),
+    sum(r.ease = 4),
+    sum(r.time)
+  FROM revlog r,
+    revlog_days_cutoff c
+  WHERE r.cid = new.id
+    AND c.cutoff IS NOT NULL
+  GROUP BY 1,
+    2,
+    3,
+    4 ON CONFLICT (day, did, type, mature) DO
+  UPDATE
+  SET count = count + excluded.count,
+    ease1 = ease1 + excluded.ease1,
+    ease2 = ease2 + excluded.ease2,
+    ease3 = ease3 + excluded.ease3,
+    ease4 = ease4 + excluded.ease4,
+    time = time + excluded.time;
+END;
+CREATE TRIGGER revlog_days_card_deleted
+AFTER DELETE ON cards BEGIN
+  INSERT INTO revlog_days (
+      day,
+      did,
+      type,
+      mature,
+      count,
+      ease1,
+      ease2,
+      ease3,
+      ease4,
+      time
+    )
+  SELECT (r.id / 1000 - c.cutoff) / 86400,
+    old.did,
+    r.type,
+    r.lastIvl >= 21,
+    -count(),
+    -sum(r.ease = 1),
+    -sum(r.ease = 2),
+    -sum(r.ease = 3),
+    -sum(r.ease = 4),
+    -sum(r.time)
+  FROM revlog r,
+    revlog_days_cutoff c
+  WHERE r.cid = old.id
+    AND c.cutoff IS NOT NULL
+  GROUP BY 1,
+    2,
+    3,
+    4 ON CONFLICT (day, did, type, mature) DO
+  UPDATE
+  SET count = count + excluded.count,
+    ease1 = ease1 + excluded.ease1,
+    ease2 = ease2 + excluded.ease2,
+    ease3 = ease3 + excluded.ease3,
+    ease4 = ease4 + excluded.ease4,
+    time = time + excluded.time;
+  INSERT INTO revlog_days (
+      day,
+      did,
+      type,
+      mature,
+      count,
+      ease1,
+      ease2,
+      ease3,
+      ease4,
+      time
+    )
+  SELECT (r.id / 1000 - c.cutoff) / 86400,
+    0,
+    r.type,
+    r.lastIvl >= 21,
+    count(),
+    sum(r.ease = 1),
+    sum(r.ease = 2),
+    sum(r.ease = 3),
+    sum(r.ease = 4),
+    sum(r.time)
+  FROM revlog r,
+    revlog_days_cutoff c
+  WHERE r.cid = old.id
+    AND c.cutoff IS NOT NULL
+  GROUP BY 1,
+    2,
+    3,
+    4 ON CONFLICT (day, did, type, mature) DO
+  UPDATE
+  SET count = count + excluded.count,
+    ease1 = ease1 + excluded.ease1,
+    ease2 = ease2 + excluded.ease2,
+    ease3 = ease3 + excluded.ease3,
+    ease4 = ease4 + excluded.ease4,
+    time = time + excluded.time;
+END;
+CREATE TRIGGER revlog_days_card_added
+AFTER
+INSERT ON cards BEGIN
+  INSERT INTO revlog_days (
+      day,
+      did,
+      type,
+      mature,
+      count,
+      ease1,
+      ease2,
+      ease3,
+      ease4,
+      time
+    )
+  SELECT (r.id / 1000 - c.cutoff) / 86400,
+    0,
+    r.type,
+    r.lastIvl >= 21,
+    -count(),
+    -sum(r.ease = 1),
+    -sum(r.ease = 2),
+    -sum(r.ease = 3),
+    -sum(r.ease = 4),
+    -sum(r.time)
+  FROM revlog r,
+    revlog_days_cutoff c
+  WHERE r.cid = new.id
+    AND c.cutoff IS NOT NULL
+  GROUP BY 1,
+    2,
+    3,
+    4 ON CONFLICT (day, did, type, mature) DO
+  UPDATE
+  SET count = count + excluded.count,
+    ease1 = ease1 + excluded.ease1,
+    ease2 = ease2 + excluded.ease2,
+    ease3 = ease3 + excluded.ease3,
+    ease4 = ease4 + excluded.ease4,
+    time = time + excluded.time;
+  INSERT INTO revlog_days (
+      day,
+      did,
+      type,
+      mature,
+      count,
+      ease1,
+      ease2,
+      ease3,
+      ease4,
+      time
+    )
+  SELECT (r.id / 1000 - c.cutoff) / 86400,
+    new.did,
+    r.type,
+    r.lastIvl >= 21,
+    count(),
+    sum(r.ease = 1),
+    sum(r.ease = 2),
+    sum(r.ease = 3),
+    sum(r.ease = 4),
+    sum(r.time)
+  FROM revlog r,
+    revlog_days_cutoff c
+  WHERE r.cid = new.id
+    AND c.cutoff IS NOT NULL
+  GROUP BY 1,
+    2,
+    3,
+    4 ON CONFLICT (day, did, type, mature) DO
+  UPDATE
+  SET count = count + excluded.count,
+    ease1 = ease1 + excluded.ease1,
+    ease2 = ease2 + excluded.ease2,
+    ease3 = ease3 + excluded.ease3,
+    ease4 = ease4 + excluded.ease4,
+    time = time + excluded.time;
+END;
+UPDATE col
+SET ver = 19;
\ No newline at end of file
@@ -1,13 +1,25 @@
 // Copyright: Ankitects Pty Ltd and contributors
 // License: GNU AGPL, version 3 or later; http://www.gnu.org/licenses/agpl.html
 
-use std::{io::prelude::*, path::Path, time::Duration};
+use std::{
+    io::prelude::*,
+    path::Path,
+    sync::atomic::{AtomicBool, Ordering},
+    time::Duration,
+};
 
+use async_compression::{
+    stream::{ZstdDecoder, ZstdEncoder},
+    Level,
+};
 use async_trait::async_trait;
 use bytes::Bytes;
 use flate2::{write::GzEncoder, Compression};
 use futures::{Stream, StreamExt};
-use reqwest::{multipart, Body, Client, Response};
+use reqwest::{
+    header::{ACCEPT_ENCODING, CONTENT_ENCODING},
+    multipart, Body, Client, Response,
+};
 use serde::de::DeserializeOwned;
 use tempfile::NamedTempFile;
 
@@ -32,6 +44,21 @@ pub struct HttpSyncClient {
     client: Client,
     endpoint: String,
     full_sync_progress_fn: Option<FullSyncProgressFn>,
+    /// Set once the server has replied with a zstd-compressed body, after
+    /// which request bodies are compressed with zstd instead of gzip.
+    zstd: AtomicBool,
+}
+
+type ByteStream = Pin<Box<dyn Stream<Item = Result<Bytes>>>>;
+
+/// The zstd compression level to use, or None if zstd should not be offered
+/// to the server. Defaults to 3; can be changed with SYNC_ZSTD_LEVEL, and 0
+/// disables zstd.
+fn zstd_level() -> Option<u32> {
+    match std::env::var("SYNC_ZSTD_LEVEL") {
+        Ok(level) => level.parse().ok().filter(|&level| level > 0),
+        Err(_) => Some(3),
+    }
 }
 
 pub struct Timeouts {
@@ -131,6 +158,8 @@ impl SyncServer for HttpSyncClient {
                 total_bytes,
             },
         };
+        // a full upload is the first request made by its client, so zstd
+        // has not been negotiated yet
         let wrap2 = async_compression::stream::GzipEncoder::new(wrap1);
         let body = Body::wrap_stream(wrap2);
         self.upload_inner(body).await?;
@@ -188,6 +217,7 @@ impl HttpSyncClient {
             client,
             endpoint,
             full_sync_progress_fn: None,
+            zstd: AtomicBool::new(false),
         }
     }
 
@@ -200,11 +230,9 @@ impl HttpSyncClient {
         T: DeserializeOwned,
     {
         let (method, req_json) = req.into_method_and_data()?;
-        self.request_bytes(method, &req_json, false)
-            .await?
-            .json()
-            .await
-            .map_err(Into::into)
+        let resp = self.request_bytes(method, &req_json, false).await?;
+        let data = self.response_bytes(resp).await?;
+        serde_json::from_slice(&data).map_err(Into::into)
     }
 
     async fn request_bytes(
@@ -213,9 +241,15 @@ impl HttpSyncClient {
         req: &[u8],
         timeout_long: bool,
     ) -> Result<Response> {
-        let mut gz = GzEncoder::new(Vec::new(), Compression::fast());
-        gz.write_all(req)?;
-        let part = multipart::Part::bytes(gz.finish()?);
+        let data = match zstd_level() {
+            Some(level) if self.zstd.load(Ordering::Relaxed) => zstd_encode(req, level).await?,
+            _ => {
+                let mut gz = GzEncoder::new(Vec::new(), Compression::fast());
+                gz.write_all(req)?;
+                gz.finish()?
+            }
+        };
+        let part = multipart::Part::bytes(data);
         let resp = self.request(method, part, timeout_long).await?;
         resp.error_for_status().map_err(Into::into)
     }
@@ -241,10 +275,40 @@ impl HttpSyncClient {
         if timeout_long {
             req = req.timeout(Duration::from_secs(60 * 60));
         }
+        if zstd_level().is_some() {
+            req = req.header(ACCEPT_ENCODING, "zstd");
+        }
 
         req.send().await?.error_for_status().map_err(Into::into)
     }
 
+    /// The response body, decompressed if the server compressed it.
+    fn response_stream(&self, resp: Response) -> ByteStream {
+        let zstd = resp
+            .headers()
+            .get(CONTENT_ENCODING)
+            .map(|enc| enc == "zstd")
+            .unwrap_or_default();
+        if zstd {
+            self.zstd.store(true, Ordering::Relaxed);
+            let stream = resp
+                .bytes_stream()
+                .map(|res| res.map_err(|e| std::io::Error::new(std::io::ErrorKind::Other, e)));
+            Box::pin(ZstdDecoder::new(stream).map(|res| res.map_err(Into::into)))
+        } else {
+            Box::pin(resp.bytes_stream().map(|res| res.map_err(Into::into)))
+        }
+    }
+
+    async fn response_bytes(&self, resp: Response) -> Result<Vec<u8>> {
+        let mut stream = self.response_stream(resp);
+        let mut data = vec![];
+        while let Some(chunk) = stream.next().await {
+            data.extend_from_slice(&chunk?);
+        }
+        Ok(data)
+    }
+
     pub(crate) async fn login<S: Into<String>>(&mut self, username: S, password: S) -> Result<()> {
         let input = SyncRequest::HostKey(HostKeyIn {
             username: username.into(),
@@ -260,30 +324,47 @@ impl HttpSyncClient {
         self.hkey.as_ref().unwrap()
     }
 
-    async fn download_inner(
-        &self,
-    ) -> Result<(
-        usize,
-        impl Stream<Item = std::result::Result<Bytes, reqwest::Error>>,
-    )> {
+    async fn download_inner(&self) -> Result<(usize, ByteStream)> {
         let resp: reqwest::Response = self.request_bytes("download", b"{}", true).await?;
-        let len = resp.content_length().unwrap_or_default();
-        Ok((len as usize, resp.bytes_stream()))
+        // when the download is compressed, the server provides the original
+        // size separately
+        let len = resp
+            .headers()
+            .get("anki-original-size")
+            .and_then(|size| size.to_str().ok()?.parse().ok())
+            .or_else(|| resp.content_length())
+            .unwrap_or_default();
+        Ok((len as usize, self.response_stream(resp)))
     }
 
     async fn upload_inner(&self, body: Body) -> Result<()> {
         let data_part = multipart::Part::stream(body);
         let resp = self.request("upload", data_part, true).await?;
         resp.error_for_status_ref()?;
-        let text = resp.text().await?;
-        if text != "OK" {
-            Err(AnkiError::sync_error(text, SyncErrorKind::Other))
+        let text = self.response_bytes(resp).await?;
+        if text != b"OK" {
+            Err(AnkiError::sync_error(
+                String::from_utf8_lossy(&text),
+                SyncErrorKind::Other,
+            ))
         } else {
             Ok(())
         }
     }
 }
 
+async fn zstd_encode(data: &[u8], level: u32) -> Result<Vec<u8>> {
+    let input = futures::stream::once(futures::future::ready(Ok::<_, std::io::Error>(
+        Bytes::copy_from_slice(data),
+    )));
+    let mut encoder = ZstdEncoder::with_quality(input, Level::Precise(level));
+    let mut out = vec![];
+    while let Some(chunk) = encoder.next().await {
+        out.extend_from_slice(&chunk?);
+    }
+    Ok(out)
+}
+
 use std::pin::Pin;
 
 use futures::{
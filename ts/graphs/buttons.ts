@@ -47,18 +47,18 @@ export function gatherData(
     const young: ButtonCounts = [0, 0, 0, 0];
     const mature: ButtonCounts = [0, 0, 0, 0];
 
-    for (const review of data.revlog as pb.BackendProto.RevlogEntry[]) {
-        if (cutoff && (review.id as number) < cutoff) {
-            continue;
-        }
-
-        let buttonNum = review.buttonChosen;
+    const add = (
+        reviewKind: number,
+        isMature: boolean,
+        buttonNum: number,
+        count: number
+    ): void => {
         if (buttonNum <= 0 || buttonNum > 4) {
-            continue;
+            return;
         }
 
         let buttons = learning;
-        switch (review.reviewKind) {
+        switch (reviewKind) {
             case ReviewKind.LEARNING:
             case ReviewKind.RELEARNING:
                 // V1 scheduler only had 3 buttons in learning
@@ -69,15 +69,35 @@ export function gatherData(
 
             case ReviewKind.REVIEW:
             case ReviewKind.EARLY_REVIEW:
-                if (review.lastInterval < 21) {
-                    buttons = young;
-                } else {
+                if (isMature) {
                     buttons = mature;
+                } else {
+                    buttons = young;
                 }
                 break;
         }
 
-        buttons[buttonNum - 1] += 1;
+        buttons[buttonNum - 1] += count;
+    };
+
+    if (data.revlogDays.length) {
+        // whole collection, so the daily totals can be used
+        for (const total of data.revlogDays as pb.BackendProto.RevlogDay[]) {
+            const dayStart = (data.nextDayAtSecs + (total.day - 1) * 86400) * 1000;
+            if (cutoff && dayStart < cutoff) {
+                continue;
+            }
+            total.buttonCounts.forEach((count: number, idx: number) =>
+                add(total.reviewKind, total.mature, idx + 1, count)
+            );
+        }
+    } else {
+        for (const review of data.revlog as pb.BackendProto.RevlogEntry[]) {
+            if (cutoff && (review.id as number) < cutoff) {
+                continue;
+            }
+            add(review.reviewKind, review.lastInterval >= 21, review.buttonChosen, 1);
+        }
     }
     return { learning, young, mature };
 }
@@ -58,15 +58,27 @@ export function gatherData(
 ): GraphData {
     const reviewCount = new Map<number, number>();
 
-    for (const review of data.revlog as pb.BackendProto.RevlogEntry[]) {
-        if (review.buttonChosen == 0) {
-            continue;
+    if (data.revlogDays.length) {
+        // whole collection, so the daily totals can be used
+        for (const total of data.revlogDays as pb.BackendProto.RevlogDay[]) {
+            const answered = total.buttonCounts.reduce((a, b) => a + b, 0);
+            if (answered == 0) {
+                continue;
+            }
+            const count = reviewCount.get(total.day) ?? 0;
+            reviewCount.set(total.day, count + answered);
+        }
+    } else {
+        for (const review of data.revlog as pb.BackendProto.RevlogEntry[]) {
+            if (review.buttonChosen == 0) {
+                continue;
+            }
+            const day = Math.ceil(
+                ((review.id as number) / 1000 - data.nextDayAtSecs) / 86400
+            );
+            const count = reviewCount.get(day) ?? 0;
+            reviewCount.set(day, count + 1);
         }
-        const day = Math.ceil(
-            ((review.id as number) / 1000 - data.nextDayAtSecs) / 86400
-        );
-        const count = reviewCount.get(day) ?? 0;
-        reviewCount.set(day, count + 1);
     }
 
     const timeFunction =
@@ -58,42 +58,71 @@ export function gatherData(data: pb.BackendProto.GraphsOut): GraphData {
     const reviewTime = new Map<number, Reviews>();
     const empty = { mature: 0, young: 0, learn: 0, relearn: 0, early: 0 };
 
-    for (const review of data.revlog as pb.BackendProto.RevlogEntry[]) {
-        if (review.reviewKind == ReviewKind.MANUAL) {
+    const add = (
+        day: number,
+        reviewKind: number,
+        isMature: boolean,
+        count: number,
+        millis: number
+    ): void => {
+        if (reviewKind == ReviewKind.MANUAL) {
             // don't count days with only manual scheduling
-            continue;
+            return;
         }
-        const day = Math.ceil(
-            ((review.id as number) / 1000 - data.nextDayAtSecs) / 86400
-        );
         const countEntry =
             reviewCount.get(day) ?? reviewCount.set(day, { ...empty }).get(day)!;
         const timeEntry =
             reviewTime.get(day) ?? reviewTime.set(day, { ...empty }).get(day)!;
 
-        switch (review.reviewKind) {
+        switch (reviewKind) {
             case ReviewKind.LEARNING:
-                countEntry.learn += 1;
-                timeEntry.learn += review.takenMillis;
+                countEntry.learn += count;
+                timeEntry.learn += millis;
                 break;
             case ReviewKind.RELEARNING:
-                countEntry.relearn += 1;
-                timeEntry.relearn += review.takenMillis;
+                countEntry.relearn += count;
+                timeEntry.relearn += millis;
                 break;
             case ReviewKind.REVIEW:
-                if (review.lastInterval < 21) {
-                    countEntry.young += 1;
-                    timeEntry.young += review.takenMillis;
+                if (isMature) {
+                    countEntry.mature += count;
+                    timeEntry.mature += millis;
                 } else {
-                    countEntry.mature += 1;
-                    timeEntry.mature += review.takenMillis;
+                    countEntry.young += count;
+                    timeEntry.young += millis;
                 }
                 break;
             case ReviewKind.EARLY_REVIEW:
-                countEntry.early += 1;
-                timeEntry.early += review.takenMillis;
+                countEntry.early += count;
+                timeEntry.early += millis;
                 break;
         }
+    };
+
+    if (data.revlogDays.length) {
+        // whole collection, so the daily totals can be used
+        for (const total of data.revlogDays as pb.BackendProto.RevlogDay[]) {
+            add(
+                total.day,
+                total.reviewKind,
+                total.mature,
+                total.count,
+                total.takenMillis as number
+            );
+        }
+    } else {
+        for (const review of data.revlog as pb.BackendProto.RevlogEntry[]) {
+            const day = Math.ceil(
+                ((review.id as number) / 1000 - data.nextDayAtSecs) / 86400
+            );
+            add(
+                day,
+                review.reviewKind,
+                review.lastInterval >= 21,
+                1,
+                review.takenMillis
+            );
+        }
     }
 
     return { reviewCount, reviewTime };